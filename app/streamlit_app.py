@@ -1,27 +1,20 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
 from pathlib import Path
 import sys
 import os
 import time
+from contextlib import contextmanager
 from datetime import datetime
-import plotly.express as px
 
 # Add project root to Python path
 project_root = Path(__file__).resolve().parent.parent
 sys.path.append(str(project_root))
 
-from src.model import BreastCancerModel
-from src.models.diabetes import DiabetesModel
-from src.models.heart_disease import HeartDiseaseModel
-from src.models.parkinsons import ParkinsonsModel
-from src.config import (
-    BREAST_CANCER_MODEL_PATH,
-    DIABETES_MODEL_PATH,
-    HEART_DISEASE_MODEL_PATH,
-    PARKINSONS_MODEL_PATH
-)
+from src.config import UI_DEMO_STAGE_SECONDS, UI_PROGRESS_AFTER_SECONDS
+
+# numpy, pandas, plotly and the model modules (which pull in scikit-learn) are imported
+# inside the pages that use them, so the home page starts without paying for them.
+# benchmarks/import_time.py reports what each page costs to import.
 
 # Set page config
 st.set_page_config(
@@ -83,41 +76,68 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 def check_model_exists(model_path):
-    """Check if a model file exists"""
-    return os.path.exists(model_path)
+    """Check if a model file exists, in either the pickle or the memory-mappable format"""
+    from src.models.paths import artifact_path_for
+    return os.path.exists(model_path) or os.path.exists(artifact_path_for(model_path))
+
+class StageProgress:
+    """Progress of a task made of named stages, advanced by the work itself.
+
+    Nothing is drawn until the task has run for UI_PROGRESS_AFTER_SECONDS, or a
+    stage is entered with ``slow=True``, so instant work shows no indicator.
+    The indicator is removed when the ``with`` block exits.
+    """
+
+    def __init__(self, title, stages):
+        self.title = title
+        self.stages = list(stages)
+        self.completed = 0
+        self.visible = False
+        self.started = time.perf_counter()
+        self.placeholder = st.empty()
 
-def load_animation():
-    """Show a loading animation"""
-    with st.spinner('Loading...'):
-        time.sleep(0.5)
+    def __enter__(self):
+        return self
 
-def show_success_animation():
-    """Show success animation"""
-    placeholder = st.empty()
-    for i in range(5):
-        placeholder.markdown(f"{'🎯' * (i+1)}")
-        time.sleep(0.1)
-    placeholder.empty()
+    def __exit__(self, *exc_info):
+        self.placeholder.empty()
+        return False
+
+    @contextmanager
+    def stage(self, name, slow=False):
+        start = time.perf_counter()
+        if slow or start - self.started >= UI_PROGRESS_AFTER_SECONDS:
+            self.visible = True
+        if self.visible:
+            with self.placeholder.container():
+                st.caption(f"{self.title}: {name}...")
+                st.progress(int(100 * self.completed / len(self.stages)))
+        yield
+        self.completed += 1
+        # Demo pacing only; with the production setting of 0 this never sleeps
+        if self.visible and UI_DEMO_STAGE_SECONDS > 0:
+            time.sleep(max(0.0, UI_DEMO_STAGE_SECONDS - (time.perf_counter() - start)))
+
+def load_page_model(module_name, class_name, label):
+    """Load a page's model through the registry, showing progress only when it is not already in memory.
+
+    The model module is imported here, so on the first visit the stage also
+    covers importing scikit-learn.
+    """
+    import importlib
+    from src.models.registry import registry
+    
+    slow = module_name not in sys.modules or registry.needs_load(getattr(sys.modules[module_name], class_name))
+    with StageProgress(f"Preparing the {label} model", ["Loading model"]) as progress:
+        with progress.stage("Loading model", slow=slow):
+            model_cls = getattr(importlib.import_module(module_name), class_name)
+            return registry.get(model_cls)
 
 def add_home_button():
     """Add a Back to Home button"""
     if st.button("🏠 Back to Home"):
         st.session_state.page = "Home"
 
-def show_loading_page():
-    """Show an animated loading screen"""
-    placeholder = st.empty()
-    with placeholder.container():
-        st.markdown("""
-            <div class="loading-container">
-                <h1>🏥 Medical AI Assistant</h1>
-                <div class="loading-spinner"></div>
-                <p>Loading advanced diagnostic tools...</p>
-            </div>
-        """, unsafe_allow_html=True)
-    time.sleep(1)
-    placeholder.empty()
-
 def show_success_message(message):
     """Show animated success message"""
     st.markdown(f"""
@@ -127,6 +147,47 @@ def show_success_message(message):
         </div>
     """, unsafe_allow_html=True)
 
+def record_assessment(model, assessment_type, input_data, high_risk, probability, risk_factors):
+    """Queue a completed assessment for the history store (written in the background).
+
+    The risk score is the probability predict scored the case with (distance weighted, rule
+    adjusted); the model flags high risk when it reaches the model's threshold.
+    """
+    from src.history import get_history
+    
+    try:
+        # Every model, breast cancer included (0 = malignant once the probability reaches the
+        # threshold), predicts high risk at the high end of this probability
+        get_history().record(
+            patient_id=st.session_state.get("patient_id") or "anonymous",
+            assessment_type=assessment_type,
+            high_risk=high_risk,
+            risk_score=float(probability[0]),
+            inputs=dict(zip(model.feature_names, (float(v) for v in input_data[0]))),
+            risk_factors=risk_factors
+        )
+    except Exception as e:
+        # History is best effort: a failure here must not hide the prediction
+        st.warning(f"Assessment could not be saved to history: {str(e)}")
+
+def prediction_requested(page, label, input_data, **kwargs):
+    """Show a page's predict button; return (clicked, show_results).
+
+    Streamlit forgets a click on the next rerun, and opening the similar-cases panel is
+    one, so the inputs of the last click are kept in the session: the results stay up
+    while the inputs are unchanged. Only a click is a new assessment.
+    """
+    clicked = st.button(label, **kwargs)
+    key = f"{page}_predicted_inputs"
+    if clicked:
+        st.session_state[key] = input_data.tobytes()
+    return clicked, st.session_state.get(key) == input_data.tobytes()
+
+def similar_cases_panel(model, page, neighbors, render):
+    """"View Similar Cases" panel: the neighbors' records are read from the model's case store only once it is opened"""
+    if st.checkbox("View Similar Cases", key=f"{page}_similar_cases"):
+        render(model.similar_cases(neighbors))
+
 def show_feature_cards():
     """Show animated feature cards"""
     st.markdown("""
@@ -150,8 +211,6 @@ def show_feature_cards():
     """, unsafe_allow_html=True)
 
 def home_page():
-    show_loading_page()
-    
     # Hero section with gradient background
     st.markdown("""
         <div style="
@@ -482,6 +541,11 @@ def home_page():
     # Add new sections
     st.markdown("## 📊 Additional Features")
     
+    # Tabs render all of their content, so the charts (and the pandas/plotly imports
+    # behind them) only run once the section is opened
+    if not st.checkbox("Show history, analysis and recommendations", key="show_additional_features"):
+        return
+    
     # Create tabs for different features
     tab1, tab2, tab3 = st.tabs(["📈 History", "🔍 Analysis", "💡 Recommendations"])
     
@@ -498,8 +562,11 @@ def home_page():
         compare_assessments()
 
 def breast_cancer_prediction():
+    import numpy as np
+    import pandas as pd
+    from src.config import BREAST_CANCER_MODEL_PATH
+    
     add_home_button()
-    show_loading_page()
     
     st.markdown("""
         <div class="page-header">
@@ -513,7 +580,7 @@ def breast_cancer_prediction():
         return
     
     try:
-        model = BreastCancerModel.load_model()
+        model = load_page_model('src.model', 'BreastCancerModel', "breast cancer")
     except Exception as e:
         st.error(f"⚠️ Error loading model: {str(e)}")
         return
@@ -576,29 +643,39 @@ def breast_cancer_prediction():
             symmetry_worst = st.number_input("Symmetry (worst)", 0.15, 0.66, 0.29, help="Worst symmetry")
             fractal_dimension_worst = st.number_input("Fractal dimension (worst)", 0.055, 0.207, 0.083, help="Worst fractal dimension")
 
+    # Get input data based on active tab
+    if tab1._active:
+        input_data = np.array([
+            mean_radius, mean_texture, mean_perimeter, mean_area, mean_smoothness,
+            mean_compactness, mean_concavity, mean_concave_points, 0.2, 0.06,
+            0.4, 0.4, 2.0, 20.0, 0.01, 0.02, 0.02, 0.01, 0.02, 0.003,
+            16.0, 16.0, 100.0, 700.0, 0.12, 0.15, 0.15, 0.1, 0.25, 0.08
+        ]).reshape(1, -1)
+    else:
+        input_data = np.array([
+            radius_mean, texture_mean, perimeter_mean, area_mean, smoothness_mean,
+            compactness_mean, concavity_mean, concave_points_mean, symmetry_mean, fractal_dimension_mean,
+            radius_se, texture_se, perimeter_se, area_se, smoothness_se,
+            compactness_se, concavity_se, concave_points_se, symmetry_se, fractal_dimension_se,
+            radius_worst, texture_worst, perimeter_worst, area_worst, smoothness_worst,
+            compactness_worst, concavity_worst, concave_points_worst, symmetry_worst, fractal_dimension_worst
+        ]).reshape(1, -1)
+    
     # Add analyze button outside tabs to work for both
-    if st.button("Analyze Risk", help="Click to analyze breast cancer risk"):
-        with st.spinner('Analyzing samples...'):
+    clicked, show_results = prediction_requested(
+        "breast_cancer", "Analyze Risk", input_data, help="Click to analyze breast cancer risk"
+    )
+    if show_results:
+        with StageProgress("Analyzing samples", ["Finding similar cases"]) as progress:
             try:
-                # Get input data based on active tab
-                if tab1._active:
-                    input_data = np.array([
-                        mean_radius, mean_texture, mean_perimeter, mean_area, mean_smoothness,
-                        mean_compactness, mean_concavity, mean_concave_points, 0.2, 0.06,
-                        0.4, 0.4, 2.0, 20.0, 0.01, 0.02, 0.02, 0.01, 0.02, 0.003,
-                        16.0, 16.0, 100.0, 700.0, 0.12, 0.15, 0.15, 0.1, 0.25, 0.08
-                    ]).reshape(1, -1)
-                else:
-                    input_data = np.array([
-                        radius_mean, texture_mean, perimeter_mean, area_mean, smoothness_mean,
-                        compactness_mean, concavity_mean, concave_points_mean, symmetry_mean, fractal_dimension_mean,
-                        radius_se, texture_se, perimeter_se, area_se, smoothness_se,
-                        compactness_se, concavity_se, concave_points_se, symmetry_se, fractal_dimension_se,
-                        radius_worst, texture_worst, perimeter_worst, area_worst, smoothness_worst,
-                        compactness_worst, concavity_worst, concave_points_worst, symmetry_worst, fractal_dimension_worst
-                    ]).reshape(1, -1)
-                
-                prediction, similar_cases, similar_outcomes, distances = model.predict(input_data)
+                with progress.stage("Finding similar cases"):
+                    prediction, probability, neighbors, similar_outcomes, distances, risk_factors = model.predict(
+                        input_data, return_risk_factors=True
+                    )
+                    if clicked:
+                        record_assessment(
+                            model, "Breast Cancer", input_data, prediction[0] == 0, probability, risk_factors
+                        )
                 
                 # Show prediction results
                 if prediction[0] == 0:
@@ -607,18 +684,10 @@ def breast_cancer_prediction():
                         "The analysis indicates characteristics commonly associated with malignant breast masses."
                     )
                     
-                    # Show risk factors based on active tab
+                    # Show the risk rules that fired for this input
                     st.subheader("Risk Factors Identified")
-                    if tab1._active:
-                        if mean_radius > 15:
-                            st.warning(f"• Mean radius ({mean_radius:.2f}) is elevated")
-                        if mean_concave_points > 0.05:
-                            st.warning(f"• Mean concave points ({mean_concave_points:.3f}) are high")
-                    else:
-                        if radius_worst > 20:
-                            st.warning(f"• Worst radius ({radius_worst:.2f}) is significantly elevated")
-                        if concave_points_worst > 0.15:
-                            st.warning(f"• Worst concave points ({concave_points_worst:.3f}) are very high")
+                    for factor in risk_factors:
+                        st.warning(f"• {factor}")
                 else:
                     st.success("✅ Low Risk of Breast Cancer")
                     st.info(
@@ -626,7 +695,7 @@ def breast_cancer_prediction():
                     )
                 
                 # Show similar cases
-                with st.expander("View Similar Cases"):
+                def show_similar_cases(similar_cases):
                     st.markdown("### Reference Cases")
                     st.markdown("These are similar cases from our database:")
                     
@@ -639,20 +708,24 @@ def breast_cancer_prediction():
                     })
                     st.dataframe(similar_df)
                 
+                similar_cases_panel(model, "breast_cancer", neighbors, show_similar_cases)
+                
                 show_success_message("Analysis completed successfully!")
             except Exception as e:
                 st.error(f"⚠️ Error during analysis: {str(e)}")
 
 def diabetes_prediction():
+    import numpy as np
+    import pandas as pd
+    
     # Add home button at the top
     add_home_button()
     
-    load_animation()
     st.header("Diabetes Prediction")
     st.write("Enter measurements to predict diabetes risk")
     
     try:
-        model = DiabetesModel.load_model()
+        model = load_page_model('src.models.diabetes', 'DiabetesModel', "diabetes")
     except Exception as e:
         st.error(f"Error loading model: {str(e)}")
         return
@@ -671,51 +744,53 @@ def diabetes_prediction():
         dpf = st.number_input("Diabetes Pedigree Function", value=0.5, min_value=0.0)
         age = st.number_input("Age", value=33, min_value=0)
     
-    if st.button("Predict"):
+    # Calculate derived features
+    glucose_bmi = glucose * bmi / 1000
+    glucose_age = glucose * age / 100
+    
+    input_data = np.array([
+        pregnancies, glucose, blood_pressure, skin_thickness,
+        insulin, bmi, dpf, age, glucose_bmi, glucose_age
+    ]).reshape(1, -1)
+    
+    clicked, show_results = prediction_requested("diabetes", "Predict", input_data)
+    if show_results:
         try:
-            # Calculate derived features
-            glucose_bmi = glucose * bmi / 1000
-            glucose_age = glucose * age / 100
-            
-            input_data = np.array([
-                pregnancies, glucose, blood_pressure, skin_thickness,
-                insulin, bmi, dpf, age, glucose_bmi, glucose_age
-            ]).reshape(1, -1)
-            
-            prediction, similar_cases, similar_outcomes, distances = model.predict(input_data)
+            with StageProgress("Predicting", ["Finding similar cases"]) as progress:
+                with progress.stage("Finding similar cases"):
+                    prediction, probability, neighbors, similar_outcomes, distances, risk_factors = model.predict(
+                        input_data, return_risk_factors=True
+                    )
+                    if clicked:
+                        record_assessment(
+                            model, "Diabetes", input_data, prediction[0] == 1, probability, risk_factors
+                        )
             
-            # Show prediction with risk factors
+            # Show prediction
             if prediction[0] == 1:
                 st.error("High risk of diabetes")
-                if glucose > 140:
-                    st.warning("⚠️ High glucose level detected")
-                if bmi > 30:
-                    st.warning("⚠️ High BMI detected")
             else:
                 st.success("Low risk of diabetes")
             
             # Show similar cases
-            st.write("### Similar Cases from Dataset")
-            st.write("The prediction is based on these similar cases:")
+            def show_similar_cases(similar_cases):
+                st.write("### Similar Cases from Dataset")
+                st.write("The prediction is based on these similar cases:")
+                
+                similar_df = pd.DataFrame({
+                    'Age': similar_cases['Age'].round(1),
+                    'BMI': similar_cases['BMI'].round(1),
+                    'Glucose': similar_cases['Glucose'].round(1),
+                    'Blood Pressure': similar_cases['BloodPressure'].round(1),
+                    'Outcome': ['Diabetic' if o == 1 else 'Non-diabetic' for o in similar_outcomes],
+                    'Similarity': [f"{(1 - d/d.max())*100:.1f}%" for d in distances]
+                })
+                st.dataframe(similar_df)
             
-            similar_df = pd.DataFrame({
-                'Age': similar_cases['Age'].round(1),
-                'BMI': similar_cases['BMI'].round(1),
-                'Glucose': similar_cases['Glucose'].round(1),
-                'Blood Pressure': similar_cases['BloodPressure'].round(1),
-                'Outcome': ['Diabetic' if o == 1 else 'Non-diabetic' for o in similar_outcomes],
-                'Similarity': [f"{(1 - d/d.max())*100:.1f}%" for d in distances]
-            })
-            st.dataframe(similar_df)
+            similar_cases_panel(model, "diabetes", neighbors, show_similar_cases)
             
             # Show risk analysis
             st.write("### Risk Analysis")
-            risk_factors = []
-            if glucose > 140: risk_factors.append(f"Glucose ({glucose} mg/dL) is above normal range")
-            if bmi > 30: risk_factors.append(f"BMI ({bmi:.1f}) indicates obesity")
-            if blood_pressure > 90: risk_factors.append(f"Blood pressure ({blood_pressure} mm Hg) is elevated")
-            if dpf > 0.8: risk_factors.append(f"Diabetes pedigree function ({dpf:.2f}) indicates family history")
-            
             if risk_factors:
                 st.write("Risk factors identified:")
                 for factor in risk_factors:
@@ -727,15 +802,17 @@ def diabetes_prediction():
             st.error(f"Error making prediction: {str(e)}")
 
 def heart_disease_prediction():
+    import numpy as np
+    import pandas as pd
+    
     # Add home button at the top
     add_home_button()
     
-    load_animation()
     st.header("Heart Disease Prediction")
     st.write("Enter measurements to predict heart disease risk")
     
     try:
-        model = HeartDiseaseModel.load_model()
+        model = load_page_model('src.models.heart_disease', 'HeartDiseaseModel', "heart disease")
     except Exception as e:
         st.error(f"Error loading model: {str(e)}")
         return
@@ -761,23 +838,32 @@ def heart_disease_prediction():
         ca = st.number_input("Number of Major Vessels (0-3)", value=0, min_value=0, max_value=3)
         thal = st.selectbox("Thalassemia", ["Normal", "Fixed Defect", "Reversible Defect"])
     
-    if st.button("Predict"):
+    # Convert categorical inputs to numerical
+    sex_num = 1 if sex == "Male" else 0
+    cp_num = ["Typical Angina", "Atypical Angina", "Non-anginal Pain", "Asymptomatic"].index(cp)
+    fbs_num = 1 if fbs == "Yes" else 0
+    restecg_num = ["Normal", "ST-T Wave Abnormality", "Left Ventricular Hypertrophy"].index(restecg)
+    exang_num = 1 if exang == "Yes" else 0
+    slope_num = ["Upsloping", "Flat", "Downsloping"].index(slope)
+    thal_num = ["Normal", "Fixed Defect", "Reversible Defect"].index(thal) + 3
+    
+    input_data = np.array([
+        age, sex_num, cp_num, trestbps, chol, fbs_num, restecg_num,
+        thalach, exang_num, oldpeak, slope_num, ca, thal_num
+    ]).reshape(1, -1)
+    
+    clicked, show_results = prediction_requested("heart_disease", "Predict", input_data)
+    if show_results:
         try:
-            # Convert categorical inputs to numerical
-            sex_num = 1 if sex == "Male" else 0
-            cp_num = ["Typical Angina", "Atypical Angina", "Non-anginal Pain", "Asymptomatic"].index(cp)
-            fbs_num = 1 if fbs == "Yes" else 0
-            restecg_num = ["Normal", "ST-T Wave Abnormality", "Left Ventricular Hypertrophy"].index(restecg)
-            exang_num = 1 if exang == "Yes" else 0
-            slope_num = ["Upsloping", "Flat", "Downsloping"].index(slope)
-            thal_num = ["Normal", "Fixed Defect", "Reversible Defect"].index(thal) + 3
-            
-            input_data = np.array([
-                age, sex_num, cp_num, trestbps, chol, fbs_num, restecg_num,
-                thalach, exang_num, oldpeak, slope_num, ca, thal_num
-            ]).reshape(1, -1)
-            
-            prediction, similar_cases, similar_outcomes, distances = model.predict(input_data)
+            with StageProgress("Predicting", ["Finding similar cases"]) as progress:
+                with progress.stage("Finding similar cases"):
+                    prediction, probability, neighbors, similar_outcomes, distances, risk_factors = model.predict(
+                        input_data, return_risk_factors=True
+                    )
+                    if clicked:
+                        record_assessment(
+                            model, "Heart Disease", input_data, prediction[0] == 1, probability, risk_factors
+                        )
             
             # Show prediction and risk analysis
             if prediction[0] == 1:
@@ -785,23 +871,6 @@ def heart_disease_prediction():
                 
                 # Show specific risk factors
                 st.write("### Risk Factors Identified:")
-                risk_factors = []
-                
-                if age > 60:
-                    risk_factors.append(f"Age ({age} years) - Higher risk with increasing age")
-                if cp_num >= 2:
-                    risk_factors.append("Chest Pain Type indicates potential issue")
-                if trestbps > 140:
-                    risk_factors.append(f"High Blood Pressure ({trestbps} mm Hg)")
-                if chol > 240:
-                    risk_factors.append(f"High Cholesterol ({chol} mg/dl)")
-                if thalach < 120:
-                    risk_factors.append(f"Low Maximum Heart Rate ({thalach} bpm)")
-                if oldpeak > 2:
-                    risk_factors.append(f"Significant ST Depression ({oldpeak})")
-                if ca > 0:
-                    risk_factors.append(f"Number of Major Vessels: {ca}")
-                
                 for factor in risk_factors:
                     st.warning(f"⚠️ {factor}")
             else:
@@ -822,28 +891,34 @@ def heart_disease_prediction():
                         st.info(f"✓ {factor}")
             
             # Show similar cases
-            st.write("### Similar Cases from Dataset")
-            st.write("The prediction is based on these similar cases:")
+            def show_similar_cases(similar_cases):
+                st.write("### Similar Cases from Dataset")
+                st.write("The prediction is based on these similar cases:")
+                
+                similar_df = pd.DataFrame({
+                    'Age': similar_cases['age'].round(0),
+                    'Sex': ['Male' if s == 1 else 'Female' for s in similar_cases['sex']],
+                    'Blood Pressure': similar_cases['trestbps'].round(0),
+                    'Cholesterol': similar_cases['chol'].round(0),
+                    'Max Heart Rate': similar_cases['thalach'].round(0),
+                    'Outcome': ['High Risk' if o == 1 else 'Low Risk' for o in similar_outcomes],
+                    'Similarity': [f"{(1 - d/d.max())*100:.1f}%" for d in distances]
+                })
+                st.dataframe(similar_df)
             
-            similar_df = pd.DataFrame({
-                'Age': similar_cases['age'].round(0),
-                'Sex': ['Male' if s == 1 else 'Female' for s in similar_cases['sex']],
-                'Blood Pressure': similar_cases['trestbps'].round(0),
-                'Cholesterol': similar_cases['chol'].round(0),
-                'Max Heart Rate': similar_cases['thalach'].round(0),
-                'Outcome': ['High Risk' if o == 1 else 'Low Risk' for o in similar_outcomes],
-                'Similarity': [f"{(1 - d/d.max())*100:.1f}%" for d in distances]
-            })
-            st.dataframe(similar_df)
+            similar_cases_panel(model, "heart_disease", neighbors, show_similar_cases)
             
         except Exception as e:
             st.error(f"Error making prediction: {str(e)}")
 
 def parkinsons_prediction():
+    import numpy as np
+    import pandas as pd
+    from src.config import PARKINSONS_MODEL_PATH
+    
     # Add home button at the top
     add_home_button()
     
-    load_animation()
     st.header("Parkinsons Disease Prediction")
     st.write("Enter the following measurements:")
     
@@ -859,7 +934,7 @@ def parkinsons_prediction():
         return
     
     try:
-        model = ParkinsonsModel.load_model()
+        model = load_page_model('src.models.parkinsons', 'ParkinsonsModel', "Parkinson's")
     except Exception as e:
         st.error(f"Error loading model: {str(e)}")
         return
@@ -892,38 +967,29 @@ def parkinsons_prediction():
         d2 = st.number_input("D2", min_value=1.423287, max_value=3.671155, value=2.301442, format="%.6f")
         ppe = st.number_input("PPE", min_value=0.044539, max_value=0.527367, value=0.284654, format="%.6f")
     
-    if st.button("Predict"):
+    input_data = np.array([
+        mdvp_fo, mdvp_fhi, mdvp_flo, mdvp_jitter, mdvp_jitter_abs,
+        mdvp_rap, mdvp_ppq, jitter_ddp, mdvp_shimmer, mdvp_shimmer_db,
+        shimmer_apq3, shimmer_apq5, mdvp_apq, shimmer_dda, nhr, hnr,
+        rpde, dfa, spread1, spread2, d2, ppe
+    ]).reshape(1, -1)
+    
+    clicked, show_results = prediction_requested("parkinsons", "Predict", input_data)
+    if show_results:
         try:
-            input_data = np.array([
-                mdvp_fo, mdvp_fhi, mdvp_flo, mdvp_jitter, mdvp_jitter_abs,
-                mdvp_rap, mdvp_ppq, jitter_ddp, mdvp_shimmer, mdvp_shimmer_db,
-                shimmer_apq3, shimmer_apq5, mdvp_apq, shimmer_dda, nhr, hnr,
-                rpde, dfa, spread1, spread2, d2, ppe
-            ]).reshape(1, -1)
-            
-            prediction, similar_cases, similar_outcomes, distances = model.predict(input_data)
+            with StageProgress("Predicting", ["Finding similar cases"]) as progress:
+                with progress.stage("Finding similar cases"):
+                    prediction, probability, neighbors, similar_outcomes, distances, risk_factors = model.predict(
+                        input_data, return_risk_factors=True
+                    )
+                    if clicked:
+                        record_assessment(
+                            model, "Parkinson's", input_data, prediction[0] == 1, probability, risk_factors
+                        )
             
             if prediction[0] == 1:
                 st.error("⚠️ High risk of Parkinson's disease")
                 st.write("### Risk Factors Identified:")
-                risk_factors = []
-                if mdvp_jitter > 0.008:
-                    risk_factors.append(f"High Jitter ({mdvp_jitter:.5f}%) indicates vocal instability")
-                if mdvp_jitter_abs > 0.0004:
-                    risk_factors.append(f"High Absolute Jitter ({mdvp_jitter_abs:.5f}) indicates frequency instability")
-                if mdvp_shimmer > 0.04:
-                    risk_factors.append(f"High Shimmer ({mdvp_shimmer:.5f}) indicates amplitude variations")
-                if mdvp_shimmer_db > 0.4:
-                    risk_factors.append(f"High Shimmer dB ({mdvp_shimmer_db:.5f}dB) indicates amplitude instability")
-                if hnr < 20:
-                    risk_factors.append(f"Low HNR ({hnr:.3f}) indicates voice quality issues")
-                if nhr > 0.03:
-                    risk_factors.append(f"High NHR ({nhr:.5f}) indicates increased noise")
-                if rpde > 0.5:
-                    risk_factors.append(f"High RPDE ({rpde:.3f}) indicates increased vocal complexity")
-                if dfa < 0.65:
-                    risk_factors.append(f"Low DFA ({dfa:.3f}) indicates changes in vocal pattern")
-                
                 for factor in risk_factors:
                     st.warning(f"⚠️ {factor}")
             else:
@@ -944,24 +1010,32 @@ def parkinsons_prediction():
                         st.info(f"✓ {factor}")
             
             # Show similar cases
-            st.write("### Similar Cases from Dataset")
-            similar_df = pd.DataFrame({
-                'Jitter(%)': similar_cases['MDVP:Jitter(%)'].round(5),
-                'Shimmer': similar_cases['MDVP:Shimmer'].round(5),
-                'HNR': similar_cases['HNR'].round(2),
-                'RPDE': similar_cases['RPDE'].round(3),
-                'DFA': similar_cases['DFA'].round(3),
-                'Diagnosis': ['Parkinson\'s' if o == 1 else 'Healthy' for o in similar_outcomes],
-                'Similarity': [f"{(1 - d/d.max())*100:.1f}%" for d in distances]
-            })
-            st.dataframe(similar_df)
+            def show_similar_cases(similar_cases):
+                st.write("### Similar Cases from Dataset")
+                similar_df = pd.DataFrame({
+                    'Jitter(%)': similar_cases['MDVP:Jitter(%)'].round(5),
+                    'Shimmer': similar_cases['MDVP:Shimmer'].round(5),
+                    'HNR': similar_cases['HNR'].round(2),
+                    'RPDE': similar_cases['RPDE'].round(3),
+                    'DFA': similar_cases['DFA'].round(3),
+                    'Diagnosis': ['Parkinson\'s' if o == 1 else 'Healthy' for o in similar_outcomes],
+                    'Similarity': [f"{(1 - d/d.max())*100:.1f}%" for d in distances]
+                })
+                st.dataframe(similar_df)
+            
+            similar_cases_panel(model, "parkinsons", neighbors, show_similar_cases)
             
         except Exception as e:
             st.error(f"Error making prediction: {str(e)}")
 
 def show_patient_history():
     """Display patient history visualization with interactive elements"""
+    import pandas as pd
+    import plotly.express as px
+    from src.history import ASSESSMENT_TYPES, get_history
+    
     st.markdown("### 📈 Patient History Tracker")
+    history = get_history()
     
     # Add date range selector
     col1, col2 = st.columns(2)
@@ -971,26 +1045,27 @@ def show_patient_history():
         end_date = st.date_input("To Date", value=datetime.now())
     
     # Add assessment type filter
-    assessment_types = ["All", "Breast Cancer", "Diabetes", "Heart Disease", "Parkinson's"]
+    assessment_types = ["All"] + ASSESSMENT_TYPES
     selected_type = st.multiselect("Filter by Assessment Type", assessment_types, default=["All"])
-    
-    # Mock data for demonstration - Fixed: Ensure all arrays have same length
-    num_records = 14  # Define a fixed number of records
-    history_data = {
-        'Date': pd.date_range(start='2024-01-01', periods=num_records, freq='W'),
-        'Risk Score': np.random.uniform(0.2, 0.8, size=num_records),
-        'Assessment Type': np.random.choice(assessment_types[1:], size=num_records),
-        'Status': np.random.choice(['Normal', 'Warning', 'Critical'], size=num_records),
-        'Doctor': np.random.choice(['Dr. Smith', 'Dr. Johnson', 'Dr. Williams'], size=num_records)
-    }
-    df = pd.DataFrame(history_data)
+    types = None if not selected_type or "All" in selected_type else selected_type
+    patient_id = st.session_state.get("patient_id") or None
+    if patient_id:
+        st.caption(f"Showing assessments of patient {patient_id}")
+    
+    # Filtering and aggregation run in SQL on the indexed assessment history
+    summary = history.summary(start_date, end_date, types, patient_id)
+    if not summary['assessments']:
+        st.info("No assessments recorded in this period yet. Completed predictions are saved here.")
+        return
     
     # Create tabs for different views
     tab1, tab2 = st.tabs(["📊 Trend Analysis", "📋 Detailed Records"])
     
     with tab1:
         # Plot interactive trend
-        fig = px.line(df, x='Date', y='Risk Score', color='Assessment Type',
+        daily = pd.DataFrame(history.daily_risk(start_date, end_date, types, patient_id))
+        fig = px.line(daily, x='day', y='risk_score', color='assessment_type', markers=True,
+                     labels={'day': 'Date', 'risk_score': 'Risk Score', 'assessment_type': 'Assessment Type'},
                      title='Risk Score Trends Over Time')
         fig.update_layout(height=400)
         st.plotly_chart(fig, use_container_width=True)
@@ -998,28 +1073,35 @@ def show_patient_history():
         # Add summary metrics
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Average Risk Score", f"{df['Risk Score'].mean():.2f}", 
-                     delta=f"{(df['Risk Score'].iloc[-1] - df['Risk Score'].iloc[0]):.2f}")
+            st.metric("Average Risk Score", f"{summary['mean_risk']:.2f}", 
+                     delta=f"{(summary['last_risk'] - summary['first_risk']):.2f}")
         with col2:
-            st.metric("Assessments", len(df), delta="↑2 from last month")
+            st.metric("Assessments", summary['assessments'])
         with col3:
-            st.metric("Critical Alerts", len(df[df['Status'] == 'Critical']), 
-                     delta="-1 from last month")
+            st.metric("Critical Alerts", summary['critical'])
     
     with tab2:
         # Add search and filter options
         search = st.text_input("Search records...")
-        filtered_df = df[df.astype(str).apply(lambda x: x.str.contains(search, case=False)).any(axis=1)]
+        records = pd.DataFrame(history.assessments(start_date, end_date, types, patient_id, search=search))
+        if records.empty:
+            st.info("No records match the search.")
+            return
+        records.columns = ['Patient', 'Assessment Type', 'Date', 'Risk Score', 'Status', 'Risk Factors']
         
         # Display detailed records with styling
         st.dataframe(
-            filtered_df.style.apply(lambda x: ['background-color: #ffcccc' if v == 'Critical' 
-                                             else 'background-color: #ffffcc' if v == 'Warning'
-                                             else '' for v in x], subset=['Status'])
+            records.style.apply(lambda x: ['background-color: #ffcccc' if v == 'Critical' 
+                                          else 'background-color: #ffffcc' if v == 'Warning'
+                                          else '' for v in x], subset=['Status'])
         )
 
 def export_report():
     """Generate and export comprehensive assessment report"""
+    import tempfile
+    from src.history import get_history
+    from src.reports import MIME_TYPES, write_report
+    
     st.markdown("### 📄 Export Assessment Report")
     
     # Report configuration
@@ -1027,48 +1109,65 @@ def export_report():
     with col1:
         report_format = st.selectbox(
             "Report Format",
-            ["PDF", "CSV", "JSON", "Excel"]
+            ["CSV", "JSON Lines", "Excel"]
         )
         include_graphs = st.checkbox("Include Visualizations", value=True)
+        start_date = st.date_input("Report From", value=datetime(2024, 1, 1), key="report_start")
     with col2:
         report_type = st.selectbox(
             "Report Type",
             ["Summary", "Detailed", "Technical"]
         )
         include_recommendations = st.checkbox("Include Recommendations", value=True)
+        end_date = st.date_input("Report To", value=datetime.now(), key="report_end")
+    extension = {"CSV": "csv", "JSON Lines": "jsonl", "Excel": "xlsx"}[report_format]
+    patient_id = st.session_state.get("patient_id") or None
     
     # Generate report
     if st.button("Generate Report", type="primary"):
-        with st.spinner("Generating comprehensive report..."):
-            # Simulate report generation
-            progress_bar = st.progress(0)
-            for i in range(100):
-                time.sleep(0.01)
-                progress_bar.progress(i + 1)
+        with StageProgress("Generating report", ["Building report"]) as progress:
+            with progress.stage("Building report"):
+                # Rows stream from the history into a temporary file, so building the report
+                # takes the same memory for any number of assessments
+                report_file = tempfile.TemporaryFile()
+                write_report(
+                    report_file, extension, report_type.lower(), start_date, end_date,
+                    patient_id=patient_id, include_charts=include_graphs,
+                    include_recommendations=include_recommendations
+                )
+                report_file.seek(0)
             
             # Show success message
             st.success(f"Report generated successfully in {report_format} format!")
             
-            # Provide download option
-            if report_format == "PDF":
-                mime = "application/pdf"
-            elif report_format == "CSV":
-                mime = "text/csv"
-            elif report_format == "JSON":
-                mime = "application/json"
-            else:
-                mime = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            if include_graphs:
+                import pandas as pd
+                import plotly.express as px
+                
+                daily = pd.DataFrame(get_history().daily_risk(start_date, end_date, patient_id=patient_id))
+                if not daily.empty:
+                    fig = px.line(daily, x='day', y='risk_score', color='assessment_type', markers=True,
+                                 labels={'day': 'Date', 'risk_score': 'Risk Score', 'assessment_type': 'Assessment Type'},
+                                 title='Mean Risk Score per Day')
+                    st.plotly_chart(fig, use_container_width=True)
+                if extension != "xlsx":
+                    st.caption(f"The chart is shown here only; {report_format} files cannot hold charts.")
             
+            # Provide download option
             st.download_button(
                 label=f"📥 Download {report_format} Report",
-                data=b"Sample report data",  # Replace with actual report generation
-                file_name=f"medical_report_{datetime.now().strftime('%Y%m%d')}_{report_type.lower()}.{report_format.lower()}",
-                mime=mime,
+                data=report_file,
+                file_name=f"medical_report_{datetime.now().strftime('%Y%m%d')}_{report_type.lower()}.{extension}",
+                mime=MIME_TYPES[extension],
                 key="download_report"
             )
 
 def show_risk_factors_analysis():
     """Display comprehensive risk factors analysis with interactive elements"""
+    import numpy as np
+    import pandas as pd
+    import plotly.express as px
+    
     st.markdown("### 🔍 Risk Factors Analysis")
     
     # Create tabs for different analyses
@@ -1189,7 +1288,13 @@ def show_recommendations():
 
 def show_trends_analysis():
     """Display comprehensive health trends analysis"""
+    import pandas as pd
+    import plotly.express as px
+    from src.history import TREND_METRICS, get_history
+    
     st.markdown("### 📊 Health Trends Analysis")
+    history = get_history()
+    patient_id = st.session_state.get("patient_id") or None
     
     # Date range selector
     col1, col2 = st.columns(2)
@@ -1198,59 +1303,68 @@ def show_trends_analysis():
     with col2:
         end_date = st.date_input("End Date", value=datetime.now(), key="trends_end")
     
-    # Mock data
-    dates = pd.date_range(start='2024-01-01', end='2024-04-01', freq='D')
-    trends_data = {
-        'Date': dates,
-        'Blood Pressure': np.random.normal(120, 5, len(dates)),
-        'Glucose Level': np.random.normal(100, 3, len(dates)),
-        'BMI': np.random.normal(25, 0.5, len(dates)),
-        'Cholesterol': np.random.normal(180, 10, len(dates)),
-        'Heart Rate': np.random.normal(75, 3, len(dates))
-    }
-    df = pd.DataFrame(trends_data)
-    
     # Metric selector
-    metrics = list(df.columns[1:])
+    metrics = list(TREND_METRICS)
     selected_metrics = st.multiselect("Select metrics to analyze", metrics, default=[metrics[0]])
     
     if selected_metrics:
+        # Daily means come straight out of SQL, from the inputs recorded with each assessment
+        df = pd.DataFrame(history.metric_trends(start_date, end_date, selected_metrics, patient_id))
+        if df.empty:
+            st.info("No assessments recorded in this period yet.")
+            return
+        
         # Create interactive line chart
-        fig = px.line(df, x='Date', y=selected_metrics,
+        fig = px.line(df, x='day', y=selected_metrics, labels={'day': 'Date'},
                      title='Health Metrics Trends Over Time')
         fig.update_layout(height=400)
         st.plotly_chart(fig, use_container_width=True)
         
         # Add statistical analysis
         st.markdown("#### Statistical Analysis")
+        statistics = history.metric_summary(start_date, end_date, selected_metrics, patient_id)
         col1, col2, col3 = st.columns(3)
         for metric in selected_metrics:
+            values = df[metric].dropna()
+            if values.empty:
+                st.caption(f"{metric}: not recorded in this period")
+                continue
             with col1:
                 st.metric(f"{metric} Average", 
-                         f"{df[metric].mean():.1f}",
-                         delta=f"{df[metric].iloc[-1] - df[metric].iloc[0]:.1f}")
+                         f"{statistics[metric]['mean']:.1f}",
+                         delta=f"{values.iloc[-1] - values.iloc[0]:.1f}")
             with col2:
                 st.metric(f"{metric} Min",
-                         f"{df[metric].min():.1f}")
+                         f"{statistics[metric]['min']:.1f}")
             with col3:
                 st.metric(f"{metric} Max",
-                         f"{df[metric].max():.1f}")
+                         f"{statistics[metric]['max']:.1f}")
 
 def compare_assessments():
     """Compare different assessment results"""
+    from src.history import ASSESSMENT_TYPES, get_history
+    
     st.markdown("### 🔄 Compare Assessments")
     
+    assessment_type = st.selectbox("Assessment Type", ASSESSMENT_TYPES, key="compare_type")
+    latest = get_history().latest(st.session_state.get("patient_id") or None, assessment_type, limit=2)
+    if len(latest) < 2:
+        st.info(f"Two {assessment_type} assessments are needed for a comparison.")
+        return
+    current, previous = latest
+    
     col1, col2 = st.columns(2)
     
     with col1:
         st.markdown("#### Previous Assessment")
-        st.metric(label="Risk Score", value="75%", delta="-15%")
-        st.date_input("Assessment Date", value=datetime(2024, 1, 1))
+        st.metric(label="Risk Score", value=f"{previous['risk_score']:.0%}")
+        st.caption(f"{previous['assessed_at']} · {previous['status']}")
         
     with col2:
         st.markdown("#### Current Assessment")
-        st.metric(label="Risk Score", value="60%", delta="-5%")
-        st.date_input("Assessment Date", value=datetime.now())
+        st.metric(label="Risk Score", value=f"{current['risk_score']:.0%}",
+                 delta=f"{current['risk_score'] - previous['risk_score']:+.0%}", delta_color="inverse")
+        st.caption(f"{current['assessed_at']} · {current['status']}")
 
 def main():
     # Initialize session state if not exists
@@ -1263,6 +1377,10 @@ def main():
         st.title("Medical AI Assistant")
         st.caption("v1.0.0")
         
+        # Assessments are saved to the history under this ID
+        st.text_input("Patient ID", key="patient_id", placeholder="anonymous")
+        
+
         # Navigation
         pages = {
             "🏠 Home": "Home",
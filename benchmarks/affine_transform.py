@@ -0,0 +1,85 @@
+"""Compare the fused affine input transform against the scaler + feature-weight loop it replaces.
+
+Query rows are the model's reference set mapped back to raw units, so every
+model can be benchmarked without its source dataset. The script also checks
+that both transforms give the same neighbors and distances.
+
+Usage: python benchmarks/affine_transform.py [--repeat N] [--batch ROWS]
+"""
+import argparse
+import statistics
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.model import BreastCancerModel
+from src.models.diabetes import DiabetesModel
+from src.models.heart_disease import HeartDiseaseModel
+from src.models.parkinsons import ParkinsonsModel
+
+MODEL_CLASSES = [BreastCancerModel, DiabetesModel, HeartDiseaseModel, ParkinsonsModel]
+
+def legacy_transform(model, X_raw):
+    """The per-call path used before the transform was fused"""
+    X = pd.DataFrame(X_raw, columns=model.feature_names)
+    if model.scaler:
+        X = pd.DataFrame(model.scaler.transform(X), columns=model.feature_names)
+    for feature, weight in model.feature_weights.items():
+        if feature in X.columns:
+            X[feature] = X[feature] * weight
+    return X.to_numpy()
+
+def time_call(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--batch', type=int, default=1000, help="Rows in the batch timing")
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    print(f"{'model':<20}{'legacy us':>11}{'fused us':>10}{'speedup':>9}"
+          f"{'legacy batch ms':>17}{'fused batch ms':>16}{'parity':>8}")
+    failures = 0
+    for model_cls in MODEL_CLASSES:
+        model = model_cls.load_model()
+        reference = np.asarray(model.X_train, dtype=np.float64)
+        X_raw = (reference - model.input_offset) / model.input_coef
+        batch = X_raw[np.arange(args.batch) % len(X_raw)]
+
+        single_legacy = time_call(lambda: legacy_transform(model, X_raw[:1]), args.repeat)
+        single_fused = time_call(lambda: model.transform_inputs(X_raw[:1]), args.repeat)
+        batch_legacy = time_call(lambda: legacy_transform(model, batch), max(1, args.repeat // 10))
+        batch_fused = time_call(lambda: model.transform_inputs(batch), max(1, args.repeat // 10))
+
+        # Rounding differs in the last bits, so compare the kNN results rather than exact floats
+        legacy_distances, legacy_indices = model.kneighbors(legacy_transform(model, X_raw))
+        fused_distances, fused_indices = model.kneighbors(model.transform_inputs(X_raw))
+        outcomes = np.asarray(model.y_train)
+        parity = (
+            np.allclose(legacy_distances, fused_distances, atol=1e-9)
+            and np.array_equal(outcomes[legacy_indices], outcomes[fused_indices])
+        )
+        failures += not parity
+
+        print(
+            f"{model_cls.__name__:<20}{single_legacy * 1e6:>11.1f}{single_fused * 1e6:>10.1f}"
+            f"{single_legacy / single_fused:>8.1f}x{batch_legacy * 1000:>17.3f}{batch_fused * 1000:>16.3f}"
+            f"{'ok' if parity else 'FAIL':>8}"
+        )
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""Compare load time of the legacy pickle artifacts against the memory-mappable format.
+
+Usage: python benchmarks/artifact_load.py [--repeat N]
+"""
+import argparse
+import os
+import pickle
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.model import BreastCancerModel
+from src.models.artifact import load_model_artifact, save_model_artifact
+from src.models.diabetes import DiabetesModel
+from src.models.heart_disease import HeartDiseaseModel
+from src.models.parkinsons import ParkinsonsModel
+
+MODEL_CLASSES = [BreastCancerModel, DiabetesModel, HeartDiseaseModel, ParkinsonsModel]
+
+def load_pickle(model_cls):
+    instance = model_cls()
+    with open(instance.model_path, 'rb') as f:
+        model_data = pickle.load(f)
+    instance.model = model_data['model']
+    instance.scaler = model_data['scaler']
+    instance.X_train = model_data['X_train']
+    instance.y_train = model_data['y_train']
+    return instance
+
+def time_call(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    print(f"{'model':<20}{'pickle ms':>12}{'mmap ms':>12}{'speedup':>10}{'pickle KB':>12}{'mmap KB':>12}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for model_cls in MODEL_CLASSES:
+            if not os.path.exists(model_cls().model_path):
+                print(f"{model_cls.__name__:<20}  (no pickle, train the model first)")
+                continue
+            # Convert into a scratch file so the benchmark never touches models/
+            mmap_path = os.path.join(tmp_dir, f"{model_cls.__name__}.mmap")
+            save_model_artifact(load_pickle(model_cls), mmap_path)
+
+            pickle_time = time_call(lambda: load_pickle(model_cls), args.repeat)
+            mmap_time = time_call(lambda: load_model_artifact(model_cls(), mmap_path), args.repeat)
+            print(
+                f"{model_cls.__name__:<20}{pickle_time * 1000:>12.2f}{mmap_time * 1000:>12.2f}"
+                f"{pickle_time / mmap_time:>9.1f}x"
+                f"{os.path.getsize(model_cls().model_path) / 1024:>12.1f}{os.path.getsize(mmap_path) / 1024:>12.1f}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Parity and memory check of the compact (float32 / uint8) reference set.
+
+For every trained kNN model the compact model is written to and reloaded from
+a scratch artifact, then scored against the float64 model on the held-out
+split (the dataset rows that are not in the reference set). Predictions and
+neighbor rankings must match exactly; probabilities and distances are
+reported as the largest difference. The float64 side uses the compact model's
+engine as well, so only the float32 rounding is compared, and predictions are
+also checked against the model as it is served (float64, default engine).
+
+Exits with status 1 on any prediction or ranking mismatch.
+
+Usage: python benchmarks/compact_reference.py [--only diabetes heart_disease]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+
+from suite import MODEL_CLASSES
+from src.batch_scoring import DISEASES
+from src.models.artifact import load_model_artifact, save_model_artifact
+
+DATASETS = {
+    'diabetes': ROOT / 'datasets' / 'diabetes.csv',
+    'heart_disease': ROOT / 'datasets' / 'heart.csv',
+    'parkinsons': ROOT / 'datasets' / 'parkinsons.csv'
+}
+
+def dataset_features(name, model):
+    """Raw feature frame of the whole dataset, indexed like the reference set"""
+    if name == 'breast_cancer':
+        from sklearn.datasets import load_breast_cancer
+        df = load_breast_cancer(as_frame=True).data
+    else:
+        df = pd.read_csv(DATASETS[name])
+        prepare = DISEASES[name][1]
+        if prepare is not None:
+            df = prepare(df)
+    return df[model.feature_names].apply(pd.to_numeric, errors='coerce')
+
+def held_out(name, model):
+    df = dataset_features(name, model)
+    rows = df[~df.index.isin(model.X_train.index)].to_numpy(dtype=np.float64)
+    return rows[model.valid_rows(rows)]
+
+def reference_bytes(model):
+    """Bytes of the reference rows and labels"""
+    return np.asarray(model.X_train).nbytes + np.asarray(model.y_train).nbytes
+
+def check(name, model_cls):
+    served = model_cls.load_model()
+    compact = model_cls.load_model().compact()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, f"{name}.mmap")
+        save_model_artifact(compact, path)
+        compact = load_model_artifact(model_cls(), path)
+        compact.prepare_transform()
+        compact_file = os.path.getsize(path)
+        save_model_artifact(served, path)
+        float64_file = os.path.getsize(path)
+
+    # Same engine as the compact model, so only the float32 rounding differs
+    float64 = model_cls.load_model()
+    float64.index_engine = compact.index_engine
+    float64.build_index()
+
+    X = held_out(name, served)
+    expected, expected_prob, expected_idx, expected_dist = float64.predict_batch(X)
+    predictions, prob, idx, dist = compact.predict_batch(X)
+    served_predictions = served.predict_batch(X)[0]
+
+    result = {
+        'rows': len(X),
+        'predictions': int((predictions == expected).sum()),
+        'served': int((predictions == served_predictions).sum()),
+        'rankings': int((idx == expected_idx).all(axis=1).sum()),
+        'max_prob_diff': float(np.abs(prob - expected_prob).max()),
+        'max_dist_diff': float(np.abs(dist - expected_dist).max()),
+        'float64_bytes': reference_bytes(float64),
+        'compact_bytes': reference_bytes(compact),
+        'float64_file': float64_file,
+        'compact_file': compact_file,
+        'engine': compact.index_engine
+    }
+    result['ok'] = result['predictions'] == result['rankings'] == len(X)
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--only', nargs='+', choices=sorted(MODEL_CLASSES), help="Models to check (default: all)")
+    args = parser.parse_args(argv)
+    warnings.filterwarnings('ignore')
+
+    print(
+        f"{'model':<15}{'engine':<8}{'held out':>9}{'preds':>7}{'served':>8}{'ranks':>7}"
+        f"{'max dprob':>11}{'max ddist':>11}{'reference KiB':>17}{'artifact KiB':>17}"
+    )
+    failed = []
+    for name in args.only or MODEL_CLASSES:
+        model_cls = MODEL_CLASSES[name]
+        if not os.path.exists(model_cls().stored_model_path()):
+            print(f"{name}: no trained model, skipped")
+            continue
+        r = check(name, model_cls)
+        if not r['ok']:
+            failed.append(name)
+        print(
+            f"{name:<15}{r['engine']:<8}{r['rows']:>9}{r['predictions']:>7}{r['served']:>8}{r['rankings']:>7}"
+            f"{r['max_prob_diff']:>11.2e}{r['max_dist_diff']:>11.2e}"
+            f"{r['float64_bytes'] / 1024:>8.1f} ->{r['compact_bytes'] / 1024:>6.1f}"
+            f"{r['float64_file'] / 1024:>8.1f} ->{r['compact_file'] / 1024:>6.1f}"
+        )
+    if failed:
+        print(f"Mismatch for: {', '.join(failed)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Write and query cost of the SQLite assessment history.
+
+Fills a scratch history with ``--records`` synthetic assessments spread over
+``--days`` days and ``--patients`` patients, and reports how long record()
+blocks the caller (it only enqueues), how long the background writer takes to
+commit everything, and the median latency of the queries behind the history
+pages: one patient's records in a month, the daily risk trend of one
+assessment type, the summary metrics and a daily metric trend. The same
+history page summary computed the old way, by loading the rows into a
+DataFrame and filtering in pandas, is timed for comparison.
+
+Usage: python benchmarks/history_store.py [--records 100000] [--days 365] [--patients 500]
+"""
+import argparse
+import datetime
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.history import ASSESSMENT_TYPES, AssessmentHistory
+
+def fill(history, records, days, patients, rng):
+    start = datetime.datetime(2024, 1, 1)
+    minutes = np.sort(rng.integers(0, days * 24 * 60, records))
+    latencies = []
+    begin = time.perf_counter()
+    for minute in minutes:
+        high_risk = rng.random() < 0.3
+        inputs = {'Glucose': float(rng.normal(120, 30)), 'BMI': float(rng.normal(28, 5)),
+                  'chol': float(rng.normal(220, 40)), 'thalach': float(rng.normal(150, 20))}
+        call = time.perf_counter()
+        history.record(
+            f"P{rng.integers(patients):05d}", ASSESSMENT_TYPES[rng.integers(len(ASSESSMENT_TYPES))],
+            high_risk, float(rng.random()), inputs, ["Elevated glucose"] if rng.random() < 0.4 else [],
+            assessed_at=start + datetime.timedelta(minutes=int(minute))
+        )
+        latencies.append(time.perf_counter() - call)
+    enqueued = time.perf_counter() - begin
+    history.flush()
+    return latencies, enqueued, time.perf_counter() - begin
+
+def median_ms(function, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+def pandas_summary(path, start, end, assessment_type):
+    """The history page summary the DataFrame way: load every row, then filter"""
+    with sqlite3.connect(path) as connection:
+        df = pd.read_sql_query("SELECT assessment_type, assessed_at, risk_score, status FROM assessments", connection)
+    df['assessed_at'] = pd.to_datetime(df['assessed_at'])
+    df = df[(df['assessed_at'] >= pd.Timestamp(start)) & (df['assessed_at'] < pd.Timestamp(end) + pd.Timedelta(days=1))
+            & (df['assessment_type'] == assessment_type)]
+    return len(df), df['risk_score'].mean(), int((df['status'] == 'Critical').sum())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=100000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--patients', type=int, default=500)
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    path = str(Path(tempfile.mkdtemp()) / "assessments.db")
+    history = AssessmentHistory(path)
+    latencies, enqueued, committed = fill(history, args.records, args.days, args.patients, np.random.default_rng(0))
+    print(f"{args.records} assessments: record() p50 {statistics.median(latencies) * 1e6:.1f} us, "
+          f"max {max(latencies) * 1000:.2f} ms; enqueued in {enqueued:.2f} s, all committed after {committed:.2f} s "
+          f"({args.records / committed:.0f} rows/s)")
+
+    start, end = datetime.date(2024, 3, 1), datetime.date(2024, 3, 31)
+    queries = {
+        'patient records (month)': lambda: history.assessments(start, end, patient_id="P00042"),
+        'daily risk (one type)': lambda: history.daily_risk(start, end, ["Diabetes"]),
+        'summary (one type)': lambda: history.summary(start, end, ["Diabetes"]),
+        'metric trend (2 metrics)': lambda: history.metric_trends(start, end, ["Glucose Level", "BMI"]),
+        'summary via DataFrame': lambda: pandas_summary(path, start, end, "Diabetes")
+    }
+    print(f"{'query':<28}{'p50 ms':>10}")
+    for name, query in queries.items():
+        print(f"{name:<28}{median_ms(query, args.repeats):>10.2f}")
+
+    expected = pandas_summary(path, start, end, "Diabetes")
+    summary = history.summary(start, end, ["Diabetes"])
+    history.close()
+    same = expected[0] == summary['assessments'] and expected[2] == summary['critical'] \
+        and np.isclose(expected[1], summary['mean_risk'])
+    print(f"SQL summary matches the DataFrame summary: {'yes' if same else 'NO'}")
+    if not same:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Import-time report for the Streamlit app's startup and each page.
+
+Every import group runs in a fresh interpreter under ``python -X importtime``.
+``startup`` times the modules app/streamlit_app.py imports at module level,
+read from its source, so a new top-level import shows up here. The pages run
+after those startup imports, so each only shows what it adds on first visit.
+``legacy_startup`` is what the app imported up front before the imports were
+moved into the pages.
+
+A startup module that cannot be imported fails the measurement; page modules
+that are not installed are reported under the page.
+
+Usage: python benchmarks/import_time.py [--pages home breast_cancer] [--repeat 3] [--top 8]
+"""
+import argparse
+import ast
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+APP_PATH = ROOT / 'app' / 'streamlit_app.py'
+
+# Modules each page imports on first visit, on top of the startup imports
+PAGES = {
+    'home_additional_features': ['numpy', 'pandas', 'plotly.express'],
+    'breast_cancer': ['numpy', 'pandas', 'src.config', 'src.model', 'src.models.registry', 'src.models.paths'],
+    'diabetes': ['numpy', 'pandas', 'src.models.diabetes', 'src.models.registry', 'src.models.paths'],
+    'heart_disease': ['numpy', 'pandas', 'src.models.heart_disease', 'src.models.registry', 'src.models.paths'],
+    'parkinsons': ['numpy', 'pandas', 'src.config', 'src.models.parkinsons', 'src.models.registry',
+                   'src.models.paths'],
+    'legacy_startup': ['numpy', 'pandas', 'plotly.express', 'src.model', 'src.models.diabetes',
+                       'src.models.heart_disease', 'src.models.parkinsons', 'src.models.registry',
+                       'src.models.artifact', 'src.config']
+}
+
+MARKER = '--page-imports--'
+
+def startup_modules(path=APP_PATH):
+    """Modules the script at ``path`` imports at module level, that is outside its functions and classes"""
+    modules = []
+    pending = [ast.parse(path.read_text(), str(path))]
+    while pending:
+        node = pending.pop(0)
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+        elif not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+            pending.extend(ast.iter_child_nodes(node))
+    return list(dict.fromkeys(modules))
+
+def import_groups(pages=None):
+    """{group: (modules timed, modules imported before the timing starts)} for startup and the pages"""
+    startup = startup_modules()
+    groups = {'startup': (startup, [])}
+    groups.update((page, (PAGES[page], startup)) for page in pages or PAGES)
+    return groups
+
+def import_script(modules, baseline=(), required=False):
+    lines = ['import sys']
+    # An ImportError here stops the script: the group would be timed on top of an incomplete app
+    lines.extend(f"import {module}" for module in baseline)
+    lines.append(f"sys.stderr.write({MARKER!r} + '\\n')")
+    for module in modules:
+        if required:
+            lines.append(f"import {module}")
+        else:
+            lines.append(f"try:\n    import {module}\nexcept ImportError:\n    sys.stderr.write('missing: {module}\\n')")
+    return '\n'.join(lines)
+
+def measure(modules, baseline=(), required=False):
+    """Return (total seconds, {top-level module: cumulative seconds}, missing modules) for one import group.
+
+    ``baseline`` is imported before the timing starts. Raises RuntimeError when a baseline
+    module, or with ``required`` any of ``modules``, cannot be imported.
+    """
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', import_script(modules, baseline, required)],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f"exit status {completed.returncode}"
+        raise RuntimeError(f"App startup imports failed: {error}")
+    started = False
+    total = 0
+    top_level = {}
+    missing = []
+    for line in completed.stderr.splitlines():
+        if line == MARKER:
+            started = True
+        elif started and line.startswith('missing: '):
+            missing.append(line[len('missing: '):])
+        elif started and line.startswith('import time:') and 'self [us]' not in line:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            total += int(self_us)
+            # Nested imports are indented under the module that triggered them
+            if not name.startswith('  '):
+                top_level[name.strip()] = int(cumulative_us) / 1e6
+    return total / 1e6, top_level, missing
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', nargs='+', choices=list(PAGES), help="Pages timed after startup (default: all)")
+    parser.add_argument('--repeat', type=int, default=3, help="Fresh interpreters per page; the median is reported")
+    parser.add_argument('--top', type=int, default=8, help="Most expensive top-level modules listed per page")
+    args = parser.parse_args(argv)
+
+    try:
+        for page, (modules, baseline) in import_groups(args.pages).items():
+            runs = [measure(modules, baseline, required=page == 'startup') for _ in range(args.repeat)]
+            total = statistics.median(run[0] for run in runs)
+            top_level, missing = runs[-1][1], runs[-1][2]
+            print(f"{page:<28}{total * 1000:>9.1f} ms")
+            for name, seconds in sorted(top_level.items(), key=lambda item: -item[1])[:args.top]:
+                print(f"    {name:<40}{seconds * 1000:>9.1f} ms")
+            if missing:
+                print(f"    not installed: {', '.join(missing)}")
+    except RuntimeError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""Query latency of each neighbor-index engine against reference-set size.
+
+Reference sets of the requested sizes are resampled from a trained model's
+weighted reference set with a small Gaussian jitter, so they keep the shape
+and the metric of the real data.
+
+Usage: python benchmarks/neighbor_index.py [--model heart_disease] [--sizes 1000 10000 100000]
+"""
+import argparse
+import statistics
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.model import BreastCancerModel
+from src.models.diabetes import DiabetesModel
+from src.models.heart_disease import HeartDiseaseModel
+from src.models.neighbors import INDEX_ENGINES, make_index
+from src.models.parkinsons import ParkinsonsModel
+
+MODEL_CLASSES = {
+    'breast_cancer': BreastCancerModel,
+    'diabetes': DiabetesModel,
+    'heart_disease': HeartDiseaseModel,
+    'parkinsons': ParkinsonsModel
+}
+
+def resample(reference, size, rng):
+    rows = reference[rng.integers(0, len(reference), size)]
+    return rows + rng.normal(0, 0.05, rows.shape) * reference.std(axis=0)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', choices=sorted(MODEL_CLASSES), default='heart_disease')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--engines', nargs='+', choices=sorted(INDEX_ENGINES), default=list(INDEX_ENGINES))
+    parser.add_argument('--queries', type=int, default=200, help="Single-row queries timed per engine")
+    parser.add_argument('--batch', type=int, default=1000, help="Rows in the batch-throughput query")
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    model = MODEL_CLASSES[args.model].load_model()
+    params = model.model.get_params()
+    k = params['n_neighbors']
+    reference = np.asarray(model.X_train, dtype=np.float64)
+    rng = np.random.default_rng(0)
+    print(f"{args.model}: metric={params['metric']} p={params['p']} k={k} features={reference.shape[1]}")
+    print(f"{'rows':>9} {'engine':<10}{'build s':>10}{'p50 ms':>10}{'p95 ms':>10}{'batch rows/s':>14}")
+
+    for size in args.sizes:
+        data = resample(reference, size, rng)
+        queries = resample(reference, max(args.queries, args.batch), rng)
+        for engine in args.engines:
+            start = time.perf_counter()
+            index = make_index(engine, params['metric'], params['p']).fit(data)
+            build = time.perf_counter() - start
+
+            latencies = []
+            for query in queries[:args.queries]:
+                start = time.perf_counter()
+                index.query(query[None, :], k)
+                latencies.append((time.perf_counter() - start) * 1000)
+            latencies.sort()
+
+            start = time.perf_counter()
+            index.query(queries[:args.batch], k)
+            throughput = args.batch / (time.perf_counter() - start)
+
+            p95 = latencies[int(0.95 * (len(latencies) - 1))]
+            print(f"{size:>9} {engine:<10}{build:>10.3f}{statistics.median(latencies):>10.3f}{p95:>10.3f}{throughput:>14.0f}")
+
+if __name__ == "__main__":
+    main()
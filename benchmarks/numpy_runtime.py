@@ -0,0 +1,121 @@
+"""Parity and cold start of the NumPy runtime against the trained models.
+
+Every model is exported to a scratch bundle and both score the same rows (the
+reference set mapped back to raw inputs, plus a noisy copy). Predictions,
+probabilities, distances, risk factors and neighbor outcomes must be equal bit
+for bit; neighbor ids may only differ between reference rows at exactly the
+same distance (the heart disease set has duplicate cases).
+
+The cold start is measured in fresh interpreters: import, load and the first
+prediction, with the process's peak resident memory (Linux) and whether
+scikit-learn or pandas was imported along the way.
+
+Usage: python benchmarks/numpy_runtime.py [--rows 2000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+
+from suite import MODEL_CLASSES, query_rows
+from src.models.runtime import export_bundle, load_bundle
+
+COLD_START = {
+    'model': """
+from src.batch_scoring import DISEASES
+model = DISEASES[{name!r}][0].load_model()
+""",
+    'numpy': """
+from src.models.runtime import load_bundle
+model = load_bundle({bundle!r})
+"""
+}
+
+MEASURE = """
+import json, sys, time, warnings
+warnings.filterwarnings('ignore')
+start = time.perf_counter()
+{load}
+model.predict_batch(model.raw_matrix([{row}]))
+print(json.dumps({{
+    'seconds': time.perf_counter() - start,
+    # VmHWM, not ru_maxrss: on Linux the latter keeps the (larger) benchmark's peak across fork and exec
+    'max_rss_kb': int(next(line.split()[1] for line in open('/proc/self/status') if line.startswith('VmHWM'))),
+    'heavy': sorted(module for module in ('sklearn', 'scipy', 'pandas') if module in sys.modules)
+}}))
+"""
+
+def check_parity(model, runtime, X):
+    expected = model.predict_batch(X, return_risk_factors=True)
+    actual = runtime.predict_batch(X, return_risk_factors=True)
+    labels = np.asarray(model.y_train)
+    return {
+        'predictions': np.array_equal(expected[0], actual[0]),
+        'probabilities': np.array_equal(expected[1], actual[1]),
+        'distances': np.array_equal(expected[3], actual[3]),
+        'risk factors': expected[4] == actual[4],
+        'outcomes': np.array_equal(labels[expected[2]], labels[actual[2]]),
+        'same ids': float((expected[2] == actual[2]).all(axis=1).mean())
+    }
+
+def cold_start(kind, name, bundle, row, repeat):
+    script = MEASURE.format(load=COLD_START[kind].format(name=name, bundle=bundle), row=row)
+    runs = []
+    for _ in range(repeat):
+        completed = subprocess.run([sys.executable, '-c', script], cwd=ROOT, capture_output=True, text=True, check=True)
+        runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    return (
+        statistics.median(run['seconds'] for run in runs),
+        max(run['max_rss_kb'] for run in runs) / 1024,
+        runs[0]['heavy']
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as bundle_dir:
+        print(f"{'model':<15}{'rows':>6}  parity")
+        bundles = {}
+        for name, model_cls in MODEL_CLASSES.items():
+            if not os.path.exists(model_cls().stored_model_path()):
+                print(f"{name:<15}  (no trained model, run train_models.py first)")
+                continue
+            model = model_cls.load_model()
+            model.prediction_cache = None
+            # A scratch bundle, so the benchmark never writes next to the models
+            bundles[name] = export_bundle(model, os.path.join(bundle_dir, f"{name}.bundle"))
+            runtime = load_bundle(bundles[name])
+
+            X = query_rows(model, args.rows // 2)
+            X = np.vstack([X, X * (1 + rng.normal(0, 0.05, X.shape))])
+            X = X[model.valid_rows(X)]
+            parity = check_parity(model, runtime, X)
+            checks = ", ".join(
+                f"{check} {'ok' if passed else 'DIFFERS'}" for check, passed in parity.items() if check != 'same ids'
+            )
+            print(f"{name:<15}{len(X):>6}  {checks}, same ids in {parity['same ids']:.1%} of rows")
+            bundles[name] = (bundles[name], query_rows(model, 1)[0].tolist())
+
+        print(f"\n{'model':<15}{'runtime':<9}{'cold start ms':>15}{'peak RSS MB':>13}  imports")
+        for name, (bundle, row) in bundles.items():
+            for kind in COLD_START:
+                seconds, rss, heavy = cold_start(kind, name, bundle, row, args.repeat)
+                print(f"{name:<15}{kind:<9}{seconds * 1000:>15.1f}{rss:>13.1f}  {', '.join(heavy) or '-'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Where predict time goes: per-stage breakdown from the model instrumentation.
+
+Runs single-row predict() calls and one predict_batch() per trained model with
+a HistogramSink attached, and prints the calls, mean and bucketed p95 of every
+stage. Also measures what the hooks cost while instrumentation is disabled
+(the default), per timed() call and per predict().
+
+Usage: python benchmarks/predict_stages.py [--queries 2000] [--batch 10000] [--prometheus]
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from suite import MODEL_CLASSES, query_rows
+from src.models.instrumentation import HistogramSink, instrumentation
+
+def disabled_overhead(model, rows, calls=200000):
+    """(seconds per disabled timed() call, seconds per predict() with instrumentation disabled)"""
+    start = time.perf_counter()
+    for _ in range(calls):
+        with model.timed('overhead', 1):
+            pass
+    per_hook = (time.perf_counter() - start) / calls
+
+    start = time.perf_counter()
+    for row in rows:
+        model.predict(row[None, :])
+    return per_hook, (time.perf_counter() - start) / len(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--queries', type=int, default=2000, help="Single-row predictions per model")
+    parser.add_argument('--batch', type=int, default=10000, help="Rows in the predict_batch call")
+    parser.add_argument('--prometheus', action='store_true', help="Also print the Prometheus exposition")
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    histograms = HistogramSink()
+    for name, model_cls in MODEL_CLASSES.items():
+        if not os.path.exists(model_cls().stored_model_path()):
+            print(f"{name}: no trained model, skipped")
+            continue
+        model = model_cls.load_model()
+        model.prediction_cache = None  # every predict() should run its stages
+        rows = query_rows(model, args.queries)
+        model.predict(rows[:1])
+
+        per_hook, per_predict = disabled_overhead(model, rows)
+        print(
+            f"\n{name}: predict() {per_predict * 1e6:.1f} us with instrumentation disabled, "
+            f"{per_hook * 1e9:.0f} ns per disabled hook"
+        )
+
+        instrumentation.enable(histograms)
+        try:
+            for row in rows:
+                model.predict(row[None, :], return_risk_factors=True)
+            model.predict_batch(query_rows(model, args.batch), return_risk_factors=True)
+        finally:
+            instrumentation.disable()
+
+    print(f"\n{'model':<20}{'stage':<22}{'calls':>8}{'rows':>10}{'mean us':>10}{'p95 us':>10}")
+    for (model, stage), entry in histograms.summary().items():
+        print(
+            f"{model:<20}{stage:<22}{entry['calls']:>8}{entry['rows']:>10}"
+            f"{entry['mean'] * 1e6:>10.1f}{entry['p95'] * 1e6:>10.1f}"
+        )
+    if args.prometheus:
+        print()
+        print(histograms.prometheus_text(), end='')
+
+if __name__ == "__main__":
+    main()
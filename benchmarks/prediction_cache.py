@@ -0,0 +1,79 @@
+"""Hit rate and latency of the prediction cache on form-like repeated inputs.
+
+The Streamlit forms mostly submit the default values or values on the slider
+steps. This replays such a workload per trained model: each query is one of
+``--distinct`` inputs (reference cases snapped to a coarse step), drawn with a
+Zipf-like skew so a few inputs dominate, through predict() with and without
+the cache. Prints the hit rate and the median latency of both, and checks that
+cached results equal uncached ones.
+
+Usage: python benchmarks/prediction_cache.py [--queries 2000] [--distinct 50]
+"""
+import argparse
+import statistics
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from suite import query_rows, trained_models
+
+def workload(model, queries, distinct, rng):
+    """Form-like inputs: ``distinct`` snapped reference cases, repeated with a skew"""
+    candidates = query_rows(model, distinct)
+    step = np.abs(candidates).max(axis=0) / 100
+    step[step == 0] = 1
+    candidates = np.round(candidates / step) * step
+    weights = 1 / np.arange(1, distinct + 1)
+    return candidates[rng.choice(distinct, queries, p=weights / weights.sum())]
+
+def timed(model, rows):
+    timings, results = [], []
+    for row in rows:
+        start = time.perf_counter()
+        results.append(model.predict(row[None, :], return_risk_factors=True))
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000, results
+
+def same(left, right):
+    for a, b in zip(left, right):
+        if isinstance(a, (pd.DataFrame, pd.Series)):
+            if not a.equals(b):
+                return False
+        elif isinstance(a, np.ndarray):
+            if not np.array_equal(a, b):
+                return False
+        elif a != b:
+            return False
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--queries', type=int, default=2000, help="predict() calls per model")
+    parser.add_argument('--distinct', type=int, default=50, help="Distinct inputs in the workload")
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    rng = np.random.default_rng(0)
+    print(f"{'model':<16}{'hit rate':>10}{'uncached ms':>13}{'cached ms':>11}  same")
+    for name, model_cls in trained_models().items():
+        model = model_cls.load_model()
+        rows = workload(model, args.queries, args.distinct, rng)
+
+        cache = model.prediction_cache
+        model.prediction_cache = None
+        uncached_ms, expected = timed(model, rows)
+        model.prediction_cache = cache
+        cached_ms, results = timed(model, rows)
+
+        identical = all(same(a, b) for a, b in zip(expected, results))
+        stats = model.prediction_cache.stats()
+        print(f"{name:<16}{stats['hit_rate']:>10.1%}{uncached_ms:>13.3f}{cached_ms:>11.3f}  {'yes' if identical else 'NO'}")
+
+if __name__ == "__main__":
+    main()
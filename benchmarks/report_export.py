@@ -0,0 +1,54 @@
+"""Throughput and peak memory of the streamed report export, by history size.
+
+For each size a scratch history is filled with synthetic assessments, then a
+technical report (the widest) is exported in every format, with charts and
+recommendations. Peak Python memory during the export is measured with
+tracemalloc; it should stay flat as the number of rows grows. Tracing slows
+the export several times over, so the rows/s column is a lower bound.
+
+Usage: python benchmarks/report_export.py [--sizes 10000 100000 300000]
+"""
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from history_store import fill
+from src.history import AssessmentHistory
+from src.reports import WRITERS, write_report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 300000])
+    parser.add_argument('--type', default='technical')
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'format':<7}{'seconds':>9}{'rows/s':>10}{'MB':>8}{'peak MB':>9}")
+    for size in args.sizes:
+        directory = tempfile.mkdtemp()
+        history = AssessmentHistory(os.path.join(directory, "assessments.db"))
+        fill(history, size, 365, 500, np.random.default_rng(0))
+        for report_format in WRITERS:
+            path = os.path.join(directory, f"report.{report_format}")
+            tracemalloc.start()
+            start = time.perf_counter()
+            with open(path, 'wb') as out:
+                write_report(out, report_format, args.type, datetime.date(2024, 1, 1), datetime.date(2024, 12, 31),
+                             include_charts=True, include_recommendations=True, history=history)
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{size:>8} {report_format:<7}{seconds:>9.2f}{size / seconds:>10.0f}"
+                  f"{os.path.getsize(path) / 1e6:>8.1f}{peak / 1e6:>9.2f}")
+        history.close()
+
+if __name__ == "__main__":
+    main()
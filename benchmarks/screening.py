@@ -0,0 +1,68 @@
+"""Latency of a full four-model screening: concurrent vs one model after another.
+
+Patient records are built from the reference sets (one reference case of each
+model merged into one record), the models are loaded up front, and every
+record is screened once with src.screening.screen and once by calling
+screen_one for each model in turn. Prints the median per-model latency, the
+median serial screening and the median concurrent one.
+
+Usage: python benchmarks/screening.py [--records 200]
+"""
+import argparse
+import statistics
+import sys
+import time
+import warnings
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from suite import query_rows, trained_models
+from src.models.registry import registry
+from src.screening import screen, screen_one
+
+def records(models, count):
+    """Merged patient records, feature name -> value"""
+    columns = {name: query_rows(model, count) for name, model in models.items()}
+    return [
+        {
+            feature: float(value)
+            for name, model in models.items()
+            for feature, value in zip(model.feature_names, columns[name][position])
+        }
+        for position in range(count)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=200, help="Patient records screened")
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    models = {name: registry.get(model_cls) for name, model_cls in trained_models().items()}
+    patients = records(models, args.records)
+    screen(patients[0])  # warm up lazily built state
+
+    per_model = {name: [] for name in models}
+    serial, concurrent = [], []
+    for record in patients:
+        start = time.perf_counter()
+        for name in models:
+            per_model[name].append(screen_one(name, record)['seconds'])
+        serial.append(time.perf_counter() - start)
+
+        screening = screen(record, list(models))
+        concurrent.append(screening['seconds'])
+        failed = [name for name, result in screening['results'].items() if result['status'] != 'ok']
+        if failed:
+            print(f"Screening did not score {', '.join(failed)}")
+            return
+
+    for name, timings in per_model.items():
+        print(f"{name:<16}{statistics.median(timings) * 1000:>8.2f} ms")
+    print(f"{'slowest model':<16}{max(statistics.median(t) for t in per_model.values()) * 1000:>8.2f} ms")
+    print(f"{'serial':<16}{statistics.median(serial) * 1000:>8.2f} ms")
+    print(f"{'concurrent':<16}{statistics.median(concurrent) * 1000:>8.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Sharded kNN search against the single-process engine, by reference size and worker count.
+
+Reference sets are resampled from a trained model's weighted reference set
+(as in neighbor_index.py). For each size the single-process kd_tree engine is
+timed, then the sharded engine with each worker count, and the sharded
+neighbors are checked against the single-process ones: distances must match
+and the indices may only differ between rows at the same distance.
+
+Query latency only drops with the worker count when the shards are large
+enough for the per-query message round trip to the workers to pay off, and
+when there are as many free cores as workers.
+
+Usage: python benchmarks/sharded_knn.py [--model heart_disease] [--sizes 100000 1000000] [--shards 1 2 4]
+"""
+import argparse
+import statistics
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from neighbor_index import MODEL_CLASSES, resample
+from src.models.neighbors import ShardedIndex, make_index
+
+def timed_queries(index, queries, batch, k):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.query(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    result = index.query(batch, k)
+    return statistics.median(latencies), len(batch) / (time.perf_counter() - start), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', choices=sorted(MODEL_CLASSES), default='heart_disease')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--queries', type=int, default=100, help="Single-row queries timed per engine")
+    parser.add_argument('--batch', type=int, default=1000, help="Rows in the batch-throughput query")
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    model = MODEL_CLASSES[args.model].load_model()
+    params = model.model.get_params()
+    k = params['n_neighbors']
+    reference = np.asarray(model.X_train, dtype=np.float64)
+    rng = np.random.default_rng(0)
+    print(f"{args.model}: metric={params['metric']} p={params['p']} k={k} features={reference.shape[1]}")
+    print(f"{'rows':>9} {'engine':<12}{'build s':>10}{'p50 ms':>10}{'batch rows/s':>14}  exact")
+
+    failed = False
+    for size in args.sizes:
+        data = resample(reference, size, rng)
+        queries = resample(reference, args.queries, rng)
+        batch = resample(reference, args.batch, rng)
+
+        start = time.perf_counter()
+        index = make_index('kd_tree', params['metric'], params['p']).fit(data)
+        build = time.perf_counter() - start
+        p50, throughput, (expected_distances, expected_indices) = timed_queries(index, queries, batch, k)
+        print(f"{size:>9} {'kd_tree':<12}{build:>10.3f}{p50:>10.3f}{throughput:>14.0f}")
+        del index
+
+        for n_shards in args.shards:
+            start = time.perf_counter()
+            index = ShardedIndex(params['metric'], params['p'], n_shards=n_shards).fit(data)
+            build = time.perf_counter() - start
+            try:
+                p50, throughput, (distances, indices) = timed_queries(index, queries, batch, k)
+            finally:
+                index.close()
+            # Rank by rank distances must agree; differing indices are then rows at equal distance
+            exact = np.allclose(distances, expected_distances, rtol=0, atol=1e-9)
+            failed |= not exact
+            print(
+                f"{size:>9} {f'sharded x{n_shards}':<12}{build:>10.3f}{p50:>10.3f}{throughput:>14.0f}"
+                f"  {'yes' if exact else 'NO'}"
+            )
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Throughput and peak memory of the streaming preprocessor against input size.
+
+Synthetic extracts are resampled from datasets/<dataset>.csv, so the peak
+traced memory can be compared across sizes: it should stay flat as the input
+grows. The streaming medians are also checked against exact medians.
+
+Usage: python benchmarks/streaming_preprocessing.py [--dataset diabetes] [--rows 100000 1000000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.preprocessing.streaming import DATASETS, preprocess_file
+
+def write_extract(source, rows, path, rng, chunk_size=100000):
+    sample = pd.read_csv(source)
+    for start in range(0, rows, chunk_size):
+        chunk = sample.iloc[rng.integers(0, len(sample), min(chunk_size, rows - start))]
+        chunk.to_csv(path, mode='a', header=start == 0, index=False)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dataset', choices=sorted(DATASETS), default='diabetes')
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    spec = DATASETS[args.dataset]
+    rng = np.random.default_rng(0)
+    print(f"{'rows':>10}{'seconds':>10}{'rows/s':>12}{'peak MB':>10}{'max median error':>18}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for rows in args.rows:
+            input_path = os.path.join(tmp_dir, f"{args.dataset}-{rows}.csv")
+            output_path = os.path.join(tmp_dir, f"{args.dataset}-{rows}.scaled.csv")
+            write_extract(spec.source, rows, input_path, rng)
+
+            start = time.perf_counter()
+            preprocessor = preprocess_file(args.dataset, input_path, output_path, args.chunk_size)
+            elapsed = time.perf_counter() - start
+
+            # tracemalloc slows pandas down several times, so memory is measured in a second run
+            tracemalloc.start()
+            preprocess_file(args.dataset, input_path, output_path, args.chunk_size)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            # Exact medians, one column at a time, to measure the sketch error
+            errors = []
+            for column, median in preprocessor.medians.items():
+                values = pd.read_csv(input_path, usecols=[column])[column]
+                errors.append(abs(median - values[values != 0].median()))
+            error = f"{max(errors):.4f}" if errors else "-"
+            print(f"{rows:>10}{elapsed:>10.2f}{rows / elapsed:>12,.0f}{peak / 2 ** 20:>10.1f}{error:>18}")
+            os.remove(input_path)
+            os.remove(output_path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""Benchmark suite for the load, train and predict paths, with JSON baselines.
+
+Usage:
+    python benchmarks/suite.py run [--only load train predict batch imports] [--output results.json]
+                                   [--compare baseline.json] [--threshold 0.1]
+    python benchmarks/suite.py compare baseline.json results.json [--threshold 0.1]
+
+Benchmarks:
+    load     load_model() time for each trained model in models/
+    train    wall time of each train_* job in train_models.py, run in a subprocess
+             with MODEL_DIR pointed at a scratch directory so models/ is untouched
+    predict  single-row predict() latency, p50/p95/p99
+    batch    predict_batch() throughput in rows/s
+    imports  import cost of the Streamlit app's startup and of each page (see import_time.py)
+
+Results are written as JSON together with the environment they were measured
+in. ``compare`` (or ``run --compare``) flags every metric that is worse than
+the baseline by more than ``--threshold`` and exits with status 1 if any is.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+
+from src.model import BreastCancerModel
+from src.models.diabetes import DiabetesModel
+from src.models.heart_disease import HeartDiseaseModel
+from src.models.parkinsons import ParkinsonsModel
+
+MODEL_CLASSES = {
+    'breast_cancer': BreastCancerModel,
+    'diabetes': DiabetesModel,
+    'heart_disease': HeartDiseaseModel,
+    'parkinsons': ParkinsonsModel
+}
+
+BENCHMARKS = ['load', 'train', 'predict', 'batch', 'imports']
+
+def metric(value, unit, better='lower'):
+    return {'value': value, 'unit': unit, 'better': better}
+
+def environment():
+    """Metadata needed to judge whether two result files are comparable"""
+    import pandas
+    import sklearn
+
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pandas.__version__,
+        'scikit-learn': sklearn.__version__
+    }
+
+def trained_models():
+    return {
+        name: model_cls for name, model_cls in MODEL_CLASSES.items()
+        if os.path.exists(model_cls().stored_model_path())
+    }
+
+def query_rows(model, count):
+    """Raw inputs for the model: its reference rows mapped back through the input transform"""
+    reference = np.asarray(model.X_train, dtype=np.float64)
+    X_raw = (reference - model.input_offset) / model.input_coef
+    return X_raw[np.arange(count) % len(X_raw)]
+
+def bench_load(args):
+    results = {}
+    for name, model_cls in trained_models().items():
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            model_cls.load_model()
+            timings.append(time.perf_counter() - start)
+        results[f'load/{name}'] = metric(statistics.median(timings) * 1000, 'ms')
+    return results
+
+def bench_train(args):
+    results = {}
+    for name in MODEL_CLASSES:
+        timings = []
+        for _ in range(args.train_repeat):
+            with tempfile.TemporaryDirectory() as model_dir:
+                records_path = os.path.join(model_dir, 'records.json')
+                completed = subprocess.run(
+                    [sys.executable, str(ROOT / 'train_models.py'), '--only', name, '--workers', '1',
+                     '--json', records_path],
+                    cwd=ROOT, env=dict(os.environ, MODEL_DIR=model_dir), capture_output=True, text=True
+                )
+                if completed.returncode != 0:
+                    print(f"train/{name} failed:\n{completed.stdout[-2000:]}{completed.stderr[-2000:]}")
+                    break
+                with open(records_path) as f:
+                    timings.append(json.load(f)[0]['wall_seconds'])
+        if timings:
+            results[f'train/{name}'] = metric(statistics.median(timings), 's')
+    return results
+
+def bench_predict(args):
+    results = {}
+    for name, model_cls in trained_models().items():
+        model = model_cls.load_model()
+        model.prediction_cache = None  # time the prediction itself, not cache hits on repeated rows
+        rows = query_rows(model, args.queries)
+        model.predict(rows[:1])  # warm up lazily built state
+
+        timings = []
+        for row in rows:
+            start = time.perf_counter()
+            model.predict(row[None, :])
+            timings.append(time.perf_counter() - start)
+        p50, p95, p99 = np.percentile(timings, [50, 95, 99]) * 1000
+        results[f'predict/{name}/p50'] = metric(p50, 'ms')
+        results[f'predict/{name}/p95'] = metric(p95, 'ms')
+        results[f'predict/{name}/p99'] = metric(p99, 'ms')
+    return results
+
+def bench_batch(args):
+    results = {}
+    for name, model_cls in trained_models().items():
+        model = model_cls.load_model()
+        rows = query_rows(model, args.batch)
+        model.predict_batch(rows[:1])
+
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            model.predict_batch(rows)
+            timings.append(time.perf_counter() - start)
+        results[f'batch/{name}'] = metric(len(rows) / statistics.median(timings), 'rows/s', 'higher')
+    return results
+
+def bench_imports(args):
+    import import_time
+
+    results = {}
+    for page, (modules, baseline) in import_time.import_groups().items():
+        runs = [
+            import_time.measure(modules, baseline, required=page == 'startup') for _ in range(args.import_repeat)
+        ]
+        missing = runs[-1][2]
+        if missing:
+            # A page timed without some of its modules would look faster than it is
+            print(f"imports/{page}: skipped, not installed: {', '.join(missing)}")
+            continue
+        results[f'imports/{page}'] = metric(statistics.median(run[0] for run in runs) * 1000, 'ms')
+    return results
+
+RUNNERS = {
+    'load': bench_load, 'train': bench_train, 'predict': bench_predict, 'batch': bench_batch, 'imports': bench_imports
+}
+
+def compare(baseline, current, threshold):
+    """Print the metrics side by side; return the names of those that regressed"""
+    regressions = []
+    print(f"{'metric':<36}{'baseline':>14}{'current':>14}{'change':>9}")
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None or not base['value']:
+            print(f"{name:<36}{'-':>14}{result['value']:>14.3f}{'new':>9}")
+            continue
+        change = (result['value'] - base['value']) / base['value']
+        worse = change > threshold if result['better'] == 'lower' else change < -threshold
+        if worse:
+            regressions.append(name)
+        print(
+            f"{name:<36}{base['value']:>14.3f}{result['value']:>14.3f}{change:>+8.1%}"
+            f"{'  REGRESSION' if worse else ''}"
+        )
+    if baseline['environment'].get('platform') != current['environment'].get('platform'):
+        print("Note: baseline was measured on a different platform")
+    return regressions
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="Run the benchmarks")
+    run.add_argument('--only', nargs='+', choices=BENCHMARKS, help="Benchmarks to run (default: all)")
+    run.add_argument('--output', help="Write the results JSON here")
+    run.add_argument('--compare', help="Baseline results JSON to compare against")
+    run.add_argument('--threshold', type=float, default=0.10, help="Relative change counted as a regression")
+    run.add_argument('--repeat', type=int, default=20, help="Repetitions for load and batch timings")
+    run.add_argument('--train-repeat', type=int, default=1, help="Repetitions for each training job")
+    run.add_argument('--queries', type=int, default=500, help="Single-row predictions timed per model")
+    run.add_argument('--batch', type=int, default=10000, help="Rows per predict_batch call")
+    run.add_argument('--import-repeat', type=int, default=3, help="Fresh interpreters per import measurement")
+
+    diff = commands.add_parser('compare', help="Compare two results files")
+    diff.add_argument('baseline')
+    diff.add_argument('current')
+    diff.add_argument('--threshold', type=float, default=0.10)
+
+    args = parser.parse_args(argv)
+    warnings.filterwarnings('ignore')
+
+    if args.command == 'compare':
+        return 1 if compare(load_results(args.baseline), load_results(args.current), args.threshold) else 0
+
+    report = {'environment': environment(), 'results': {}}
+    for benchmark in args.only or BENCHMARKS:
+        start = time.perf_counter()
+        report['results'].update(RUNNERS[benchmark](args))
+        print(f"{benchmark}: done in {time.perf_counter() - start:.1f}s")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        return 1 if compare(load_results(args.compare), report, args.threshold) else 0
+    for name, result in report['results'].items():
+        print(f"{name:<36}{result['value']:>14.3f} {result['unit']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
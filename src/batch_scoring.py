@@ -0,0 +1,162 @@
+"""Score patient CSV files in fixed-size chunks.
+
+Usage: python -m src.batch_scoring DISEASE INPUT.csv [-o OUTPUT.csv] [--chunk-size ROWS]
+
+The input uses the schema of ``datasets/*.csv`` for the disease. The file is
+read ``--chunk-size`` rows at a time, each chunk is scored with one
+predict_batch call and appended to the output, so memory stays bounded by the
+chunk size whatever the cohort size. Each output row carries the patient id,
+the prediction, the probability and the ids of the top-k reference cases.
+Rows with missing or out-of-range values are written with status ``invalid``
+instead of stopping the run.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from .features import breast_cancer_feature_name, diabetes_derived_features
+from .model import BreastCancerModel
+from .models.diabetes import DiabetesModel
+from .models.heart_disease import HeartDiseaseModel
+from .models.parkinsons import ParkinsonsModel
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 10000
+
+# Columns used as patient id when --id-column is not given
+ID_COLUMNS = ['id', 'name', 'patient_id']
+
+def prepare_breast_cancer(df):
+    # datasets/data.csv spells the features 'radius_mean', 'radius_se', 'radius_worst'
+    return df.rename(columns=breast_cancer_feature_name)
+
+def prepare_diabetes(df):
+    # Add the derived features the model was trained with; the model fills missing (0) measurements
+    if not {'Glucose', 'BMI', 'Age'} <= set(df.columns):
+        return df
+    df = df.copy()
+    glucose, bmi, age = (pd.to_numeric(df[column], errors='coerce') for column in ('Glucose', 'BMI', 'Age'))
+    for column, values in diabetes_derived_features(glucose, bmi, age).items():
+        df[column] = values
+    return df
+
+DISEASES = {
+    'breast_cancer': (BreastCancerModel, prepare_breast_cancer),
+    'diabetes': (DiabetesModel, prepare_diabetes),
+    'heart_disease': (HeartDiseaseModel, None),
+    'parkinsons': (ParkinsonsModel, None)
+}
+
+def reference_ids(model):
+    """Row ids of the reference set, used to report neighbors"""
+    if isinstance(model.X_train, pd.DataFrame):
+        return np.asarray(model.X_train.index)
+    return np.arange(len(model.X_train))
+
+def score_chunk(model, chunk, prepare=None, id_column=None, start_row=0, risk_factors=False):
+    """Score one chunk of raw patient rows and return the output DataFrame"""
+    if prepare is not None:
+        chunk = prepare(chunk)
+    missing = [feature for feature in model.feature_names if feature not in chunk.columns]
+    if missing:
+        raise ValueError(f"Input is missing columns: {', '.join(missing)}")
+
+    X_raw = chunk[model.feature_names].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+    valid = model.valid_rows(X_raw)
+    k = model.model.n_neighbors
+
+    output = pd.DataFrame({
+        'row': np.arange(start_row, start_row + len(chunk)),
+        'status': np.where(valid, 'ok', 'invalid')
+    })
+    if id_column is not None:
+        output.insert(0, id_column, chunk[id_column].to_numpy())
+    output['prediction'] = pd.array([pd.NA] * len(chunk), dtype='Int64')
+    output['probability'] = np.nan
+    neighbors = np.full((len(chunk), k), -1, dtype=np.int64)
+    labels = [''] * len(chunk)
+
+    if valid.any():
+        results = model.predict_batch(X_raw[valid], return_risk_factors=risk_factors)
+        predictions, probabilities, indices = results[:3]
+        output.loc[valid, 'prediction'] = predictions
+        output.loc[valid, 'probability'] = probabilities
+        neighbors[valid, :indices.shape[1]] = reference_ids(model)[indices]
+        if risk_factors:
+            for row, fired in zip(np.flatnonzero(valid), results[4]):
+                labels[row] = '; '.join(fired)
+
+    for position in range(k):
+        output[f'neighbor_{position + 1}'] = neighbors[:, position]
+    if risk_factors:
+        output['risk_factors'] = labels
+    return output
+
+def score_csv(disease, input_path, output_path, chunk_size=DEFAULT_CHUNK_SIZE, id_column=None, risk_factors=False):
+    """Stream ``input_path`` through the disease model into ``output_path``; return the run totals"""
+    model_cls, prepare = DISEASES[disease]
+    model = model_cls.load_model()
+
+    totals = {'rows': 0, 'invalid': 0, 'seconds': 0.0}
+    start = time.perf_counter()
+    tmp_path = output_path + ".tmp"
+    try:
+        with open(tmp_path, 'w', newline='') as out:
+            for chunk_number, chunk in enumerate(pd.read_csv(input_path, chunksize=chunk_size)):
+                if chunk_number == 0 and id_column is None:
+                    id_column = next((column for column in ID_COLUMNS if column in chunk.columns), None)
+
+                output = score_chunk(model, chunk, prepare, id_column, totals['rows'], risk_factors)
+                output.to_csv(out, header=chunk_number == 0, index=False)
+
+                totals['rows'] += len(output)
+                totals['invalid'] += int((output['status'] == 'invalid').sum())
+                elapsed = time.perf_counter() - start
+                logger.info(f"{disease}: {totals['rows']} rows scored, {totals['rows'] / elapsed:,.0f} rows/s")
+        # Only a complete run replaces the output file
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    totals['seconds'] = time.perf_counter() - start
+    return totals
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a patient CSV file with one of the disease models")
+    parser.add_argument('disease', choices=sorted(DISEASES))
+    parser.add_argument('input', help="CSV in the schema of datasets/*.csv for the disease")
+    parser.add_argument('-o', '--output', help="Output CSV (default: INPUT with a .predictions.csv suffix)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Rows read and scored at a time")
+    parser.add_argument('--id-column', help=f"Column copied to the output as patient id (default: first of {ID_COLUMNS})")
+    parser.add_argument('--risk-factors', action='store_true', help="Add the fired risk-factor labels")
+    args = parser.parse_args(argv)
+
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be positive")
+    output = args.output or os.path.splitext(args.input)[0] + ".predictions.csv"
+    model_cls, _ = DISEASES[args.disease]
+    if not os.path.exists(model_cls().stored_model_path()):
+        logger.error(f"No trained {args.disease} model found, run train_models.py first")
+        return 1
+
+    try:
+        totals = score_csv(args.disease, args.input, output, args.chunk_size, args.id_column, args.risk_factors)
+    except (OSError, ValueError) as e:
+        logger.error(f"Scoring failed: {str(e)}")
+        return 1
+
+    rate = totals['rows'] / totals['seconds'] if totals['seconds'] else 0.0
+    print(
+        f"Scored {totals['rows']} rows in {totals['seconds']:.2f}s ({rate:,.0f} rows/s): "
+        f"{totals['invalid']} invalid -> {output}"
+    )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
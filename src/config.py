@@ -4,18 +4,50 @@ from pathlib import Path
 # Base paths
 BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = os.path.join(BASE_DIR, "data")
-MODEL_DIR = os.path.join(BASE_DIR, "models")
+# MODEL_DIR can be pointed elsewhere (e.g. a scratch directory for benchmarks) through the environment
+MODEL_DIR = os.environ.get("MODEL_DIR", os.path.join(BASE_DIR, "models"))
 
 # Create directories if they don't exist
 os.makedirs(MODEL_DIR, exist_ok=True)
 os.makedirs(DATA_DIR, exist_ok=True)
 
+# Preprocessed datasets cached by src/preprocessing/cache.py
+PREPROCESSING_CACHE_DIR = os.path.join(DATA_DIR, "cache")
+
 # Model paths
 BREAST_CANCER_MODEL_PATH = os.path.join(MODEL_DIR, "breast_cancer_model.pkl")
 DIABETES_MODEL_PATH = os.path.join(MODEL_DIR, "diabetes_model.pkl")
 HEART_DISEASE_MODEL_PATH = os.path.join(MODEL_DIR, "heart_disease_model.pkl")
 PARKINSONS_MODEL_PATH = os.path.join(MODEL_DIR, "parkinsons_model.pkl")
 
+# Model of each served disease; ``python -m src.models.runtime`` exports each one to a
+# NumPy runtime bundle next to it (see src/models/runtime.py)
+DISEASE_MODEL_PATHS = {
+    'breast_cancer': BREAST_CANCER_MODEL_PATH,
+    'diabetes': DIABETES_MODEL_PATH,
+    'heart_disease': HEART_DISEASE_MODEL_PATH,
+    'parkinsons': PARKINSONS_MODEL_PATH
+}
+
+# Worker processes of the 'sharded' neighbor-index engine (0 = one per CPU)
+KNN_SHARD_WORKERS = int(os.environ.get("KNN_SHARD_WORKERS", "0"))
+
+# LRU cache in front of each kNN model's predict(), see src/models/prediction_cache.py
+# (PREDICTION_CACHE_ENTRIES=0 disables it)
+PREDICTION_CACHE_ENTRIES = int(os.environ.get("PREDICTION_CACHE_ENTRIES", "256"))
+PREDICTION_CACHE_BYTES = int(os.environ.get("PREDICTION_CACHE_BYTES", str(8 * 1024 * 1024)))
+
 # Model parameters
 RANDOM_STATE = 42
-TEST_SIZE = 0.2 
\ No newline at end of file
+TEST_SIZE = 0.2 
+
+# Progress indicators in the Streamlit app. Work is never padded to look busy: a task
+# only shows progress once it has run for UI_PROGRESS_AFTER_SECONDS (or is known to be
+# slow, like a cold model load), so instant work shows nothing.
+UI_PROGRESS_AFTER_SECONDS = float(os.environ.get("UI_PROGRESS_AFTER_SECONDS", "0.3"))
+# Minimum time a visible stage stays on screen, for demos only. Leave at 0 in production,
+# where it guarantees that no artificial delay is added anywhere.
+UI_DEMO_STAGE_SECONDS = float(os.environ.get("UI_DEMO_STAGE_SECONDS", "0"))
+
+# SQLite store of completed assessments behind the history pages, see src/history.py
+HISTORY_DB_PATH = os.environ.get("HISTORY_DB_PATH", os.path.join(DATA_DIR, "assessments.db"))
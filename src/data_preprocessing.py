@@ -1,11 +1,18 @@
 import pandas as pd
 from sklearn.preprocessing import StandardScaler
 import logging
+from importlib.resources import files
+from pathlib import Path
 from sklearn.datasets import load_breast_cancer
+from .preprocessing.cache import cached_dataset
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# CSV behind load_breast_cancer(), hashed for the preprocessing cache
+DATA_PATH = Path(str(files("sklearn.datasets") / "data" / "breast_cancer.csv"))
+
+@cached_dataset('breast_cancer', DATA_PATH)
 def load_and_preprocess_data():
     """Load and preprocess the breast cancer data."""
     try:
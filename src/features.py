@@ -0,0 +1,69 @@
+"""Input renames and derived features applied to raw patient data before scoring.
+
+The rules are written on plain values so that batch scoring can apply them to
+DataFrame columns, the server to one patient's JSON object and the diabetes
+model (and its NumPy runtime) to input matrices, without this module (or the
+server) importing pandas.
+"""
+import math
+
+def breast_cancer_feature_name(column):
+    """Model feature name for a column: datasets/data.csv spells 'mean radius' as 'radius_mean'"""
+    base, _, suffix = column.rpartition('_')
+    base = base.replace('_', ' ')
+    if suffix == 'mean':
+        return f"mean {base}"
+    if suffix == 'se':
+        return f"{base} error"
+    if suffix == 'worst':
+        return f"worst {base}"
+    return column
+
+# Diabetes measurements where datasets/diabetes.csv records a missing value as 0
+DIABETES_ZERO_NOT_ACCEPTED = ['Glucose', 'BloodPressure', 'SkinThickness', 'Insulin', 'BMI']
+
+def diabetes_derived_features(glucose, bmi, age):
+    """Derived features the diabetes model was trained with"""
+    return {'GlucoseBMI': glucose * bmi / 1000, 'GlucoseAge': glucose * age / 100}
+
+def fill_diabetes_zeros(X, feature_names, medians):
+    """Diabetes input matrix with missing (0) measurements replaced by the training ``medians``.
+
+    The derived features of the filled rows are recomputed from the filled values, as
+    they were for the training data. ``X`` itself is returned when nothing is missing.
+    """
+    positions = {feature: position for position, feature in enumerate(feature_names)}
+    columns = [positions[column] for column in medians]
+    missing = X[:, columns] == 0
+    if not missing.any():
+        return X
+    X = X.copy()
+    for column, position, column_missing in zip(medians, columns, missing.T):
+        X[column_missing, position] = medians[column]
+    rows = missing.any(axis=1)
+    derived = diabetes_derived_features(*(X[rows, positions[name]] for name in ('Glucose', 'BMI', 'Age')))
+    for feature, values in derived.items():
+        X[rows, positions[feature]] = values
+    return X
+
+def to_number(value):
+    """``value`` as a float; NaN when it is missing or not numeric"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+def prepare_breast_cancer_record(features):
+    return {breast_cancer_feature_name(name): value for name, value in features.items()}
+
+def prepare_diabetes_record(features):
+    if not {'Glucose', 'BMI', 'Age'} <= set(features):
+        return features
+    derived = diabetes_derived_features(*(to_number(features[name]) for name in ('Glucose', 'BMI', 'Age')))
+    return {**features, **derived}
+
+# Preparation of one patient's features (a dict) per disease, for the diseases that need one
+RECORD_PREPARERS = {
+    'breast_cancer': prepare_breast_cancer_record,
+    'diabetes': prepare_diabetes_record
+}
@@ -0,0 +1,305 @@
+"""Assessment history: every completed prediction, kept in a local SQLite store.
+
+The database (HISTORY_DB_PATH in src.config) runs in WAL mode, so the history
+pages read while assessments are being written. One row per assessment:
+
+    patient_id, assessment_type, assessed_at   indexed for range queries per
+                                              patient, per type and by date
+    high_risk, risk_score, status             the outcome; status is Critical
+                                              for a high-risk prediction,
+                                              Warning when only risk factors
+                                              fired, Normal otherwise
+    inputs, risk_factors                      JSON: feature -> value, fired labels
+
+``record()`` only puts the assessment on a queue. A background writer thread
+drains the queue and inserts whatever has accumulated in one transaction, so
+a prediction never waits on the disk; ``flush()`` waits for the queue to
+drain. The query methods do their filtering and aggregation in SQL and return
+plain rows (dicts), ready for a DataFrame or a chart.
+"""
+import datetime
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from .config import HISTORY_DB_PATH
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ASSESSMENT_TYPES = ["Breast Cancer", "Diabetes", "Heart Disease", "Parkinson's"]
+STATUSES = ["Normal", "Warning", "Critical"]
+
+# Trend metric -> model input it is read from
+TREND_METRICS = {
+    'Glucose Level': 'Glucose',
+    'BMI': 'BMI',
+    'Diastolic Blood Pressure': 'BloodPressure',
+    'Resting Blood Pressure': 'trestbps',
+    'Cholesterol': 'chol',
+    'Max Heart Rate': 'thalach'
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assessments (
+    id INTEGER PRIMARY KEY,
+    patient_id TEXT NOT NULL,
+    assessment_type TEXT NOT NULL,
+    assessed_at TEXT NOT NULL,
+    high_risk INTEGER NOT NULL,
+    risk_score REAL,
+    status TEXT NOT NULL,
+    inputs TEXT,
+    risk_factors TEXT
+);
+CREATE INDEX IF NOT EXISTS assessments_patient ON assessments (patient_id, assessed_at);
+CREATE INDEX IF NOT EXISTS assessments_type ON assessments (assessment_type, assessed_at);
+CREATE INDEX IF NOT EXISTS assessments_date ON assessments (assessed_at);
+"""
+
+INSERT = """
+INSERT INTO assessments
+    (patient_id, assessment_type, assessed_at, high_risk, risk_score, status, inputs, risk_factors)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+def assessment_status(high_risk, risk_factors=()):
+    if high_risk:
+        return "Critical"
+    return "Warning" if risk_factors else "Normal"
+
+def timestamp(value):
+    """ISO text the assessed_at column holds: 'YYYY-MM-DD HH:MM:SS' in local time"""
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=' ', timespec='seconds')
+    return value.isoformat()
+
+def date_range(start, end):
+    """assessed_at bounds [start, end) covering the whole of both dates"""
+    return timestamp(start), timestamp(end + datetime.timedelta(days=1))
+
+def like_pattern(term):
+    """LIKE pattern matching ``term`` anywhere, its % and _ taken literally (with ESCAPE '\\')"""
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+def connect(path):
+    connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    # WAL makes NORMAL safe against corruption; a power cut can only lose the last commits
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+class AssessmentHistory:
+    def __init__(self, path=HISTORY_DB_PATH, batch_size=256):
+        self.path = path
+        self.batch_size = batch_size
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with connect(path) as connection:
+            connection.executescript(SCHEMA)
+        self.queue = queue.Queue()
+        self.written = 0
+        self.failed = 0
+        self._local = threading.local()
+        self._writer = threading.Thread(target=self._write_loop, name='history-writer', daemon=True)
+        self._writer.start()
+
+    def record(self, patient_id, assessment_type, high_risk, risk_score=None, inputs=None, risk_factors=(),
+               assessed_at=None):
+        """Queue one completed assessment for the writer; returns immediately"""
+        self.queue.put((
+            str(patient_id),
+            assessment_type,
+            timestamp(assessed_at or datetime.datetime.now()),
+            int(bool(high_risk)),
+            None if risk_score is None else float(risk_score),
+            assessment_status(high_risk, risk_factors),
+            json.dumps(inputs) if inputs is not None else None,
+            json.dumps(list(risk_factors))
+        ))
+
+    def flush(self):
+        """Block until every queued assessment has been written"""
+        self.queue.join()
+
+    def close(self):
+        self.queue.put(None)
+        self._writer.join()
+
+    def _write_loop(self):
+        connection = connect(self.path)
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [row for row in batch if row is not None]
+            try:
+                if rows:
+                    with connection:
+                        connection.executemany(INSERT, rows)
+                    self.written += len(rows)
+            except Exception as e:
+                # Any failure only loses this batch: the writer must outlive it, or flush() and
+                # close() would wait forever on the rows queued after it
+                self.failed += len(rows)
+                logger.error(f"Could not write {len(rows)} assessments to {self.path}: {str(e)}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+            if len(rows) < len(batch):
+                connection.close()
+                return
+
+    def _reader(self):
+        # One read connection per thread (Streamlit runs each session in its own thread)
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = connect(self.path)
+        return connection
+
+    def _query(self, sql, parameters):
+        return [dict(row) for row in self._reader().execute(sql, parameters).fetchall()]
+
+    @staticmethod
+    def _filters(start, end, types=None, patient_id=None):
+        """WHERE clause and parameters for a date range, assessment types and a patient"""
+        clauses = ["assessed_at >= ?", "assessed_at < ?"]
+        parameters = list(date_range(start, end))
+        if types:
+            clauses.append(f"assessment_type IN ({', '.join('?' * len(types))})")
+            parameters.extend(types)
+        if patient_id:
+            clauses.append("patient_id = ?")
+            parameters.append(patient_id)
+        return " AND ".join(clauses), parameters
+
+    def assessments(self, start, end, types=None, patient_id=None, search=None, limit=500):
+        """Assessments in the date range, newest first"""
+        where, parameters = self._filters(start, end, types, patient_id)
+        if search:
+            where += (
+                " AND (assessment_type LIKE ? ESCAPE '\\' OR status LIKE ? ESCAPE '\\'"
+                " OR patient_id LIKE ? ESCAPE '\\' OR risk_factors LIKE ? ESCAPE '\\')"
+            )
+            parameters.extend([like_pattern(search)] * 4)
+        return self._query(
+            f"SELECT patient_id, assessment_type, assessed_at, risk_score, status, risk_factors "
+            f"FROM assessments WHERE {where} ORDER BY assessed_at DESC LIMIT ?",
+            parameters + [limit]
+        )
+
+    def summary(self, start, end, types=None, patient_id=None):
+        """Count, mean risk score, critical count and the first and last risk score in the range"""
+        where, parameters = self._filters(start, end, types, patient_id)
+        rows = self._query(
+            f"""
+            SELECT COUNT(*) AS assessments,
+                   AVG(risk_score) AS mean_risk,
+                   COALESCE(SUM(status = 'Critical'), 0) AS critical,
+                   (SELECT risk_score FROM assessments WHERE {where} ORDER BY assessed_at ASC LIMIT 1) AS first_risk,
+                   (SELECT risk_score FROM assessments WHERE {where} ORDER BY assessed_at DESC LIMIT 1) AS last_risk
+            FROM assessments WHERE {where}
+            """,
+            parameters * 3
+        )
+        return rows[0]
+
+    def daily_risk(self, start, end, types=None, patient_id=None):
+        """Mean risk score and assessment count per day and assessment type"""
+        where, parameters = self._filters(start, end, types, patient_id)
+        return self._query(
+            f"SELECT date(assessed_at) AS day, assessment_type, AVG(risk_score) AS risk_score, COUNT(*) AS assessments "
+            f"FROM assessments WHERE {where} GROUP BY day, assessment_type ORDER BY day",
+            parameters
+        )
+
+    def metric_trends(self, start, end, metrics, patient_id=None):
+        """Daily mean of each TREND_METRICS entry, read from the recorded model inputs"""
+        where, parameters = self._filters(start, end, None, patient_id)
+        columns = ", ".join(
+            f"AVG(json_extract(inputs, '$.{TREND_METRICS[metric]}')) AS \"{metric}\"" for metric in metrics
+        )
+        return self._query(
+            f"SELECT date(assessed_at) AS day, {columns} FROM assessments WHERE {where} "
+            f"GROUP BY day ORDER BY day",
+            parameters
+        )
+
+    def metric_summary(self, start, end, metrics, patient_id=None):
+        """{metric: {'mean', 'min', 'max'}} over the range"""
+        where, parameters = self._filters(start, end, None, patient_id)
+        columns = ", ".join(
+            f"AVG(json_extract(inputs, '$.{TREND_METRICS[metric]}')), "
+            f"MIN(json_extract(inputs, '$.{TREND_METRICS[metric]}')), "
+            f"MAX(json_extract(inputs, '$.{TREND_METRICS[metric]}'))"
+            for metric in metrics
+        )
+        row = self._reader().execute(f"SELECT {columns} FROM assessments WHERE {where}", parameters).fetchone()
+        return {
+            metric: {'mean': row[3 * position], 'min': row[3 * position + 1], 'max': row[3 * position + 2]}
+            for position, metric in enumerate(metrics)
+        }
+
+    def _stream(self, sql, parameters, batch_size):
+        cursor = self._reader().execute(sql, parameters)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            cursor.close()
+
+    def iter_assessments(self, start, end, types=None, patient_id=None, batch_size=1000):
+        """Every assessment in the range, oldest first, fetched ``batch_size`` rows at a time"""
+        where, parameters = self._filters(start, end, types, patient_id)
+        return self._stream(
+            f"SELECT assessed_at, patient_id, assessment_type, high_risk, risk_score, status, risk_factors, inputs "
+            f"FROM assessments WHERE {where} ORDER BY assessed_at",
+            parameters, batch_size
+        )
+
+    def iter_daily_summary(self, start, end, types=None, patient_id=None, batch_size=1000):
+        """Per day and assessment type: count, mean risk score and the Critical and Warning counts"""
+        where, parameters = self._filters(start, end, types, patient_id)
+        return self._stream(
+            f"SELECT date(assessed_at) AS day, assessment_type, COUNT(*) AS assessments, AVG(risk_score) AS risk_score, "
+            f"SUM(status = 'Critical') AS critical, SUM(status = 'Warning') AS warning "
+            f"FROM assessments WHERE {where} GROUP BY day, assessment_type ORDER BY day, assessment_type",
+            parameters, batch_size
+        )
+
+    def latest(self, patient_id=None, assessment_type=None, limit=2):
+        """The most recent assessments, newest first"""
+        clauses, parameters = [], []
+        if patient_id:
+            clauses.append("patient_id = ?")
+            parameters.append(patient_id)
+        if assessment_type:
+            clauses.append("assessment_type = ?")
+            parameters.append(assessment_type)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._query(
+            f"SELECT patient_id, assessment_type, assessed_at, risk_score, status FROM assessments {where} "
+            f"ORDER BY assessed_at DESC LIMIT ?",
+            parameters + [limit]
+        )
+
+_history = None
+_history_lock = threading.Lock()
+
+def get_history():
+    """The process-wide history store, opened (and its writer started) on first use"""
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = AssessmentHistory()
+        return _history
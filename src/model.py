@@ -2,10 +2,19 @@ from sklearn.neighbors import KNeighborsClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
 from .models.base_model import BaseModel
+from .models.rules import RuleSet
 from .config import BREAST_CANCER_MODEL_PATH, RANDOM_STATE, TEST_SIZE
 import numpy as np
 import pandas as pd
 
+# Clinical risk rules on raw measurements: (feature, comparator, threshold, increment, label)
+BREAST_CANCER_RISK_RULES = [
+    ('mean radius', '>', 15, 0.1, "Mean radius ({value:.2f}) is elevated"),
+    ('mean concave points', '>', 0.05, 0.15, "Mean concave points ({value:.3f}) are high"),
+    ('worst radius', '>', 20, 0.15, "Worst radius ({value:.2f}) is significantly elevated"),
+    ('worst concave points', '>', 0.15, 0.15, "Worst concave points ({value:.3f}) are very high")
+]
+
 class BreastCancerModel(BaseModel):
     def __init__(self):
         super().__init__(BREAST_CANCER_MODEL_PATH)
@@ -39,80 +48,72 @@ class BreastCancerModel(BaseModel):
             'worst area': 1.8,
             'worst concave points': 2.0
         }
+        
+        self.risk_rules = RuleSet(BREAST_CANCER_RISK_RULES, self.feature_names)
     
     def train(self, X, y):
-        # Convert input to DataFrame if it's not already
-        if not isinstance(X, pd.DataFrame):
-            X = pd.DataFrame(X, columns=self.feature_names)
-            
-        # Apply feature weights
-        X_weighted = X.copy()
-        for feature, weight in self.feature_weights.items():
-            if feature in X.columns:
-                X_weighted[feature] = X_weighted[feature] * weight
+        with self.timed('train.weights', len(X)):
+            # Convert input to DataFrame if it's not already
+            if not isinstance(X, pd.DataFrame):
+                X = pd.DataFrame(X, columns=self.feature_names)
+                
+            # Apply feature weights
+            X_weighted = X.copy()
+            for feature, weight in self.feature_weights.items():
+                if feature in X.columns:
+                    X_weighted[feature] = X_weighted[feature] * weight
         
-        X_train, X_test, y_train, y_test = train_test_split(
-            X_weighted, y, test_size=TEST_SIZE, random_state=RANDOM_STATE,
-            stratify=y
-        )
+        with self.timed('train.split', len(X)):
+            X_train, X_test, y_train, y_test = train_test_split(
+                X_weighted, y, test_size=TEST_SIZE, random_state=RANDOM_STATE,
+                stratify=y
+            )
         
         # Store training data as DataFrame/Series
         self.X_train = pd.DataFrame(X_train, columns=self.feature_names)
         self.y_train = pd.Series(y_train)
         
-        self.model.fit(X_train, y_train)
-        return self.evaluate(X_train, X_test, y_train, y_test)
+        with self.timed('train.fit', len(X_train)):
+            self.model.fit(X_train, y_train)
+        self.build_index()
+        self.prepare_transform()
+        with self.timed('train.evaluate', len(X)):
+            return self.evaluate(X_train, X_test, y_train, y_test)
     
-    def predict(self, X):
-        # Convert input to DataFrame
-        if not isinstance(X, pd.DataFrame):
-            X = pd.DataFrame(X, columns=self.feature_names)
+    def predict_batch(self, X, return_risk_factors=False):
+        with self.timed('predict.transform'):
+            X_raw = self.raw_matrix(X)
             
-        if self.scaler:
-            X = pd.DataFrame(self.scaler.transform(X), columns=self.feature_names)
-        
-        # Apply feature weights
-        for feature, weight in self.feature_weights.items():
-            if feature in X.columns:
-                X[feature] = X[feature] * weight
+            # Scale and apply feature weights
+            X = self.transform_inputs(X_raw)
+        rows = len(X_raw)
         
-        # Get nearest neighbors
-        distances, indices = self.model.kneighbors(X)
-        
-        # Ensure X_train and y_train are DataFrame/Series
-        if isinstance(self.X_train, np.ndarray):
-            self.X_train = pd.DataFrame(self.X_train, columns=self.feature_names)
-        if isinstance(self.y_train, np.ndarray):
-            self.y_train = pd.Series(self.y_train)
-        
-        # Get similar cases
-        similar_cases = self.X_train.iloc[indices[0]]
-        similar_outcomes = self.y_train.iloc[indices[0]]
+        # Get nearest neighbors for every row at once
+        with self.timed('predict.kneighbors', rows):
+            distances, indices = self.kneighbors(X)
         
         # Calculate weighted probability
-        weights = 1 / (distances[0] + 1e-6)
-        weighted_prob = np.sum(similar_outcomes * weights) / np.sum(weights)
+        with self.timed('predict.probability', rows):
+            weighted_prob = self.weighted_probability(distances, indices)
         
-        # Check risk factors
-        if self.scaler:
-            X_orig = pd.DataFrame(self.scaler.inverse_transform(X), columns=self.feature_names)
-        else:
-            X_orig = X
-            
         # Add risk based on key measurements
-        if X_orig['mean radius'].iloc[0] > 15:
-            weighted_prob += 0.1
-        if X_orig['mean concave points'].iloc[0] > 0.05:
-            weighted_prob += 0.15
-        if X_orig['worst radius'].iloc[0] > 20:
-            weighted_prob += 0.15
-        if X_orig['worst concave points'].iloc[0] > 0.15:
-            weighted_prob += 0.15
+        with self.timed('predict.rules', rows):
+            increments, fired = self.risk_rules.evaluate(X_raw)
+            weighted_prob = weighted_prob + increments
             
-        # Make prediction based on threshold
-        prediction = np.array([0 if weighted_prob >= self.high_risk_threshold else 1])
+        # Make prediction based on threshold (0 = malignant)
+        predictions = np.where(weighted_prob >= self.high_risk_threshold, 0, 1)
         
-        return prediction, similar_cases, similar_outcomes, distances[0]
+        if return_risk_factors:
+            with self.timed('predict.labels', rows):
+                labels = self.risk_rules.fired_labels(fired, X_raw)
+            return predictions, weighted_prob, indices, distances, labels
+        return predictions, weighted_prob, indices, distances
+    
+    def runtime_spec(self):
+        spec = super().runtime_spec()
+        spec['high_risk_label'] = 0  # 0 = malignant
+        return spec
     
     def evaluate(self, X_train, X_test, y_train, y_test):
         train_accuracy = accuracy_score(y_train, self.model.predict(X_train))
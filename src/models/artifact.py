@@ -0,0 +1,232 @@
+"""Memory-mappable on-disk format for the kNN model artifacts.
+
+Layout of a ``.mmap`` artifact (written and read by ``src.models.layout``)::
+
+    MAGIC (8 bytes) | header length (uint64, little endian) | JSON header | padding | arrays
+
+The JSON header holds the small model parameters (scaler mean/scale, feature
+names, feature weights, thresholds, estimator parameters such as k, the
+neighbor-index parameters) and, for each stored array, its dtype, shape and
+byte offset. Every array starts on a 64-byte boundary and is C-contiguous, so
+``np.memmap`` opens it in place with no deserialization and no private copy:
+processes loading the same artifact share the pages through the OS page cache.
+
+The reference set is float64 with int64 labels, or float32 with uint8 labels
+for models made compact with ``BaseModel.compact()`` (``--compact`` below).
+"""
+import argparse
+import json
+import logging
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+from .layout import ALIGNMENT, MAGIC, read_artifact, write_artifact
+from .neighbors import index_from_state
+from .paths import ARTIFACT_SUFFIX, DELTA_SUFFIX, artifact_path_for, delta_path_for
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Append-only log of cases added with add_cases() since the artifact was written
+DELTA_MAGIC = b"MEDDLT01"
+
+def scaler_state(scaler, prefix='scaler'):
+    """Return (header, arrays) for a fitted StandardScaler"""
+    header = {
+        'n_samples_seen': int(scaler.n_samples_seen_),
+        'feature_names_in': [str(name) for name in getattr(scaler, 'feature_names_in_', [])]
+    }
+    arrays = {f'{prefix}_mean': scaler.mean_, f'{prefix}_scale': scaler.scale_, f'{prefix}_var': scaler.var_}
+    return header, arrays
+
+def restore_scaler(header, arrays, prefix='scaler'):
+    """Rebuild the StandardScaler described by scaler_state()"""
+    scaler = StandardScaler()
+    scaler.mean_ = np.asarray(arrays[f'{prefix}_mean'])
+    scaler.scale_ = np.asarray(arrays[f'{prefix}_scale'])
+    scaler.var_ = np.asarray(arrays[f'{prefix}_var'])
+    scaler.n_samples_seen_ = header['n_samples_seen']
+    scaler.n_features_in_ = len(scaler.mean_)
+    if header['feature_names_in']:
+        scaler.feature_names_in_ = np.asarray(header['feature_names_in'], dtype=object)
+    return scaler
+
+def _base_signature(base_path):
+    stat = os.stat(base_path)
+    return [os.path.basename(base_path), stat.st_size, stat.st_mtime_ns]
+
+def append_delta(path, base_path, X_raw, rows, y):
+    """Append one batch of added cases to the delta log at ``path``.
+
+    Each frame is DELTA_MAGIC | header length | JSON header | raw inputs | reference rows | labels,
+    and records the artifact it extends so a rewritten artifact never replays stale cases.
+    """
+    X_raw = np.ascontiguousarray(X_raw, dtype='<f8')
+    rows = np.ascontiguousarray(rows, dtype='<f8')
+    y = np.ascontiguousarray(y, dtype='<i8')
+    header = json.dumps({
+        'base': _base_signature(base_path), 'rows': len(y), 'features': rows.shape[1]
+    }).encode("utf-8")
+    with open(path, "ab") as f:
+        f.write(DELTA_MAGIC + len(header).to_bytes(8, "little") + header)
+        f.write(X_raw.tobytes() + rows.tobytes() + y.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+
+def read_delta(path, base_path):
+    """Return the (X_raw, rows, y) frames of the delta log that extend ``base_path``"""
+    signature = _base_signature(base_path)
+    frames = []
+    with open(path, "rb") as f:
+        while True:
+            magic = f.read(len(DELTA_MAGIC))
+            if not magic:
+                break
+            try:
+                if magic != DELTA_MAGIC:
+                    raise ValueError("bad frame marker")
+                header = json.loads(f.read(int.from_bytes(f.read(8), "little")).decode("utf-8"))
+                n, d = header['rows'], header['features']
+                payload = f.read(8 * (2 * n * d + n))
+                if len(payload) != 8 * (2 * n * d + n):
+                    raise ValueError("truncated frame")
+            except (ValueError, KeyError) as e:
+                # A write interrupted part way leaves a torn last frame; the frames before it are intact
+                logger.warning(f"{path}: {str(e)}, ignoring the rest of the log")
+                break
+            if header['base'] != signature:
+                logger.warning(f"{path}: skipping {n} cases recorded against a different artifact")
+                continue
+            values = np.frombuffer(payload, dtype='<f8', count=2 * n * d)
+            y = np.frombuffer(payload, dtype='<i8', offset=8 * 2 * n * d)
+            frames.append((values[:n * d].reshape(n, d), values[n * d:].reshape(n, d), y))
+    return frames
+
+def save_model_artifact(model, path):
+    """Write a fitted kNN model (estimator parameters, scaler and reference set) to ``path``"""
+    X_train = model.X_train
+    if not isinstance(X_train, pd.DataFrame):
+        X_train = pd.DataFrame(X_train, columns=model.feature_names)
+    y_train = pd.Series(model.y_train)
+    reference_dtype = getattr(model, 'reference_dtype', 'float64')
+
+    header = {
+        'model_class': type(model).__name__,
+        'feature_names': list(model.feature_names),
+        'columns': [str(column) for column in X_train.columns],
+        'feature_weights': getattr(model, 'feature_weights', {}),
+        'high_risk_threshold': getattr(model, 'high_risk_threshold', None),
+        'zero_medians': getattr(model, 'zero_medians', None),
+        'estimator': model.model.get_params(),
+        'fit_with_feature_names': hasattr(model.model, 'feature_names_in_'),
+        'reference_dtype': reference_dtype,
+        'scaler': None
+    }
+    arrays = {
+        'X_train': X_train.to_numpy(dtype=reference_dtype),
+        'X_index': X_train.index.to_numpy(dtype=np.int64),
+        'y_train': y_train.to_numpy(dtype=np.uint8 if reference_dtype == 'float32' else np.int64),
+        'y_index': y_train.index.to_numpy(dtype=np.int64)
+    }
+    if model.scaler is not None:
+        header['scaler'], scaler_arrays = scaler_state(model.scaler)
+        arrays.update(scaler_arrays)
+
+    # Persist the built neighbor index; arrays equal to the reference set are stored only once
+    index = model.index if model.index is not None else model.build_index()
+    header['index'], index_arrays = index.get_state()
+    header['index_arrays'] = {}
+    for name, array in index_arrays.items():
+        if (array.dtype == arrays['X_train'].dtype and array.shape == arrays['X_train'].shape
+                and np.array_equal(array, arrays['X_train'])):
+            header['index_arrays'][name] = 'X_train'
+        else:
+            header['index_arrays'][name] = f'index_{name}'
+            arrays[f'index_{name}'] = array
+
+    write_artifact(path, header, arrays)
+
+def load_model_artifact(instance, path):
+    """Populate a freshly constructed model ``instance`` from the artifact at ``path``"""
+    header, arrays = read_artifact(path)
+    if header['model_class'] != type(instance).__name__:
+        raise ValueError(f"{path} holds a {header['model_class']}, not a {type(instance).__name__}")
+
+    if header['scaler'] is not None:
+        instance.scaler = restore_scaler(header['scaler'], arrays)
+
+    instance.feature_names = header['feature_names']
+    if header['feature_weights']:
+        instance.feature_weights = header['feature_weights']
+    if header['high_risk_threshold'] is not None:
+        instance.high_risk_threshold = header['high_risk_threshold']
+    if header.get('zero_medians') is not None:
+        instance.zero_medians = header['zero_medians']
+
+    # Wrap the memory maps without copying them
+    instance.X_train = pd.DataFrame(
+        arrays['X_train'], index=pd.Index(arrays['X_index']), columns=header['columns'], copy=False
+    )
+    instance.y_train = pd.Series(arrays['y_train'], index=pd.Index(arrays['y_index']), copy=False)
+
+    instance.reference_dtype = header.get('reference_dtype', 'float64')
+    instance.model.set_params(**header['estimator'])
+    if header.get('index'):
+        # Queries go through the restored index, so the estimator is not refit at load
+        instance.index_engine = header['index']['engine']
+        instance.index = index_from_state(
+            header['index'], {name: arrays[stored] for name, stored in header['index_arrays'].items()}
+        )
+    else:
+        X_fit = instance.X_train if header['fit_with_feature_names'] else arrays['X_train']
+        instance.model.fit(X_fit, arrays['y_train'])
+    return instance
+
+def convert_pickle(model_cls, compact=False):
+    """Convert the legacy pickle of ``model_cls`` into the memory-mappable format, optionally compact"""
+    instance = model_cls()
+    with open(instance.model_path, 'rb') as f:
+        model_data = pickle.load(f)
+    instance.model = model_data['model']
+    instance.scaler = model_data['scaler']
+    instance.X_train = model_data['X_train']
+    instance.y_train = model_data['y_train']
+    if model_data.get('zero_medians') is not None:
+        instance.zero_medians = model_data['zero_medians']
+    if compact:
+        instance.compact()
+
+    path = artifact_path_for(instance.model_path)
+    save_model_artifact(instance, path)
+    instance.save_case_store()
+    logger.info(f"Converted {instance.model_path} -> {path}")
+    return path
+
+def main():
+    from ..model import BreastCancerModel
+    from .diabetes import DiabetesModel
+    from .heart_disease import HeartDiseaseModel
+    from .parkinsons import ParkinsonsModel
+
+    model_classes = {
+        'breast_cancer': BreastCancerModel,
+        'diabetes': DiabetesModel,
+        'heart_disease': HeartDiseaseModel,
+        'parkinsons': ParkinsonsModel
+    }
+    parser = argparse.ArgumentParser(description="Convert models/*.pkl into memory-mappable artifacts")
+    parser.add_argument('--only', nargs='+', choices=sorted(model_classes), help="Models to convert (default: all)")
+    parser.add_argument('--compact', action='store_true', help="Store float32 reference rows and uint8 labels")
+    args = parser.parse_args()
+
+    for name in args.only or model_classes:
+        model_cls = model_classes[name]
+        if not os.path.exists(model_cls().model_path):
+            logger.warning(f"Skipping {name}: no pickle at {model_cls().model_path}")
+            continue
+        convert_pickle(model_cls, args.compact)
+
+if __name__ == "__main__":
+    main()
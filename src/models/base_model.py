@@ -3,43 +3,342 @@ import joblib
 import logging
 import pickle
 from pathlib import Path
+import os
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+from .artifact import (
+    append_delta, artifact_path_for, delta_path_for, load_model_artifact, read_delta, save_model_artifact
+)
+from .case_store import CaseStore, case_store_path_for, load_case_store
+from .instrumentation import NULL_TIMER, instrumentation
+from .neighbors import INDEX_ENGINES, make_index
+from .prediction_cache import PredictionCache
+from ..config import PREDICTION_CACHE_BYTES, PREDICTION_CACHE_ENTRIES
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class BaseModel(ABC):
+    # 'mmap' writes the memory-mappable artifact next to model_path; 'pickle' keeps the legacy format
+    artifact_format = 'mmap'
+    
+    # Whether the model scores from a stored reference set; add_cases() needs one
+    instance_based = True
+    
+    # add_cases() logs a warning once a feature mean has moved this many scaler units
+    drift_warning = 0.25
+    
     def __init__(self, model_path):
         self.model_path = model_path
+        self.artifact_path = artifact_path_for(model_path)
+        self.delta_path = delta_path_for(model_path)
+        self.case_store_path = case_store_path_for(model_path)
         self.model = None
         self.scaler = None
         self.X_train = None
         self.y_train = None
+        self.feature_weights = {}
+        
+        # Scaling and feature weighting folded into one affine map, see prepare_transform()
+        self.input_coef = None
+        self.input_offset = None
+        
+        # Neighbor-index engine used by kneighbors(): 'brute', 'kd_tree', 'ball_tree' or 'pivot'
+        self.index_engine = 'kd_tree'
+        self.index = None
+        
+        # 'float64', or 'float32' for the compact reference set, see compact()
+        self.reference_dtype = 'float64'
+        
+        # Unscaled records of the reference cases, opened on the first lookup, see case_store()
+        self.cases = None
+        
+        # Bumped whenever the transform, the index or the reference set changes; cached predictions
+        # are only served for the version they were computed with
+        self.version = 0
+        self.prediction_cache = PredictionCache(PREDICTION_CACHE_ENTRIES, PREDICTION_CACHE_BYTES) \
+            if PREDICTION_CACHE_ENTRIES > 0 else None
+        
+        # Running statistics of the raw inputs of cases added since the scaler was fit
+        self.case_stats = None
     
     @abstractmethod
     def train(self, X, y):
         pass
     
     @abstractmethod
-    def predict(self, X):
+    def predict_batch(self, X, return_risk_factors=False):
+        """Score an (N, n_features) matrix with a single kneighbors call.
+
+        Returns (predictions, probabilities, indices, distances) with one row per input row,
+        plus the fired risk-factor labels per row when return_risk_factors is set.
+        """
         pass
     
+    def predict(self, X, return_risk_factors=False):
+        """Score a single case; thin wrapper over predict_batch, answered from prediction_cache when possible.
+
+        Returns (prediction, probability, neighbor positions, their outcomes, their distances[, risk factors]);
+        similar_cases() reads the neighbors' records when they are shown.
+        """
+        cache = self.prediction_cache
+        key = None
+        if cache is not None:
+            X = self.raw_matrix(X)
+            key = cache.key(self, X, return_risk_factors)
+            if key is not None:
+                result = cache.get(key, self.version)
+                if result is not None:
+                    return result
+        
+        result = self.predict_uncached(X, return_risk_factors)
+        if key is not None:
+            cache.put(key, self.version, result)
+        return result
+    
+    def predict_uncached(self, X, return_risk_factors=False):
+        """predict() without the prediction cache"""
+        results = self.predict_batch(X, return_risk_factors=return_risk_factors)
+        predictions, probabilities, indices, distances = results[:4]
+        similar_outcomes = np.asarray(self.y_train)[indices[0]]
+        
+        if return_risk_factors:
+            return predictions[:1], probabilities[:1], indices[0], similar_outcomes, distances[0], results[4][0]
+        return predictions[:1], probabilities[:1], indices[0], similar_outcomes, distances[0]
+    
+    def similar_cases(self, indices):
+        """Records of the reference cases at ``indices`` (as predict returns them) in input units, indexed by case id"""
+        with self.timed('predict.lookup', len(indices)):
+            return self.case_store().lookup(indices)
+    
+    def runtime_spec(self):
+        """How predict_batch scores, for bundles of the NumPy runtime (src/models/runtime.py)"""
+        return {
+            'scoring': 'inverse_distance',
+            'threshold': getattr(self, 'high_risk_threshold', 0.5),
+            'high_risk_label': 1,
+            'rules_adjust_probability': True,
+            'rules': [list(rule) for rule in self.risk_rules.rules],
+            'feature_ranges': None
+        }
+    
+    def case_store(self):
+        """Columnar store of the unscaled reference cases, opened on first use"""
+        if self.cases is None:
+            self.cases = load_case_store(self)
+        return self.cases
+    
+    def save_case_store(self):
+        """Write the unscaled reference cases next to the model (no-op without a reference set)"""
+        if self.X_train is not None:
+            self.case_store().write(self.case_store_path)
+    
+    def timed(self, stage, rows=None):
+        """Context manager timing one stage into the metrics sinks; a shared no-op unless instrumentation is enabled"""
+        if not instrumentation.enabled:
+            return NULL_TIMER
+        return instrumentation.timer(type(self).__name__, stage, rows)
+    
+    def prepare_transform(self):
+        """Fold the scaler mean/scale and the feature weights into x * input_coef + input_offset"""
+        self.version += 1
+        weights = np.array([self.feature_weights.get(feature, 1.0) for feature in self.feature_names])
+        if self.scaler is not None:
+            self.input_coef = weights / self.scaler.scale_
+            self.input_offset = -self.scaler.mean_ * self.input_coef
+        else:
+            self.input_coef = weights
+            self.input_offset = np.zeros(len(weights))
+    
+    def transform_inputs(self, X_raw):
+        """Scaled, feature-weighted query matrix from raw inputs in a single multiply-add"""
+        if self.input_coef is None:
+            self.prepare_transform()
+        X = X_raw * self.input_coef
+        X += self.input_offset
+        return X
+    
+    def raw_matrix(self, X):
+        """Unscaled input as an (N, n_features) float matrix in feature_names order"""
+        if isinstance(X, pd.DataFrame):
+            X = X[self.feature_names]
+        return np.atleast_2d(np.asarray(X, dtype=np.float64))
+    
+    def valid_rows(self, X):
+        """Row mask of inputs the model can score: every feature present and finite"""
+        return np.isfinite(self.raw_matrix(X)).all(axis=1)
+    
+    def build_index(self):
+        """(Re)build the neighbor index over the stored reference set"""
+        self.version += 1
+        with self.timed('index.build', len(self.X_train)):
+            params = self.model.get_params()
+            self.index = make_index(self.index_engine, params['metric'], params['p'])
+            self.index.fit(self.reference_matrix())
+        return self.index
+    
+    def reference_matrix(self):
+        """The reference set as one contiguous matrix of reference_dtype"""
+        return np.ascontiguousarray(self.X_train, dtype=self.reference_dtype)
+    
+    def compact(self):
+        """Store the reference set as float32 and the labels as uint8, halving the reference memory.
+
+        scikit-learn's trees only hold float64 data, so a tree engine is swapped for the brute
+        engine. benchmarks/compact_reference.py checks the compact model against the float64 one.
+        """
+        y = np.asarray(self.y_train)
+        if len(y) and (y.min() < 0 or y.max() > np.iinfo(np.uint8).max):
+            raise ValueError("Labels do not fit in uint8")
+        if not INDEX_ENGINES[self.index_engine].float32_data:
+            logger.info(f"{type(self).__name__}: {self.index_engine} needs float64 data, using the brute engine")
+            self.index_engine = 'brute'
+        
+        # Resolve the unscaled records first, float32 rows only map back to float32 precision
+        self.case_store()
+        if not isinstance(self.X_train, pd.DataFrame):
+            self.X_train = pd.DataFrame(self.X_train, columns=self.feature_names)
+        self.X_train = self.X_train.astype(np.float32)
+        self.y_train = pd.Series(self.y_train).astype(np.uint8)
+        self.reference_dtype = 'float32'
+        self.build_index()
+        return self
+    
+    def kneighbors(self, X):
+        """Distances and indices of the n_neighbors nearest reference rows for every row of X"""
+        if self.index is None:
+            self.build_index()
+        return self.index.query(np.asarray(X, dtype=np.float64), self.model.n_neighbors)
+    
+    def weighted_probability(self, distances, indices):
+        """Inverse-distance weighted share of positive outcomes for each row"""
+        outcomes = np.asarray(self.y_train)[indices]
+        weights = 1 / (distances + 1e-6)  # Add small constant to avoid division by zero
+        return np.sum(outcomes * weights, axis=1) / np.sum(weights, axis=1)
+    
+    def add_cases(self, X, y, persist=True):
+        """Append labelled cases to the reference set and the neighbor index without retraining.
+
+        Cases are scaled and weighted with the current transform, and appended to the delta log
+        next to the model unless persist is False; save_model() folds them into the artifact.
+        Only instance-based models have a reference set to add to, check ``instance_based`` first.
+        """
+        if not self.instance_based:
+            raise TypeError(f"{type(self).__name__} has no reference set to add cases to, retrain it instead")
+        X_raw = self.raw_matrix(X)
+        y = np.atleast_1d(np.asarray(y)).astype(np.int64)
+        if len(y) != len(X_raw):
+            raise ValueError(f"Got {len(X_raw)} cases but {len(y)} labels")
+        valid = self.valid_rows(X_raw)
+        if not valid.all():
+            raise ValueError(f"{int((~valid).sum())} case(s) have missing or out-of-range values")
+        
+        rows = self.transform_inputs(X_raw)
+        self.append_cases(X_raw, rows, y)
+        if persist:
+            append_delta(self.delta_path, self.stored_model_path(), X_raw, rows, y)
+        
+        drift = self.scaler_drift()
+        if drift is not None and drift['mean_shift'].abs().max() > self.drift_warning:
+            logger.warning(
+                f"{type(self).__name__}: added cases moved feature means by up to "
+                f"{drift['mean_shift'].abs().max():.2f} scaler units, consider a full retrain"
+            )
+        return len(y)
+    
+    def append_cases(self, X_raw, rows, y):
+        """Append already transformed reference rows and their labels"""
+        if not isinstance(self.X_train, pd.DataFrame):
+            self.X_train = pd.DataFrame(self.X_train, columns=self.feature_names)
+        if not isinstance(self.y_train, pd.Series):
+            self.y_train = pd.Series(self.y_train)
+        
+        # New cases take the row ids after the largest existing one
+        start = int(self.X_train.index.max()) + 1 if len(self.X_train) else 0
+        new_index = pd.RangeIndex(start, start + len(rows))
+        new_rows = pd.DataFrame(rows, index=new_index, columns=self.X_train.columns).astype(self.reference_dtype)
+        self.X_train = pd.concat([self.X_train, new_rows])
+        self.y_train = pd.concat([self.y_train, pd.Series(y, index=new_index).astype(self.y_train.dtype)])
+        self.cases = None
+        self.version += 1
+        
+        if self.index is None:
+            self.build_index()
+        else:
+            self.index.add(rows)
+        
+        if self.case_stats is None:
+            self.case_stats = StandardScaler()
+        self.case_stats.partial_fit(X_raw)
+    
+    def scaler_drift(self):
+        """Per-feature drift of the input statistics since the scaler was fit, in scaler units.
+
+        mean_shift is how far the mean over the scaler's samples plus the added cases has moved;
+        scale_ratio is the new standard deviation over the scaler's. None without a scaler or added cases.
+        """
+        if self.scaler is None or self.case_stats is None:
+            return None
+        n_base, n_added = self.scaler.n_samples_seen_, self.case_stats.n_samples_seen_
+        n_total = n_base + n_added
+        delta = self.case_stats.mean_ - self.scaler.mean_
+        mean = self.scaler.mean_ + delta * n_added / n_total
+        var = (n_base * self.scaler.var_ + n_added * self.case_stats.var_ + delta ** 2 * n_base * n_added / n_total) / n_total
+        return pd.DataFrame({
+            'mean_shift': (mean - self.scaler.mean_) / self.scaler.scale_,
+            'scale_ratio': np.sqrt(var) / self.scaler.scale_
+        }, index=self.feature_names)
+    
+    def stored_model_path(self):
+        """Path load_model will read: the memory-mappable artifact if present, else the pickle"""
+        if self.artifact_format == 'mmap' and os.path.exists(self.artifact_path):
+            return self.artifact_path
+        return self.model_path
+    
     def save_model(self):
+        if self.artifact_format == 'mmap':
+            save_model_artifact(self, self.artifact_path)
+            self.save_case_store()
+            self.clear_delta()
+            return
         model_data = {
             'model': self.model,
             'scaler': self.scaler,
             'X_train': self.X_train,
-            'y_train': self.y_train
+            'y_train': self.y_train,
+            'zero_medians': getattr(self, 'zero_medians', None)
         }
         with open(self.model_path, 'wb') as f:
             pickle.dump(model_data, f)
+        self.save_case_store()
+        self.clear_delta()
+    
+    def clear_delta(self):
+        # A freshly written artifact already holds every added case
+        if os.path.exists(self.delta_path):
+            os.remove(self.delta_path)
     
     @classmethod
     def load_model(cls):
         instance = cls()
-        with open(instance.model_path, 'rb') as f:
-            model_data = pickle.load(f)
-        instance.model = model_data['model']
-        instance.scaler = model_data['scaler']
-        instance.X_train = model_data['X_train']
-        instance.y_train = model_data['y_train']
+        if instance.stored_model_path() == instance.artifact_path:
+            load_model_artifact(instance, instance.artifact_path)
+        else:
+            with open(instance.model_path, 'rb') as f:
+                model_data = pickle.load(f)
+            instance.model = model_data['model']
+            instance.scaler = model_data['scaler']
+            instance.X_train = model_data['X_train']
+            instance.y_train = model_data['y_train']
+            if model_data.get('zero_medians') is not None:
+                instance.zero_medians = model_data['zero_medians']
+        if hasattr(instance, 'feature_names'):
+            instance.prepare_transform()
+        if os.path.exists(instance.delta_path):
+            frames = read_delta(instance.delta_path, instance.stored_model_path())
+            if frames:
+                X_raw, rows, y = (np.concatenate(parts) for parts in zip(*frames))
+                instance.append_cases(X_raw, rows, y)
+                logger.info(f"Replayed {len(y)} added cases from {instance.delta_path}")
         return instance 
\ No newline at end of file
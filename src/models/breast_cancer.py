@@ -5,22 +5,42 @@ from .base_model import BaseModel
 from ..config import BREAST_CANCER_MODEL_PATH, RANDOM_STATE, TEST_SIZE
 
 class BreastCancerModel(BaseModel):
+    # Logistic regression has no reference set to memory-map or add cases to
+    artifact_format = 'pickle'
+    instance_based = False
+    
     def __init__(self):
         super().__init__(BREAST_CANCER_MODEL_PATH)
         self.model = LogisticRegression(max_iter=1000, random_state=RANDOM_STATE)
     
     def train(self, X, y):
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE
-        )
+        with self.timed('train.split', len(X)):
+            X_train, X_test, y_train, y_test = train_test_split(
+                X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE
+            )
         
-        self.model.fit(X_train, y_train)
-        return self.evaluate(X_train, X_test, y_train, y_test)
+        with self.timed('train.fit', len(X_train)):
+            self.model.fit(X_train, y_train)
+        with self.timed('train.evaluate', len(X)):
+            return self.evaluate(X_train, X_test, y_train, y_test)
+    
+    def predict_batch(self, X, return_risk_factors=False):
+        with self.timed('predict.transform'):
+            if self.scaler:
+                X = self.scaler.transform(X)
+        with self.timed('predict.model', len(X)):
+            probabilities = self.model.predict_proba(X)[:, 1]
+            predictions = self.model.predict(X)
+        # Not instance-based, so there are no neighbor indices or distances
+        if return_risk_factors:
+            return predictions, probabilities, None, None, [[] for _ in range(len(X))]
+        return predictions, probabilities, None, None
     
     def predict(self, X):
-        if self.scaler:
-            X = self.scaler.transform(X)
-        return self.model.predict(X)
+        return self.predict_batch(X)[0]
+    
+    def runtime_spec(self):
+        return {'scoring': 'logistic'}
     
     def evaluate(self, X_train, X_test, y_train, y_test):
         train_accuracy = accuracy_score(y_train, self.model.predict(X_train))
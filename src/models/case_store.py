@@ -0,0 +1,157 @@
+"""Columnar store of the unscaled reference cases behind a kNN model.
+
+The reference set a model searches holds scaled, feature-weighted rows. The
+case store next to the model (``<model>.cases``, in the memory-mappable layout
+of ``src.models.artifact``) keeps the same cases in input units instead: one
+contiguous array per feature, the stable case ids (the row ids of the training
+data, and the ids given to cases added later) and the labels. Integer-valued
+features are stored as int64, everything else as float64.
+
+The values are the records as the model saw them, i.e. after cleaning and
+imputation, recovered from the reference rows by inverting the input
+transform when the model is saved. Neighbor positions are resolved with one
+gather per column, so opening the store maps it without reading it and a
+lookup touches only the k rows it returns.
+"""
+import logging
+import os
+import numpy as np
+import pandas as pd
+from .artifact import read_artifact, write_artifact
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CASES_SUFFIX = ".cases"
+
+def case_store_path_for(model_path):
+    """Path of the case store that sits next to a ``.pkl`` model path"""
+    return os.path.splitext(model_path)[0] + CASES_SUFFIX
+
+def unscaled_records(model, start=0):
+    """Reference rows from ``start`` on, mapped back to input units through the model's input transform"""
+    if model.input_coef is None:
+        model.prepare_transform()
+    reference = np.asarray(model.X_train, dtype=np.float64)[start:]
+    return (reference - model.input_offset) / model.input_coef
+
+def round_significant(values, digits):
+    """Round a column to ``digits`` significant digits of its largest value.
+
+    Drops the noise the inverse transform leaves behind, including the tiny
+    non-zero values it turns zeros into.
+    """
+    largest = np.abs(values).max() if len(values) else 0.0
+    if not largest:
+        return values
+    decimals = digits - 1 - int(np.floor(np.log10(largest)))
+    return np.round(values, decimals)
+
+class CaseStore:
+    def __init__(self, columns, values, case_ids, labels, tail=None):
+        # values: one array per column, all of the same length
+        self.columns = list(columns)
+        self.values = list(values)
+        self.case_ids = case_ids
+        self.labels = labels
+        # Cases after these ones, kept apart so the arrays above can stay memory-mapped
+        self.tail = tail
+
+    def __len__(self):
+        return len(self.case_ids) + (len(self.tail) if self.tail is not None else 0)
+
+    @classmethod
+    def from_records(cls, columns, records, case_ids, labels, digits=12):
+        """Store of the given records, rounded to ``digits`` significant digits"""
+        values = []
+        for column in np.asarray(records, dtype=np.float64).T:
+            column = round_significant(column, digits)
+            # Columns of whole numbers are integer features
+            if np.array_equal(column, np.round(column)):
+                values.append(column.astype(np.int64))
+            else:
+                values.append(np.ascontiguousarray(column))
+        return cls(columns, values, np.asarray(case_ids, dtype=np.int64), np.asarray(labels, dtype=np.int64))
+
+    @classmethod
+    def from_model(cls, model, start=0):
+        """Store of the model's reference cases from position ``start`` on"""
+        case_ids = pd.Index(model.X_train.index) if isinstance(model.X_train, pd.DataFrame) \
+            else pd.RangeIndex(len(model.X_train))
+        # A compact (float32) reference set only recovers the inputs to float32 precision
+        digits = 6 if model.reference_dtype == 'float32' else 12
+        return cls.from_records(
+            model.feature_names, unscaled_records(model, start), case_ids[start:], np.asarray(model.y_train)[start:],
+            digits
+        )
+
+    @classmethod
+    def open(cls, path):
+        header, arrays = read_artifact(path)
+        if header.get('kind') != 'cases':
+            raise ValueError(f"{path} is not a case store")
+        values = [arrays[f'column_{position}'] for position in range(len(header['columns']))]
+        return cls(header['columns'], values, arrays['case_ids'], arrays['labels'])
+
+    def write(self, path):
+        """Write the store, tail included, as one set of contiguous columns"""
+        def joined(head, tail):
+            return head if self.tail is None else np.concatenate([head, tail])
+
+        tail = self.tail if self.tail is not None else self
+        arrays = {
+            f'column_{position}': joined(values, tail_values)
+            for position, (values, tail_values) in enumerate(zip(self.values, tail.values))
+        }
+        arrays['case_ids'] = joined(self.case_ids, tail.case_ids)
+        arrays['labels'] = joined(self.labels, tail.labels)
+        write_artifact(path, {'kind': 'cases', 'columns': self.columns}, arrays)
+
+    def _gather(self, arrays, tail_arrays, positions):
+        if self.tail is None:
+            return arrays[positions]
+        in_head = positions < len(arrays)
+        out = np.empty(len(positions), dtype=np.result_type(arrays.dtype, tail_arrays.dtype))
+        out[in_head] = arrays[positions[in_head]]
+        out[~in_head] = tail_arrays[positions[~in_head] - len(arrays)]
+        return out
+
+    def lookup(self, positions):
+        """Records at the given reference-set positions, indexed by case id"""
+        positions = np.asarray(positions)
+        tail = self.tail if self.tail is not None else self
+        return pd.DataFrame(
+            {
+                column: self._gather(values, tail_values, positions)
+                for column, values, tail_values in zip(self.columns, self.values, tail.values)
+            },
+            index=pd.Index(self._gather(self.case_ids, tail.case_ids, positions), name='case_id')
+        )
+
+def load_case_store(model):
+    """Case store covering every reference case of ``model``.
+
+    The store on disk is memory-mapped when it matches the reference set; cases
+    it does not hold (added since it was written, or every case for a model saved
+    before case stores existed) are recovered from the reference rows.
+    """
+    path = case_store_path_for(model.model_path)
+    store = None
+    if os.path.exists(path):
+        try:
+            store = CaseStore.open(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable case store {path}: {str(e)}")
+    if store is not None:
+        case_ids = np.asarray(model.X_train.index) if isinstance(model.X_train, pd.DataFrame) \
+            else np.arange(len(model.X_train))
+        if (store.columns != list(model.feature_names) or len(store) > len(case_ids)
+                or not np.array_equal(store.case_ids, case_ids[:len(store)])):
+            logger.warning(f"Case store {path} does not match the model's reference set, ignoring it")
+            store = None
+
+    if store is None:
+        return CaseStore.from_model(model)
+    if len(store) < len(model.X_train):
+        store.tail = CaseStore.from_model(model, start=len(store))
+    return store
@@ -2,9 +2,19 @@ from sklearn.neighbors import KNeighborsClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
 from .base_model import BaseModel
+from .rules import RuleSet
 from ..config import DIABETES_MODEL_PATH, RANDOM_STATE, TEST_SIZE
+from ..features import fill_diabetes_zeros
 import numpy as np
 
+# Risk factors reported alongside the prediction; they do not adjust the probability
+DIABETES_RISK_RULES = [
+    ('Glucose', '>', 140, 0.0, "Glucose ({value:g} mg/dL) is above normal range"),
+    ('BMI', '>', 30, 0.0, "BMI ({value:.1f}) indicates obesity"),
+    ('BloodPressure', '>', 90, 0.0, "Blood pressure ({value:g} mm Hg) is elevated"),
+    ('DiabetesPedigreeFunction', '>', 0.8, 0.0, "Diabetes pedigree function ({value:.2f}) indicates family history")
+]
+
 class DiabetesModel(BaseModel):
     def __init__(self):
         super().__init__(DIABETES_MODEL_PATH)
@@ -19,41 +29,74 @@ class DiabetesModel(BaseModel):
         ]
         self.X_train = None
         self.y_train = None
+        # {column: training median} that missing (0) measurements are replaced with
+        self.zero_medians = None
         
         # Define risk thresholds
         self.high_risk_threshold = 0.6
+        self.risk_rules = RuleSet(DIABETES_RISK_RULES, self.feature_names)
     
     def train(self, X, y):
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE,
-            stratify=y  # Ensure balanced split
-        )
+        with self.timed('train.split', len(X)):
+            X_train, X_test, y_train, y_test = train_test_split(
+                X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE,
+                stratify=y  # Ensure balanced split
+            )
         
         self.X_train = X_train
         self.y_train = y_train
         
-        self.model.fit(X_train, y_train)
-        return self.evaluate(X_train, X_test, y_train, y_test)
+        with self.timed('train.fit', len(X_train)):
+            self.model.fit(X_train, y_train)
+        self.build_index()
+        self.prepare_transform()
+        with self.timed('train.evaluate', len(X)):
+            return self.evaluate(X_train, X_test, y_train, y_test)
     
-    def predict(self, X):
-        if self.scaler:
-            X = self.scaler.transform(X)
+    def predict_batch(self, X, return_risk_factors=False):
+        with self.timed('predict.transform'):
+            X_raw = self.raw_matrix(X)
+            X = self.transform_inputs(X_raw)
+        rows = len(X_raw)
             
-        # Get distances and indices of nearest neighbors
-        distances, indices = self.model.kneighbors(X)
-        
-        # Get similar cases
-        similar_cases = self.X_train.iloc[indices[0]]
-        similar_outcomes = self.y_train.iloc[indices[0]]
+        # Get distances and indices of nearest neighbors for every row at once
+        with self.timed('predict.kneighbors', rows):
+            distances, indices = self.kneighbors(X)
         
         # Calculate weighted probability
-        weights = 1 / (distances[0] + 1e-6)  # Add small constant to avoid division by zero
-        weighted_prob = np.sum(similar_outcomes * weights) / np.sum(weights)
-        
-        # Make prediction based on probability threshold
-        prediction = np.array([1 if weighted_prob >= self.high_risk_threshold else 0])
+        with self.timed('predict.probability', rows):
+            weighted_prob = self.weighted_probability(distances, indices)
+            
+            # Make prediction based on probability threshold
+            predictions = (weighted_prob >= self.high_risk_threshold).astype(int)
         
-        return prediction, similar_cases, similar_outcomes, distances[0]
+        if return_risk_factors:
+            with self.timed('predict.rules', rows):
+                _, fired = self.risk_rules.evaluate(X_raw)
+                labels = self.risk_rules.fired_labels(fired, X_raw)
+            return predictions, weighted_prob, indices, distances, labels
+        return predictions, weighted_prob, indices, distances
+    
+    def raw_matrix(self, X):
+        """Unscaled input matrix with missing (0) measurements filled with the training medians.
+
+        Every scoring path (predict, predict_batch, the server, screening, batch scoring)
+        reads its input through here, so they all see the inputs the model was trained on.
+        """
+        return fill_diabetes_zeros(super().raw_matrix(X), self.feature_names, self.input_medians())
+    
+    def input_medians(self):
+        """The training medians for missing (0) inputs; read from the dataset for models saved without them"""
+        if self.zero_medians is None:
+            from ..preprocessing.diabetes import load_zero_medians
+            self.zero_medians = load_zero_medians()
+        return self.zero_medians
+    
+    def runtime_spec(self):
+        spec = super().runtime_spec()
+        spec['rules_adjust_probability'] = False
+        spec['zero_medians'] = self.input_medians()
+        return spec
     
     def evaluate(self, X_train, X_test, y_train, y_test):
         train_accuracy = accuracy_score(y_train, self.model.predict(X_train))
@@ -2,9 +2,20 @@ from sklearn.neighbors import KNeighborsClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
 from .base_model import BaseModel
+from .rules import RuleSet
 from ..config import HEART_DISEASE_MODEL_PATH, RANDOM_STATE, TEST_SIZE
 import numpy as np
-import pandas as pd
+
+# Clinical risk rules on raw measurements: (feature, comparator, threshold, increment, label[, per_unit])
+HEART_RISK_RULES = [
+    ('age', '>', 60, 0.1, "Age ({value:.0f} years) - Higher risk with increasing age"),
+    ('cp', '>=', 2, 0.1, "Chest Pain Type indicates potential issue"),  # Non-typical chest pain
+    ('trestbps', '>', 140, 0.1, "High Blood Pressure ({value:.0f} mm Hg)"),
+    ('chol', '>', 240, 0.1, "High Cholesterol ({value:.0f} mg/dl)"),
+    ('thalach', '<', 120, 0.1, "Low Maximum Heart Rate ({value:.0f} bpm)"),
+    ('oldpeak', '>', 2, 0.15, "Significant ST Depression ({value:g})"),
+    ('ca', '>', 0, 0.15, "Number of Major Vessels: {value:.0f}", True)  # 0.15 per vessel colored by fluoroscopy
+]
 
 class HeartDiseaseModel(BaseModel):
     def __init__(self):
@@ -35,76 +46,63 @@ class HeartDiseaseModel(BaseModel):
             'ca': 2.0,          # Number of vessels
             'thal': 1.5         # Thalassemia
         }
+        
+        self.risk_rules = RuleSet(HEART_RISK_RULES, self.feature_names)
     
     def train(self, X, y):
-        X = X[self.feature_names]
+        with self.timed('train.weights', len(X)):
+            X = X[self.feature_names]
+            
+            # Apply feature weights
+            for feature, weight in self.feature_weights.items():
+                if feature in X.columns:
+                    X[feature] = X[feature] * weight
         
-        # Apply feature weights
-        for feature, weight in self.feature_weights.items():
-            if feature in X.columns:
-                X[feature] = X[feature] * weight
-        
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE,
-            stratify=y  # Ensure balanced split
-        )
+        with self.timed('train.split', len(X)):
+            X_train, X_test, y_train, y_test = train_test_split(
+                X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE,
+                stratify=y  # Ensure balanced split
+            )
         
         self.X_train = X_train
         self.y_train = y_train
         
-        self.model.fit(X_train, y_train)
-        return self.evaluate(X_train, X_test, y_train, y_test)
+        with self.timed('train.fit', len(X_train)):
+            self.model.fit(X_train, y_train)
+        self.build_index()
+        self.prepare_transform()
+        with self.timed('train.evaluate', len(X)):
+            return self.evaluate(X_train, X_test, y_train, y_test)
     
-    def predict(self, X):
-        if self.scaler:
-            X = self.scaler.transform(X)
-        X = pd.DataFrame(X, columns=self.feature_names)
+    def predict_batch(self, X, return_risk_factors=False):
+        with self.timed('predict.transform'):
+            X_raw = self.raw_matrix(X)
+            
+            # Scale and apply feature weights
+            X = self.transform_inputs(X_raw)
+        rows = len(X_raw)
         
-        # Apply feature weights
-        for feature, weight in self.feature_weights.items():
-            if feature in X.columns:
-                X[feature] = X[feature] * weight
-        
-        # Get nearest neighbors
-        distances, indices = self.model.kneighbors(X)
-        
-        # Get similar cases
-        similar_cases = self.X_train.iloc[indices[0]]
-        similar_outcomes = self.y_train.iloc[indices[0]]
+        # Get nearest neighbors for every row at once
+        with self.timed('predict.kneighbors', rows):
+            distances, indices = self.kneighbors(X)
         
         # Calculate risk score based on weighted voting
-        weights = 1 / (distances[0] + 1e-6)
-        weighted_prob = np.sum(similar_outcomes * weights) / np.sum(weights)
-        
-        # Calculate additional risk factors
-        risk_factors = []
-        
-        # Convert X back to original scale if scaler exists
-        if self.scaler:
-            X_orig = pd.DataFrame(self.scaler.inverse_transform(X), columns=self.feature_names)
-        else:
-            X_orig = X
+        with self.timed('predict.probability', rows):
+            weighted_prob = self.weighted_probability(distances, indices)
         
         # Check various risk factors
-        if X_orig['age'].iloc[0] > 60:
-            weighted_prob += 0.1
-        if X_orig['cp'].iloc[0] >= 2:  # Non-typical chest pain
-            weighted_prob += 0.1
-        if X_orig['trestbps'].iloc[0] > 140:  # High blood pressure
-            weighted_prob += 0.1
-        if X_orig['chol'].iloc[0] > 240:  # High cholesterol
-            weighted_prob += 0.1
-        if X_orig['thalach'].iloc[0] < 120:  # Low max heart rate
-            weighted_prob += 0.1
-        if X_orig['oldpeak'].iloc[0] > 2:  # High ST depression
-            weighted_prob += 0.15
-        if X_orig['ca'].iloc[0] > 0:  # Presence of vessels colored by fluoroscopy
-            weighted_prob += 0.15 * X_orig['ca'].iloc[0]
+        with self.timed('predict.rules', rows):
+            increments, fired = self.risk_rules.evaluate(X_raw)
+            weighted_prob = weighted_prob + increments
         
         # Make final prediction based on threshold
-        prediction = np.array([1 if weighted_prob >= self.high_risk_threshold else 0])
+        predictions = (weighted_prob >= self.high_risk_threshold).astype(int)
         
-        return prediction, similar_cases, similar_outcomes, distances[0]
+        if return_risk_factors:
+            with self.timed('predict.labels', rows):
+                labels = self.risk_rules.fired_labels(fired, X_raw)
+            return predictions, weighted_prob, indices, distances, labels
+        return predictions, weighted_prob, indices, distances
     
     def evaluate(self, X_train, X_test, y_train, y_test):
         train_accuracy = accuracy_score(y_train, self.model.predict(X_train))
@@ -0,0 +1,172 @@
+"""Per-stage timing of the model hot paths, fed to pluggable metrics sinks.
+
+Models wrap each stage of ``predict_batch``/``predict``/``train`` in
+``with self.timed('predict.kneighbors', rows):``. While instrumentation is
+disabled (the default) that returns a shared no-op context manager, so the
+cost is one attribute check per stage. Once enabled, every stage records
+``(model, stage, seconds, rows)`` into each registered sink, where rows is
+None for stages that do not work on a known number of rows:
+
+    from src.models.instrumentation import HistogramSink, JsonLinesSink, instrumentation
+    histograms = HistogramSink()
+    instrumentation.enable(histograms, JsonLinesSink('stages.jsonl'))
+    ...
+    print(histograms.prometheus_text())
+
+Sinks are any object with ``record(model, stage, seconds, rows)``:
+
+    HistogramSink    in-memory latency histograms per (model, stage); summary()
+                     for quick inspection, prometheus_text() for the text
+                     exposition format (served at /metrics by src.serving)
+    JsonLinesSink    one JSON object per stage timing appended to a file
+"""
+import bisect
+import json
+import threading
+import time
+from contextlib import nullcontext
+
+# Upper bounds (seconds) of the latency histogram buckets, +Inf is implied
+DEFAULT_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+NULL_TIMER = nullcontext()
+
+class StageTimer:
+    __slots__ = ('instrumentation', 'model', 'stage', 'rows', 'start')
+
+    def __init__(self, instrumentation, model, stage, rows):
+        self.instrumentation = instrumentation
+        self.model = model
+        self.stage = stage
+        self.rows = rows
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.instrumentation.record(self.model, self.stage, time.perf_counter() - self.start, self.rows)
+        return False
+
+class Instrumentation:
+    """Process-wide switch and fan-out to the registered sinks"""
+
+    def __init__(self):
+        self.enabled = False
+        self.sinks = []
+
+    def enable(self, *sinks):
+        self.sinks.extend(sinks)
+        self.enabled = bool(self.sinks)
+        return self
+
+    def disable(self):
+        """Stop recording and detach (and close, where supported) every sink"""
+        self.enabled = False
+        sinks, self.sinks = self.sinks, []
+        for sink in sinks:
+            if hasattr(sink, 'close'):
+                sink.close()
+
+    def timer(self, model, stage, rows=None):
+        if not self.enabled:
+            return NULL_TIMER
+        return StageTimer(self, model, stage, rows)
+
+    def record(self, model, stage, seconds, rows=None):
+        for sink in self.sinks:
+            sink.record(model, stage, seconds, rows)
+
+instrumentation = Instrumentation()
+
+class HistogramSink:
+    """Cumulative latency histograms and row counters per (model, stage)"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def record(self, model, stage, seconds, rows=None):
+        with self._lock:
+            entry = self.series.get((model, stage))
+            if entry is None:
+                entry = {'counts': [0] * (len(self.buckets) + 1), 'count': 0, 'sum': 0.0, 'rows': 0}
+                self.series[(model, stage)] = entry
+            entry['counts'][bisect.bisect_left(self.buckets, seconds)] += 1
+            entry['count'] += 1
+            entry['sum'] += seconds
+            if rows is not None:
+                entry['rows'] += rows
+
+    def quantile(self, entry, q):
+        """Upper bound of the bucket holding the q-quantile (the last finite bound for the overflow bucket)"""
+        target = q * entry['count']
+        seen = 0
+        for position, count in enumerate(entry['counts']):
+            seen += count
+            if seen >= target and count:
+                return self.buckets[min(position, len(self.buckets) - 1)]
+        return self.buckets[-1]
+
+    def summary(self):
+        """{(model, stage): calls, rows, mean and bucketed p50/p95/p99 in seconds}"""
+        with self._lock:
+            return {
+                key: {
+                    'calls': entry['count'],
+                    'rows': entry['rows'],
+                    'mean': entry['sum'] / entry['count'],
+                    'p50': self.quantile(entry, 0.50),
+                    'p95': self.quantile(entry, 0.95),
+                    'p99': self.quantile(entry, 0.99)
+                }
+                for key, entry in sorted(self.series.items())
+            }
+
+    def prometheus_text(self, prefix='medical_model'):
+        """Prometheus text exposition: a stage latency histogram and a rows counter"""
+        lines = [
+            f"# HELP {prefix}_stage_seconds Time spent in each stage of model predict and train",
+            f"# TYPE {prefix}_stage_seconds histogram"
+        ]
+        with self._lock:
+            series = sorted(self.series.items())
+            for (model, stage), entry in series:
+                labels = f'model="{model}",stage="{stage}"'
+                cumulative = 0
+                for bound, count in zip(self.buckets, entry['counts']):
+                    cumulative += count
+                    lines.append(f'{prefix}_stage_seconds_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_seconds_bucket{{{labels},le="+Inf"}} {entry["count"]}')
+                lines.append(f'{prefix}_stage_seconds_sum{{{labels}}} {entry["sum"]:.9g}')
+                lines.append(f'{prefix}_stage_seconds_count{{{labels}}} {entry["count"]}')
+            lines.append(f"# HELP {prefix}_stage_rows_total Rows processed by each stage")
+            lines.append(f"# TYPE {prefix}_stage_rows_total counter")
+            for (model, stage), entry in series:
+                lines.append(f'{prefix}_stage_rows_total{{model="{model}",stage="{stage}"}} {entry["rows"]}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self.series = {}
+
+class JsonLinesSink:
+    """Append one ``{"ts", "model", "stage", "seconds", "rows"}`` object per stage timing to ``path``"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a', buffering=1)
+        self._lock = threading.Lock()
+
+    def record(self, model, stage, seconds, rows=None):
+        line = json.dumps({'ts': time.time(), 'model': model, 'stage': stage, 'seconds': seconds, 'rows': rows})
+        with self._lock:
+            self._file.write(line + '\n')
+
+    def close(self):
+        with self._lock:
+            self._file.close()
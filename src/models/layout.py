@@ -0,0 +1,80 @@
+"""The memory-mappable array layout shared by model artifacts, case stores and runtime bundles::
+
+    MAGIC (8 bytes) | header length (uint64, little endian) | JSON header | padding | arrays
+
+Every array starts on an ALIGNMENT-byte boundary and is C-contiguous; the JSON
+header records its dtype, shape and offset under ``arrays``. This module needs
+only NumPy, so readers that must not import pandas or scikit-learn (see
+src.models.runtime) can open these files too.
+"""
+import json
+import os
+import numpy as np
+
+MAGIC = b"MEDKNN01"
+ALIGNMENT = 64
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def write_artifact(path, header, arrays):
+    """Write a header dict plus named arrays to ``path`` in the memory-mappable layout"""
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+
+    # The array offsets depend on the header size, so lay the header out until it is stable
+    layout = {}
+    header_bytes = b""
+    while True:
+        offset = _aligned(len(MAGIC) + 8 + len(header_bytes))
+        for name, array in arrays.items():
+            layout[name] = {
+                'dtype': np.lib.format.dtype_to_descr(array.dtype), 'shape': list(array.shape), 'offset': offset
+            }
+            offset = _aligned(offset + array.nbytes)
+        encoded = json.dumps(dict(header, arrays=layout)).encode("utf-8")
+        # Stop only once the header records the offsets its own length gives; a header of the
+        # same length laid out for a shorter one could still run past the first array
+        if encoded == header_bytes:
+            break
+        header_bytes = encoded
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header_bytes).to_bytes(8, "little"))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.write(b"\0" * (layout[name]['offset'] - f.tell()))
+            f.write(array.tobytes())
+    # Replace atomically so readers never map a half-written file
+    os.replace(tmp_path, path)
+
+def read_artifact(path, mmap=True):
+    """Return ``(header, arrays)``; arrays are read-only memory maps unless ``mmap`` is False"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a model artifact")
+        header_len = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(header_len).decode("utf-8"))
+
+    arrays = {}
+    for name, spec in header.pop('arrays').items():
+        shape = tuple(spec['shape'])
+        dtype = np.lib.format.descr_to_dtype(_as_descr(spec['dtype']))
+        if mmap:
+            if 0 in shape:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=spec['offset'], shape=shape)
+        else:
+            with open(path, "rb") as f:
+                f.seek(spec['offset'])
+                count = int(np.prod(shape))
+                arrays[name] = np.fromfile(f, dtype=dtype, count=count).reshape(shape)
+    return header, arrays
+
+def _as_descr(descr):
+    # JSON turns the (name, format) tuples of a structured dtype description into lists
+    if isinstance(descr, list):
+        return [tuple(_as_descr(part) if isinstance(part, list) else part for part in field) for field in descr]
+    return descr
@@ -0,0 +1,501 @@
+"""Neighbor-index engines behind the kNN models.
+
+Every engine answers exact k-nearest-neighbor queries over the weighted
+reference set and can be persisted as plain arrays plus a small parameter
+dict, so the memory-mappable artifact restores a built index without
+rebuilding it at load time (a scikit-learn tree saved by another version of
+scikit-learn is rebuilt from the stored reference rows instead). The brute and pivot engines keep a float32
+reference set as float32 (compact models); distances are always computed in
+float64.
+
+Engines:
+    brute      exhaustive NumPy search, chunked to bound memory
+    kd_tree    scikit-learn KDTree
+    ball_tree  scikit-learn BallTree
+    pivot      triangle-inequality pivot table (LAESA-style) that skips
+               reference rows whose lower bound exceeds the k-th neighbor distance
+    sharded    the reference set split across local worker processes, each
+               answering top-k over its shard with one of the engines above;
+               the partial results are merged into the exact global top-k
+"""
+from abc import ABC, abstractmethod
+import logging
+import multiprocessing
+import threading
+import numpy as np
+from ..config import KNN_SHARD_WORKERS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def normalize_metric(metric, p=2):
+    """Map sklearn's minkowski/p spelling onto the engine metric names"""
+    if metric == 'minkowski':
+        if p == 1:
+            return 'manhattan', 1
+        if p == 2:
+            return 'euclidean', 2
+        return 'minkowski', p
+    if metric in ('manhattan', 'cityblock', 'l1'):
+        return 'manhattan', 1
+    if metric in ('euclidean', 'l2'):
+        return 'euclidean', 2
+    raise ValueError(f"Unsupported metric: {metric}")
+
+def pairwise_distances(A, B, metric='euclidean', p=2):
+    """Dense distance matrix between the rows of A and B"""
+    diff = np.abs(np.subtract(A[:, None, :], B[None, :, :], dtype=np.float64))
+    if metric == 'euclidean':
+        return np.sqrt(np.einsum('ijk,ijk->ij', diff, diff))
+    if metric == 'manhattan':
+        return diff.sum(axis=2)
+    return (diff ** p).sum(axis=2) ** (1.0 / p)
+
+def reference_array(X):
+    """Contiguous reference matrix: float32 input stays float32, anything else becomes float64"""
+    X = np.asarray(X)
+    return np.ascontiguousarray(X, dtype=np.float32 if X.dtype == np.float32 else np.float64)
+
+def _top_k(distances, k):
+    """Indices of the k smallest entries per row, ordered by distance then column"""
+    k = min(k, distances.shape[1])
+    candidates = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    candidate_distances = np.take_along_axis(distances, candidates, axis=1)
+    order = np.lexsort((candidates, candidate_distances), axis=1)
+    return np.take_along_axis(candidate_distances, order, axis=1), np.take_along_axis(candidates, order, axis=1)
+
+class NeighborIndex(ABC):
+    name = None
+    # Whether the engine can hold a float32 reference set without a float64 copy
+    float32_data = False
+
+    def __init__(self, metric='euclidean', p=2):
+        self.metric, self.p = normalize_metric(metric, p)
+        self.n_samples = 0
+
+    @abstractmethod
+    def fit(self, X):
+        """Build the index over the (n_samples, n_features) reference matrix"""
+        pass
+
+    @abstractmethod
+    def query(self, X, k):
+        """Return (distances, indices) of the k nearest reference rows, nearest first"""
+        pass
+
+    @abstractmethod
+    def add(self, X):
+        """Append reference rows; they get the next indices after the existing rows"""
+        pass
+
+    def get_state(self):
+        """Return (params, arrays) describing the built index"""
+        return {'engine': self.name, 'metric': self.metric, 'p': self.p}, {}
+
+    def set_state(self, params, arrays):
+        self.metric, self.p = params['metric'], params['p']
+
+class BruteIndex(NeighborIndex):
+    name = 'brute'
+    float32_data = True
+
+    # Cap on the (queries x reference rows x features) block computed at once
+    max_block_elements = 2 ** 24
+
+    def fit(self, X):
+        self.data = reference_array(X)
+        self.n_samples = len(self.data)
+        return self
+
+    def add(self, X):
+        self.data = np.vstack([self.data, np.atleast_2d(np.asarray(X, dtype=self.data.dtype))])
+        self.n_samples = len(self.data)
+        return self
+
+    def query(self, X, k):
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        rows_per_block = max(1, self.max_block_elements // max(1, self.data.size))
+        distances, indices = [], []
+        for start in range(0, len(X), rows_per_block):
+            block = pairwise_distances(X[start:start + rows_per_block], self.data, self.metric, self.p)
+            block_distances, block_indices = _top_k(block, k)
+            distances.append(block_distances)
+            indices.append(block_indices)
+        return np.vstack(distances), np.vstack(indices)
+
+    def get_state(self):
+        params, arrays = super().get_state()
+        arrays['data'] = self.data
+        return params, arrays
+
+    def set_state(self, params, arrays):
+        super().set_state(params, arrays)
+        self.data = arrays['data']
+        self.n_samples = len(self.data)
+
+class _SklearnTreeIndex(NeighborIndex):
+    """Shared persistence for scikit-learn's KDTree and BallTree"""
+    tree_class = None
+
+    def __init__(self, metric='euclidean', p=2, leaf_size=30):
+        super().__init__(metric, p)
+        self.leaf_size = leaf_size
+        self.tree = None
+
+    def _metric_kwargs(self):
+        return {'p': self.p} if self.metric == 'minkowski' else {}
+
+    def fit(self, X):
+        self.tree = self.tree_class(
+            np.ascontiguousarray(X, dtype=np.float64), leaf_size=self.leaf_size,
+            metric=self.metric, **self._metric_kwargs()
+        )
+        self.n_samples = len(X)
+        return self
+
+    def add(self, X):
+        # The trees cannot grow in place, so rebuild over the stored rows plus the new ones
+        return self.fit(np.vstack([np.asarray(self.tree.data), np.atleast_2d(np.asarray(X, dtype=np.float64))]))
+
+    def query(self, X, k):
+        return self.tree.query(np.atleast_2d(np.asarray(X, dtype=np.float64)), k=min(k, self.n_samples))
+
+    def get_state(self):
+        # The tree's pickle state is a tuple of arrays, counters and a DistanceMetric object;
+        # keep the arrays as arrays and rebuild the metric object from its name on load. The
+        # tuple is private to scikit-learn, so the version that wrote it is stored alongside
+        # and the reference rows are kept on their own to rebuild the tree from
+        import sklearn
+
+        params, arrays = super().get_state()
+        params['leaf_size'] = self.leaf_size
+        params['sklearn_version'] = sklearn.__version__
+        arrays['data'] = np.asarray(self.tree.data)
+        params['tree_state'] = []
+        for position, item in enumerate(self.tree.__getstate__()):
+            if isinstance(item, np.ndarray):
+                arrays[f'tree_{position}'] = item
+                params['tree_state'].append({'array': f'tree_{position}'})
+            elif item is None or isinstance(item, (int, float)):
+                params['tree_state'].append({'value': item})
+            else:
+                params['tree_state'].append({'metric': True})
+        return params, arrays
+
+    def set_state(self, params, arrays):
+        import sklearn
+
+        super().set_state(params, arrays)
+        self.leaf_size = params['leaf_size']
+        # Indexes saved before the reference rows were stored separately hold them first in the tree state
+        data = arrays['data'] if 'data' in arrays else arrays[params['tree_state'][0]['array']]
+        if params.get('sklearn_version') != sklearn.__version__:
+            logger.info(
+                f"Rebuilding the {self.name} index: saved by scikit-learn {params.get('sklearn_version') or 'unknown'}, "
+                f"running {sklearn.__version__}"
+            )
+            self.fit(data)
+            return
+        try:
+            self._restore_tree(params, arrays, data)
+            if self.tree.data.shape != data.shape:
+                raise ValueError(f"restored {self.tree.data.shape} rows, expected {data.shape}")
+        except Exception as e:
+            logger.warning(f"Rebuilding the {self.name} index: could not restore the saved tree: {str(e)}")
+            self.fit(data)
+
+    @staticmethod
+    def _state_layout(tree_state, arrays):
+        """Kind of each item of a saved tree state, with the dtype and rank of its arrays"""
+        layout = []
+        for item in tree_state:
+            if 'array' in item:
+                layout.append(('array', arrays[item['array']].dtype.str, arrays[item['array']].ndim))
+            else:
+                layout.append(('metric',) if 'metric' in item else ('value',))
+        return layout
+
+    def _restore_tree(self, params, arrays, data):
+        from sklearn.metrics import DistanceMetric
+
+        # The tree's __setstate__ does not check what it is given (a malformed tuple can crash the
+        # process), so the saved state must match the layout of a tree built here first
+        expected_params, expected_arrays = type(self)(self.metric, self.p, self.leaf_size).fit(data[:2]).get_state()
+        if self._state_layout(params['tree_state'], arrays) != self._state_layout(
+            expected_params['tree_state'], expected_arrays
+        ):
+            raise ValueError("the saved tree state does not match this scikit-learn's layout")
+
+        state = []
+        for item in params['tree_state']:
+            if 'array' in item:
+                state.append(arrays[item['array']])
+            elif 'metric' in item:
+                state.append(DistanceMetric.get_metric(self.metric, **self._metric_kwargs()))
+            else:
+                state.append(item['value'])
+        self.tree = self.tree_class.__new__(self.tree_class)
+        self.tree.__setstate__(tuple(state))
+        self.n_samples = len(state[0])
+
+class KDTreeIndex(_SklearnTreeIndex):
+    name = 'kd_tree'
+
+    @property
+    def tree_class(self):
+        from sklearn.neighbors import KDTree
+        return KDTree
+
+class BallTreeIndex(_SklearnTreeIndex):
+    name = 'ball_tree'
+
+    @property
+    def tree_class(self):
+        from sklearn.neighbors import BallTree
+        return BallTree
+
+class PivotIndex(NeighborIndex):
+    """Exact search pruned with precomputed distances to a few pivot rows.
+
+    For any query q, reference row x and pivot v the triangle inequality gives
+    d(q, x) >= |d(q, v) - d(x, v)|. The k rows with the smallest lower bound
+    fix a search radius; only rows whose lower bound is within that radius
+    need an exact distance.
+    """
+    name = 'pivot'
+    float32_data = True
+
+    def __init__(self, metric='euclidean', p=2, n_pivots=8):
+        super().__init__(metric, p)
+        self.n_pivots = n_pivots
+
+    def fit(self, X):
+        self.data = reference_array(X)
+        self.n_samples = len(self.data)
+        n_pivots = min(self.n_pivots, self.n_samples)
+
+        # Farthest-first traversal spreads the pivots over the reference set
+        pivots = [0]
+        nearest_pivot = pairwise_distances(self.data[:1], self.data, self.metric, self.p)[0]
+        for _ in range(1, n_pivots):
+            pivots.append(int(np.argmax(nearest_pivot)))
+            distances = pairwise_distances(self.data[pivots[-1]:pivots[-1] + 1], self.data, self.metric, self.p)[0]
+            nearest_pivot = np.minimum(nearest_pivot, distances)
+
+        self.pivots = np.asarray(pivots, dtype=np.int64)
+        self.pivot_distances = np.ascontiguousarray(
+            pairwise_distances(self.data[self.pivots], self.data, self.metric, self.p).T
+        )
+        return self
+
+    def add(self, X):
+        # The pivots stay put; new rows only need their distances to them
+        X = np.atleast_2d(np.asarray(X, dtype=self.data.dtype))
+        self.pivot_distances = np.vstack([
+            self.pivot_distances, pairwise_distances(X, self.data[self.pivots], self.metric, self.p)
+        ])
+        self.data = np.vstack([self.data, X])
+        self.n_samples = len(self.data)
+        return self
+
+    def query(self, X, k):
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        k = min(k, self.n_samples)
+        query_pivot_distances = pairwise_distances(X, self.data[self.pivots], self.metric, self.p)
+        distances = np.empty((len(X), k))
+        indices = np.empty((len(X), k), dtype=np.int64)
+        for row, query in enumerate(X):
+            lower_bounds = np.abs(self.pivot_distances - query_pivot_distances[row]).max(axis=1)
+
+            # Any k rows bound the k-th neighbor distance; the ones with the smallest lower bound bound it tightly
+            seeds = np.argpartition(lower_bounds, k - 1)[:k]
+            radius = pairwise_distances(query[None, :], self.data[seeds], self.metric, self.p).max()
+
+            candidates = np.flatnonzero(lower_bounds <= radius)
+            candidate_distances = pairwise_distances(query[None, :], self.data[candidates], self.metric, self.p)
+            best_distances, best = _top_k(candidate_distances, k)
+            distances[row], indices[row] = best_distances[0], candidates[best[0]]
+        return distances, indices
+
+    def get_state(self):
+        params, arrays = super().get_state()
+        arrays.update(data=self.data, pivots=self.pivots, pivot_distances=self.pivot_distances)
+        return params, arrays
+
+    def set_state(self, params, arrays):
+        super().set_state(params, arrays)
+        self.data = arrays['data']
+        self.pivots = arrays['pivots']
+        self.pivot_distances = arrays['pivot_distances']
+        self.n_samples = len(self.data)
+        self.n_pivots = len(self.pivots)
+
+def merge_top_k(distances, indices, k):
+    """Global top-k from per-shard candidates: nearest first, ties broken by global index"""
+    order = np.lexsort((indices, distances), axis=1)[:, :k]
+    return np.take_along_axis(distances, order, axis=1), np.take_along_axis(indices, order, axis=1)
+
+def _shard_worker(connection, engine, metric, p):
+    """Answer commands for one shard until the coordinator closes the pipe"""
+    index = None
+    while True:
+        try:
+            command, payload = connection.recv()
+        except EOFError:
+            return
+        if command == 'close':
+            return
+        try:
+            result = None
+            if command == 'fit':
+                index = make_index(engine, metric, p).fit(payload)
+            elif command == 'add':
+                index.add(payload)
+            elif command == 'query':
+                result = index.query(*payload)
+            else:
+                raise ValueError(f"Unknown shard command '{command}'")
+            connection.send(('ok', result))
+        except Exception as e:
+            connection.send(('error', f"{type(e).__name__}: {e}"))
+
+class ShardedIndex(NeighborIndex):
+    """Exact search over a reference set partitioned across local worker processes.
+
+    The rows are split into contiguous shards, one per worker. A query goes to
+    every worker at once; each returns its k nearest rows, and the coordinator
+    shifts their indices by the shard offset and keeps the k nearest overall.
+    Every global top-k row is in the top-k of its own shard, so the merge is
+    exact. Workers are started when the index is built or first queried after
+    a load, and exit when the index is closed or the process ends.
+    """
+    name = 'sharded'
+    float32_data = True
+
+    def __init__(self, metric='euclidean', p=2, n_shards=None, shard_engine=None):
+        super().__init__(metric, p)
+        self.n_shards = n_shards or KNN_SHARD_WORKERS or multiprocessing.cpu_count()
+        # Engine inside each worker; None picks kd_tree, or brute for a float32 reference set
+        self.shard_engine = shard_engine
+        self.workers = []
+        self.offsets = None
+        self._lock = threading.Lock()
+
+    def fit(self, X):
+        self.close()
+        self.data = reference_array(X)
+        self.n_samples = len(self.data)
+        self._start()
+        return self
+
+    def _engine(self):
+        if self.shard_engine is not None:
+            return self.shard_engine
+        return 'brute' if self.data.dtype == np.float32 else 'kd_tree'
+
+    def _start(self):
+        # spawn, so workers never inherit the coordinator's threads or locks
+        context = multiprocessing.get_context('spawn')
+        n_shards = max(1, min(self.n_shards, self.n_samples))
+        bounds = np.linspace(0, self.n_samples, n_shards + 1).astype(np.int64)
+        workers = []
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            connection, worker_connection = context.Pipe()
+            process = context.Process(
+                target=_shard_worker, args=(worker_connection, self._engine(), self.metric, self.p), daemon=True
+            )
+            process.start()
+            worker_connection.close()
+            connection.send(('fit', self.data[start:end]))
+            workers.append((process, connection))
+        self.workers = workers
+        self.offsets = bounds[:-1]
+        self._collect()
+
+    def _collect(self):
+        """Replies of every worker, in shard order"""
+        results, errors = [], []
+        for _, connection in self.workers:
+            status, result = connection.recv()
+            if status == 'error':
+                errors.append(result)
+            results.append(result)
+        if errors:
+            raise RuntimeError(f"Shard worker failed: {errors[0]}")
+        return results
+
+    def add(self, X):
+        # New rows join the last shard, so global indices stay contiguous
+        X = np.atleast_2d(np.asarray(X, dtype=self.data.dtype))
+        with self._lock:
+            self.data = np.vstack([self.data, X])
+            self.n_samples = len(self.data)
+            if self.workers:
+                _, connection = self.workers[-1]
+                connection.send(('add', X))
+                status, result = connection.recv()
+                if status == 'error':
+                    raise RuntimeError(f"Shard worker failed: {result}")
+        return self
+
+    def query(self, X, k):
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        k = min(k, self.n_samples)
+        with self._lock:
+            if not self.workers:
+                self._start()
+            for _, connection in self.workers:
+                connection.send(('query', (X, k)))
+            results = self._collect()
+        distances = np.hstack([distances for distances, _ in results])
+        indices = np.hstack([indices + offset for (_, indices), offset in zip(results, self.offsets)])
+        return merge_top_k(distances, indices, k)
+
+    def close(self):
+        """Stop the worker processes"""
+        workers, self.workers = self.workers, []
+        for process, connection in workers:
+            try:
+                connection.send(('close', None))
+                connection.close()
+            except OSError:
+                pass
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def get_state(self):
+        params, arrays = super().get_state()
+        params.update(n_shards=self.n_shards, shard_engine=self.shard_engine)
+        arrays['data'] = self.data
+        return params, arrays
+
+    def set_state(self, params, arrays):
+        # Workers start on the first query, so loading a model stays cheap
+        super().set_state(params, arrays)
+        self.n_shards = params['n_shards']
+        self.shard_engine = params['shard_engine']
+        self.data = arrays['data']
+        self.n_samples = len(self.data)
+
+INDEX_ENGINES = {
+    engine.name: engine for engine in (BruteIndex, KDTreeIndex, BallTreeIndex, PivotIndex, ShardedIndex)
+}
+
+def make_index(engine, metric='euclidean', p=2):
+    """Create an unfitted index engine by name"""
+    if engine not in INDEX_ENGINES:
+        raise ValueError(f"Unknown index engine '{engine}', expected one of {sorted(INDEX_ENGINES)}")
+    return INDEX_ENGINES[engine](metric, p)
+
+def index_from_state(params, arrays):
+    """Restore a built index from the (params, arrays) pair returned by get_state()"""
+    index = make_index(params['engine'], params['metric'], params['p'])
+    index.set_state(params, arrays)
+    return index
@@ -2,10 +2,23 @@ from sklearn.neighbors import KNeighborsClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
 from .base_model import BaseModel
+from .rules import RuleSet
 from ..config import PARKINSONS_MODEL_PATH, RANDOM_STATE, TEST_SIZE
 import numpy as np
 import pandas as pd
 
+# Voice risk factors reported alongside the prediction; they do not adjust the probability
+PARKINSONS_RISK_RULES = [
+    ('MDVP:Jitter(%)', '>', 0.008, 0.0, "High Jitter ({value:.5f}%) indicates vocal instability"),
+    ('MDVP:Jitter(Abs)', '>', 0.0004, 0.0, "High Absolute Jitter ({value:.5f}) indicates frequency instability"),
+    ('MDVP:Shimmer', '>', 0.04, 0.0, "High Shimmer ({value:.5f}) indicates amplitude variations"),
+    ('MDVP:Shimmer(dB)', '>', 0.4, 0.0, "High Shimmer dB ({value:.5f}dB) indicates amplitude instability"),
+    ('HNR', '<', 20, 0.0, "Low HNR ({value:.3f}) indicates voice quality issues"),
+    ('NHR', '>', 0.03, 0.0, "High NHR ({value:.5f}) indicates increased noise"),
+    ('RPDE', '>', 0.5, 0.0, "High RPDE ({value:.3f}) indicates increased vocal complexity"),
+    ('DFA', '<', 0.65, 0.0, "Low DFA ({value:.3f}) indicates changes in vocal pattern")
+]
+
 class ParkinsonsModel(BaseModel):
     def __init__(self):
         super().__init__(PARKINSONS_MODEL_PATH)
@@ -66,81 +79,116 @@ class ParkinsonsModel(BaseModel):
             'PPE': 1.8
         }
         
+        self.risk_rules = RuleSet(PARKINSONS_RISK_RULES, self.feature_names)
+        
     def is_input_valid(self, X):
         """Check if input values are within expected ranges"""
-        X_df = pd.DataFrame(X, columns=self.feature_names)
+        X = self.raw_matrix(X)
         for feature, (min_val, max_val) in self.feature_ranges.items():
-            if feature in X_df.columns:
-                value = X_df[feature].iloc[0]
-                # Extend the acceptable range by 20% on both sides
-                range_width = max_val - min_val
-                extended_min = min_val - (range_width * 0.2)
-                extended_max = max_val + (range_width * 0.2)
-                if value < extended_min or value > extended_max:
+            if feature in self.feature_names:
+                values = X[:, self.feature_names.index(feature)]
+                extended_min, extended_max = self.extended_range(min_val, max_val)
+                out_of_range = (values < extended_min) | (values > extended_max)
+                if out_of_range.any():
+                    value = values[np.argmax(out_of_range)]
                     return False, f"{feature} value ({value:.3f}) is outside expected range ({min_val:.3f} - {max_val:.3f})"
         return True, ""
+    
+    def valid_rows(self, X):
+        """Row mask of the inputs is_input_valid accepts"""
+        X = self.raw_matrix(X)
+        valid = super().valid_rows(X)
+        for feature, (min_val, max_val) in self.feature_ranges.items():
+            if feature in self.feature_names:
+                values = X[:, self.feature_names.index(feature)]
+                extended_min, extended_max = self.extended_range(min_val, max_val)
+                valid &= (values >= extended_min) & (values <= extended_max)
+        return valid
+    
+    @staticmethod
+    def extended_range(min_val, max_val):
+        # Extend the acceptable range by 20% on both sides
+        range_width = max_val - min_val
+        return min_val - (range_width * 0.2), max_val + (range_width * 0.2)
 
-    def predict(self, X):
+    def predict_batch(self, X, return_risk_factors=False):
+        with self.timed('predict.transform'):
+            X_raw = self.raw_matrix(X)
+            
+            # Scale and apply feature weights
+            X = self.transform_inputs(X_raw)
+        rows = len(X_raw)
+        
         # Validate input
-        is_valid, message = self.is_input_valid(X)
+        with self.timed('predict.validate', rows):
+            is_valid, message = self.is_input_valid(X_raw)
         if not is_valid:
             raise ValueError(f"Invalid input: {message}")
-            
-        if self.scaler:
-            X = self.scaler.transform(X)
-        
-        X = pd.DataFrame(X, columns=self.feature_names)
-        
-        # Apply feature weights
-        for feature, weight in self.feature_weights.items():
-            if feature in X.columns:
-                X[feature] = X[feature] * weight
-        
-        # Get nearest neighbors
-        distances, indices = self.model.kneighbors(X)
         
-        # Convert X_train to DataFrame if it's a numpy array
-        if isinstance(self.X_train, np.ndarray):
-            self.X_train = pd.DataFrame(self.X_train, columns=self.feature_names)
+        # Get nearest neighbors for every row at once
+        with self.timed('predict.kneighbors', rows):
+            distances, indices = self.kneighbors(X)
         
-        # Get similar cases
-        similar_cases = self.X_train.iloc[indices[0]]
-        similar_outcomes = pd.Series(self.y_train).iloc[indices[0]]  # Convert y_train to Series
-        
-        # Calculate confidence score based on distances
-        max_distance = np.max(distances)
-        confidence_scores = 1 - (distances[0] / max_distance)
-        
-        # Weight the predictions by confidence
-        weighted_pred = np.average(similar_outcomes, weights=confidence_scores)
+        with self.timed('predict.probability', rows):
+            similar_outcomes = np.asarray(self.y_train)[indices]
+            
+            # Calculate confidence score based on each row's distances
+            max_distance = np.max(distances, axis=1, keepdims=True)
+            confidence_scores = 1 - (distances / max_distance)
+            
+            # Weight the predictions by confidence
+            weighted_pred = np.average(similar_outcomes, weights=confidence_scores, axis=1)
         
         # Make final prediction
-        prediction = np.array([1 if weighted_pred >= 0.5 else 0])
-        
-        return prediction, similar_cases, similar_outcomes, distances[0]
+        predictions = (weighted_pred >= 0.5).astype(int)
+        
+        if return_risk_factors:
+            with self.timed('predict.rules', rows):
+                _, fired = self.risk_rules.evaluate(X_raw)
+                labels = self.risk_rules.fired_labels(fired, X_raw)
+            return predictions, weighted_pred, indices, distances, labels
+        return predictions, weighted_pred, indices, distances
+    
+    def runtime_spec(self):
+        spec = super().runtime_spec()
+        spec.update({
+            'scoring': 'confidence',
+            'threshold': 0.5,
+            'rules_adjust_probability': False,
+            'feature_ranges': {
+                feature: list(bounds) for feature, bounds in self.feature_ranges.items() if feature in self.feature_names
+            }
+        })
+        return spec
     
     def train(self, X, y):
-        # Convert input to DataFrame if it's not already
-        if not isinstance(X, pd.DataFrame):
-            X = pd.DataFrame(X, columns=self.feature_names)
-        
-        # Apply feature weights
-        X_weighted = X.copy()
-        for feature, weight in self.feature_weights.items():
-            if feature in X.columns:
-                X_weighted[feature] = X_weighted[feature] * weight
-        
-        X_train, X_test, y_train, y_test = train_test_split(
-            X_weighted, y, test_size=TEST_SIZE, random_state=RANDOM_STATE,
-            stratify=y
-        )
+        with self.timed('train.weights', len(X)):
+            # Convert input to DataFrame if it's not already
+            if not isinstance(X, pd.DataFrame):
+                X = pd.DataFrame(X, columns=self.feature_names)
+            
+            # Apply feature weights
+            X_weighted = X.copy()
+            for feature, weight in self.feature_weights.items():
+                if feature in X.columns:
+                    X_weighted[feature] = X_weighted[feature] * weight
+        
+        with self.timed('train.split', len(X)):
+            X_train, X_test, y_train, y_test = train_test_split(
+                X_weighted, y, test_size=TEST_SIZE, random_state=RANDOM_STATE,
+                stratify=y
+            )
         
         # Store as DataFrames/Series
         self.X_train = pd.DataFrame(X_train, columns=self.feature_names)
         self.y_train = pd.Series(y_train)
         
-        self.model.fit(X_train, y_train)
-        return self.evaluate(X_train, X_test, y_train, y_test)
+        with self.timed('train.fit', len(X_train)):
+            self.model.fit(X_train, y_train)
+        self.build_index()
+        self.prepare_transform()
+        with self.timed('train.evaluate', len(X)):
+            return self.evaluate(X_train, X_test, y_train, y_test)
     
     def evaluate(self, X_train, X_test, y_train, y_test):
         train_accuracy = accuracy_score(y_train, self.model.predict(X_train))
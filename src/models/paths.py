@@ -0,0 +1,18 @@
+"""Paths of the files that sit next to a ``.pkl`` model.
+
+Standard library only, so that checking whether a model exists (as the app
+pages do before anything needs the model) imports neither pandas nor
+scikit-learn.
+"""
+import os
+
+ARTIFACT_SUFFIX = ".mmap"
+DELTA_SUFFIX = ".delta"
+
+def artifact_path_for(model_path):
+    """Path of the memory-mappable artifact that sits next to a ``.pkl`` model path"""
+    return os.path.splitext(model_path)[0] + ARTIFACT_SUFFIX
+
+def delta_path_for(model_path):
+    """Path of the added-cases log that sits next to a ``.pkl`` model path"""
+    return os.path.splitext(model_path)[0] + DELTA_SUFFIX
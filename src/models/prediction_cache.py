@@ -0,0 +1,110 @@
+"""Bounded LRU cache of single-case predictions.
+
+The Streamlit forms send the same inputs over and over (slider steps, the
+default values), and every rerun used to redo the neighbor search. Each kNN
+model keeps one cache in front of ``predict`` (``model.prediction_cache``,
+sized by PREDICTION_CACHE_ENTRIES / PREDICTION_CACHE_BYTES in src.config).
+
+Keys are the input vector after the model's own scaling and feature weighting,
+quantized to steps of QUANTUM, so inputs that differ by less than about a
+millionth of a feature's standard deviation share an entry. The model's
+version (bumped whenever its transform, index or reference set changes) is
+part of every lookup and a new version clears the cache; a model whose
+artifact changed on disk is reloaded by the registry as a new instance, which
+starts with an empty cache. Entries are evicted least recently used first
+once either the entry count or the byte estimate is over its limit.
+"""
+from collections import OrderedDict
+import threading
+import numpy as np
+import pandas as pd
+
+# Quantization step of the transformed (scaled and weighted) input
+QUANTUM = 1e-6
+
+def result_bytes(result):
+    """Rough size of a predict() result: arrays, frames and label strings"""
+    total = 0
+    for item in result:
+        if isinstance(item, np.ndarray):
+            total += item.nbytes
+        elif isinstance(item, pd.DataFrame):
+            total += int(item.memory_usage(index=True).sum())
+        elif isinstance(item, pd.Series):
+            total += int(item.memory_usage(index=True))
+        elif isinstance(item, list):
+            total += sum(len(str(label)) for label in item)
+    return total
+
+def copied(result):
+    """Copy of a cached result, so callers can modify what they get back"""
+    return tuple(item.copy() if hasattr(item, 'copy') else item for item in result)
+
+class PredictionCache:
+    def __init__(self, max_entries=256, max_bytes=8 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def key(self, model, X_raw, return_risk_factors):
+        """Cache key of one raw input row, or None if the row cannot be cached"""
+        if len(X_raw) != 1 or not np.isfinite(X_raw).all():
+            return None
+        steps = np.round(model.transform_inputs(X_raw)[0] / QUANTUM).astype(np.int64)
+        return bool(return_risk_factors), steps.tobytes()
+
+    def get(self, key, version):
+        with self._lock:
+            if version != self.version:
+                self._clear()
+                self.version = version
+            result = self.entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return copied(result[0])
+
+    def put(self, key, version, result):
+        size = result_bytes(result) + len(key[1])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if version != self.version:
+                return
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self.entries[key] = (copied(result), size)
+            self.bytes += size
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def _clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
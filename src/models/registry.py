@@ -0,0 +1,102 @@
+import logging
+import os
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class ModelRegistry:
+    """Process-wide cache of loaded models, one instance per model class.
+
+    A model is (re)loaded through its ``load_model`` classmethod only when the
+    artifact it reads under MODEL_DIR (the ``.mmap`` file if present, else the
+    ``.pkl``), or the log of cases added to it, is new or has changed on disk
+    since the last load.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, model_cls):
+        """Return the cached instance of ``model_cls``, reloading it if its artifact changed"""
+        with self._lock:
+            entry = self._entries.get(model_cls)
+            if entry is None:
+                entry = {
+                    'probe': model_cls(),
+                    'model_path': None,
+                    'instance': None,
+                    'signature': None,
+                    'loads': 0,
+                    'hits': 0,
+                    'last_load_seconds': None,
+                    'total_load_seconds': 0.0
+                }
+                self._entries[model_cls] = entry
+
+            model_path = entry['probe'].stored_model_path()
+            signature = self._signature(model_path, entry['probe'].delta_path)
+            if entry['instance'] is not None and signature == entry['signature']:
+                entry['hits'] += 1
+                return entry['instance']
+
+            start = time.perf_counter()
+            instance = model_cls.load_model()
+            elapsed = time.perf_counter() - start
+
+            entry['instance'] = instance
+            entry['model_path'] = model_path
+            entry['signature'] = signature
+            entry['loads'] += 1
+            entry['last_load_seconds'] = elapsed
+            entry['total_load_seconds'] += elapsed
+            logger.info(f"Loaded {model_cls.__name__} from {entry['model_path']} in {elapsed * 1000:.1f} ms")
+            return instance
+
+    def needs_load(self, model_cls):
+        """Whether get(model_cls) would load from disk rather than return the cached instance"""
+        with self._lock:
+            entry = self._entries.get(model_cls)
+            if entry is None or entry['instance'] is None:
+                return True
+            try:
+                signature = self._signature(entry['probe'].stored_model_path(), entry['probe'].delta_path)
+            except OSError:
+                return True
+            return signature != entry['signature']
+
+    def stats(self):
+        """Load counts and timings per model class name"""
+        with self._lock:
+            return {
+                model_cls.__name__: {
+                    key: value for key, value in entry.items() if key not in ('probe', 'instance', 'signature')
+                }
+                for model_cls, entry in self._entries.items()
+            }
+
+    def invalidate(self, model_cls=None):
+        """Drop one cached model (or all of them) so the next get() reloads from disk"""
+        with self._lock:
+            targets = [model_cls] if model_cls is not None else list(self._entries)
+            for target in targets:
+                if target in self._entries:
+                    self._entries[target]['instance'] = None
+                    self._entries[target]['signature'] = None
+
+    @staticmethod
+    def _signature(model_path, delta_path):
+        stat = os.stat(model_path)
+        signature = (model_path, stat.st_mtime_ns, stat.st_size)
+        if os.path.exists(delta_path):
+            delta = os.stat(delta_path)
+            signature += (delta.st_mtime_ns, delta.st_size)
+        return signature
+
+registry = ModelRegistry()
+
+def get_model(model_cls):
+    """Shortcut for ``registry.get(model_cls)``"""
+    return registry.get(model_cls)
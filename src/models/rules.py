@@ -0,0 +1,74 @@
+"""Declarative clinical rules for probability adjustments and risk-factor labels.
+
+A rule table is a list of tuples::
+
+    (feature, comparator, threshold, increment, label[, per_unit])
+
+``comparator`` is one of ``>``, ``>=``, ``<``, ``<=``, ``==`` or ``!=`` and is
+applied as ``value <comparator> threshold`` to the raw (unscaled) input value.
+A fired rule adds ``increment`` to the probability, or ``increment * value``
+when ``per_unit`` is true. ``label`` is a format string that may use
+``{value}``.
+
+RuleSet compiles a table once into column indices and threshold/increment
+vectors, then evaluates every rule for a whole batch with NumPy masks.
+"""
+import numpy as np
+
+COMPARATORS = {
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '<': np.less,
+    '<=': np.less_equal,
+    '==': np.equal,
+    '!=': np.not_equal
+}
+
+class RuleSet:
+    def __init__(self, rules, feature_names):
+        self.rules = [tuple(rule) for rule in rules]
+        feature_names = list(feature_names)
+        for rule in self.rules:
+            if rule[0] not in feature_names:
+                raise ValueError(f"Rule feature '{rule[0]}' is not one of the model features")
+            if rule[1] not in COMPARATORS:
+                raise ValueError(f"Unknown comparator '{rule[1]}' in rule for '{rule[0]}'")
+
+        self.columns = np.array([feature_names.index(rule[0]) for rule in self.rules], dtype=np.int64)
+        self.thresholds = np.array([rule[2] for rule in self.rules], dtype=np.float64)
+        self.increments = np.array([rule[3] for rule in self.rules], dtype=np.float64)
+        self.per_unit = np.array([len(rule) > 5 and bool(rule[5]) for rule in self.rules])
+        self.labels = [rule[4] for rule in self.rules]
+
+        # Rules sharing a comparator are evaluated together as one array operation
+        self.groups = [
+            (COMPARATORS[comparator], np.flatnonzero([rule[1] == comparator for rule in self.rules]))
+            for comparator in dict.fromkeys(rule[1] for rule in self.rules)
+        ]
+
+    def __len__(self):
+        return len(self.rules)
+
+    def evaluate(self, X_raw):
+        """Return (increments, fired): the summed increment per row and the (N, n_rules) fired mask"""
+        values = np.atleast_2d(np.asarray(X_raw, dtype=np.float64))[:, self.columns]
+        fired = np.zeros(values.shape, dtype=bool)
+        for compare, rule_ids in self.groups:
+            fired[:, rule_ids] = compare(values[:, rule_ids], self.thresholds[rule_ids])
+
+        contributions = np.where(self.per_unit, values * self.increments, self.increments)
+        increments = np.where(fired, contributions, 0.0).sum(axis=1)
+        return increments, fired
+
+    def apply(self, probabilities, X_raw):
+        """Return (adjusted probabilities, fired-rule labels per row) in a single evaluation"""
+        increments, fired = self.evaluate(X_raw)
+        return probabilities + increments, self.fired_labels(fired, X_raw)
+
+    def fired_labels(self, fired, X_raw):
+        """Format the labels of the fired rules, one list per row"""
+        values = np.atleast_2d(np.asarray(X_raw, dtype=np.float64))[:, self.columns]
+        labels = [[] for _ in range(len(fired))]
+        for row, rule_id in zip(*np.nonzero(fired)):
+            labels[row].append(self.labels[rule_id].format(value=values[row, rule_id]))
+        return labels
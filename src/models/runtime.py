@@ -0,0 +1,298 @@
+"""Pure-NumPy inference runtime for exported models.
+
+Scoring a kNN model needs only its input transform (the scaler folded with the
+feature weights into input_coef/input_offset), the reference matrix and labels,
+the risk rules and a few scalars; the logistic model needs its coefficient
+vector and intercept. ``export_bundle`` writes exactly these to a bundle next
+to the model (``<model>.bundle``, the layout of src.models.layout), and the
+classes here score from a bundle with NumPy alone: no pandas, no scikit-learn,
+no unpickling. The bundle arrays are memory-mapped, so workers share them.
+
+``load_bundle(path).predict_batch(X)`` returns what the model's own
+predict_batch returns, bit for bit: neighbors are found by exhaustive search
+over the same reference matrix, summing distances in the same order as the
+model's engine (FeatureOrderIndex for scikit-learn's trees, the brute engine
+otherwise). The one difference is among reference rows at exactly the same
+distance (duplicate cases), where the runtime prefers the lower position and a
+tree may return another; benchmarks/numpy_runtime.py checks the outputs
+against the models. ``predict``
+returns the same tuple as BaseModel.predict, and ``similar_cases`` the
+neighbors' records as a dict of column -> values with their ids under
+'case_id' in place of a DataFrame.
+
+Usage: python -m src.models.runtime [--only heart_disease parkinsons]
+"""
+import argparse
+import logging
+import math
+import os
+import sys
+import numpy as np
+from ..features import fill_diabetes_zeros
+from .layout import read_artifact, write_artifact
+from .neighbors import BruteIndex, _top_k
+from .rules import RuleSet
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BUNDLE_SUFFIX = ".bundle"
+
+# Engines whose distances come from scikit-learn's per-pair loops rather than NumPy blocks
+TREE_ENGINES = ('kd_tree', 'ball_tree')
+
+def bundle_path_for(model_path):
+    """Path of the runtime bundle that sits next to a ``.pkl`` model path"""
+    return os.path.splitext(model_path)[0] + BUNDLE_SUFFIX
+
+def libm_exp(x):
+    """The C library's exp (what scipy's expit uses); np.exp's SIMD kernel can differ in the last bit"""
+    try:
+        return math.exp(x)
+    except OverflowError:
+        return math.inf
+
+def tree_distances(model):
+    """Whether the model's neighbor engine computes its distances in scikit-learn's trees"""
+    engine = model.index_engine
+    if engine == 'sharded':
+        engine = getattr(model.index, 'shard_engine', None) or (
+            'brute' if model.reference_dtype == 'float32' else 'kd_tree'
+        )
+    return engine in TREE_ENGINES
+
+class FeatureOrderIndex(BruteIndex):
+    """Exhaustive search that sums the distance one feature at a time, in the order scikit-learn's
+    trees do, so the distances (and the scores computed from them) match a tree engine bit for bit.
+    """
+
+    def query(self, X, k):
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        rows_per_block = max(1, self.max_block_elements // max(1, len(self.data)))
+        distances, indices = [], []
+        for start in range(0, len(X), rows_per_block):
+            block = X[start:start + rows_per_block]
+            total = np.zeros((len(block), len(self.data)))
+            for feature in range(block.shape[1]):
+                diff = np.abs(np.subtract(block[:, feature, None], self.data[None, :, feature], dtype=np.float64))
+                if self.metric == 'euclidean':
+                    total += diff * diff
+                elif self.metric == 'manhattan':
+                    total += diff
+                else:
+                    total += diff ** self.p
+            if self.metric == 'euclidean':
+                total = np.sqrt(total)
+            elif self.metric != 'manhattan':
+                total **= 1.0 / self.p
+            block_distances, block_indices = _top_k(total, k)
+            distances.append(block_distances)
+            indices.append(block_indices)
+        return np.vstack(distances), np.vstack(indices)
+
+def export_bundle(model, path=None):
+    """Write the parameters ``model`` scores with to a runtime bundle; returns its path"""
+    path = path or bundle_path_for(model.model_path)
+    spec = model.runtime_spec()
+    header = {'kind': 'bundle', 'model_class': type(model).__name__, 'spec': spec}
+
+    if spec['scoring'] == 'logistic':
+        estimator = model.model
+        header['feature_names'] = [str(name) for name in getattr(estimator, 'feature_names_in_', [])] or None
+        arrays = {
+            'coef': estimator.coef_, 'intercept': estimator.intercept_, 'classes': estimator.classes_
+        }
+        if model.scaler is not None:
+            arrays.update({'scaler_mean': model.scaler.mean_, 'scaler_scale': model.scaler.scale_})
+    else:
+        if model.input_coef is None:
+            model.prepare_transform()
+        params = model.model.get_params()
+        header.update({
+            'feature_names': list(model.feature_names),
+            'metric': params['metric'], 'p': params['p'], 'n_neighbors': params['n_neighbors'],
+            'tree_distances': tree_distances(model)
+        })
+        cases = model.case_store().lookup(np.arange(len(model.X_train)))
+        arrays = {
+            'input_coef': model.input_coef,
+            'input_offset': model.input_offset,
+            'reference': model.reference_matrix(),
+            'labels': np.asarray(model.y_train),
+            'case_ids': cases.index.to_numpy(dtype=np.int64)
+        }
+        for position, column in enumerate(model.feature_names):
+            arrays[f'column_{position}'] = cases[column].to_numpy()
+
+    write_artifact(path, header, arrays)
+    return path
+
+def load_bundle(path):
+    """The runtime model stored at ``path``"""
+    header, arrays = read_artifact(path)
+    if header.get('kind') != 'bundle':
+        raise ValueError(f"{path} is not a runtime bundle")
+    if header['spec']['scoring'] == 'logistic':
+        return LogisticRuntime(header, arrays)
+    return KNNRuntime(header, arrays)
+
+class RuntimeModel:
+    def __init__(self, header, arrays):
+        self.model_class = header['model_class']
+        self.feature_names = header['feature_names']
+        self.spec = header['spec']
+
+    def raw_matrix(self, X):
+        """Input as an (N, n_features) float matrix; a DataFrame is read in feature_names order"""
+        if hasattr(X, 'columns') and self.feature_names:
+            X = X[self.feature_names]
+        return np.atleast_2d(np.asarray(X, dtype=np.float64))
+
+    def valid_rows(self, X):
+        """Row mask of inputs the model can score: every feature present and finite"""
+        return np.isfinite(self.raw_matrix(X)).all(axis=1)
+
+class LogisticRuntime(RuntimeModel):
+    def __init__(self, header, arrays):
+        super().__init__(header, arrays)
+        self.coef = np.asarray(arrays['coef'])
+        self.intercept = np.asarray(arrays['intercept'])
+        self.classes = np.asarray(arrays['classes'])
+        self.scaler_mean = arrays.get('scaler_mean')
+        self.scaler_scale = arrays.get('scaler_scale')
+
+    def predict_batch(self, X, return_risk_factors=False):
+        X = self.raw_matrix(X)
+        if self.scaler_mean is not None:
+            X = (X - self.scaler_mean) / self.scaler_scale
+        # Binary logistic regression: the decision function and its logistic sigmoid
+        scores = (X @ self.coef.T + self.intercept).ravel()
+        probabilities = 1 / (1 + np.fromiter((libm_exp(-score) for score in scores), np.float64, len(scores)))
+        predictions = self.classes[(scores > 0).astype(int)]
+        if return_risk_factors:
+            return predictions, probabilities, None, None, [[] for _ in range(len(X))]
+        return predictions, probabilities, None, None
+
+    def predict(self, X):
+        return self.predict_batch(X)[0]
+
+class KNNRuntime(RuntimeModel):
+    def __init__(self, header, arrays):
+        super().__init__(header, arrays)
+        self.input_coef = np.asarray(arrays['input_coef'])
+        self.input_offset = np.asarray(arrays['input_offset'])
+        self.labels = arrays['labels']
+        self.reference_ids = arrays['case_ids']
+        self.case_columns = [arrays[f'column_{position}'] for position in range(len(self.feature_names))]
+        self.n_neighbors = header['n_neighbors']
+        index_cls = FeatureOrderIndex if header['tree_distances'] else BruteIndex
+        self.index = index_cls(header['metric'], header['p'])
+        self.index.set_state({'metric': self.index.metric, 'p': self.index.p}, {'data': arrays['reference']})
+        self.risk_rules = RuleSet([tuple(rule) for rule in self.spec['rules']], self.feature_names)
+        self.feature_ranges = self.spec['feature_ranges'] or {}
+        # DiabetesModel: training medians that missing (0) measurements are replaced with
+        self.zero_medians = self.spec.get('zero_medians')
+
+    def raw_matrix(self, X):
+        X = super().raw_matrix(X)
+        if self.zero_medians:
+            X = fill_diabetes_zeros(X, self.feature_names, self.zero_medians)
+        return X
+
+    def transform_inputs(self, X_raw):
+        X = X_raw * self.input_coef
+        X += self.input_offset
+        return X
+
+    @staticmethod
+    def extended_range(min_val, max_val):
+        # Same 20% widening as ParkinsonsModel.extended_range
+        range_width = max_val - min_val
+        return min_val - (range_width * 0.2), max_val + (range_width * 0.2)
+
+    def valid_rows(self, X):
+        """Row mask of inputs the model can score: every feature finite and inside its range"""
+        X = self.raw_matrix(X)
+        valid = super().valid_rows(X)
+        for feature, (min_val, max_val) in self.feature_ranges.items():
+            values = X[:, self.feature_names.index(feature)]
+            extended_min, extended_max = self.extended_range(min_val, max_val)
+            valid &= (values >= extended_min) & (values <= extended_max)
+        return valid
+
+    def check_ranges(self, X_raw):
+        for feature, (min_val, max_val) in self.feature_ranges.items():
+            values = X_raw[:, self.feature_names.index(feature)]
+            extended_min, extended_max = self.extended_range(min_val, max_val)
+            out_of_range = (values < extended_min) | (values > extended_max)
+            if out_of_range.any():
+                value = values[np.argmax(out_of_range)]
+                raise ValueError(
+                    f"Invalid input: {feature} value ({value:.3f}) is outside expected range ({min_val:.3f} - {max_val:.3f})"
+                )
+
+    def predict_batch(self, X, return_risk_factors=False):
+        X_raw = self.raw_matrix(X)
+        X = self.transform_inputs(X_raw)
+        self.check_ranges(X_raw)
+        distances, indices = self.index.query(X, self.n_neighbors)
+        outcomes = np.asarray(self.labels)[indices]
+
+        if self.spec['scoring'] == 'confidence':
+            # ParkinsonsModel: outcomes weighted by 1 - distance / the row's largest distance
+            confidence_scores = 1 - (distances / np.max(distances, axis=1, keepdims=True))
+            probabilities = np.average(outcomes, weights=confidence_scores, axis=1)
+        else:
+            weights = 1 / (distances + 1e-6)
+            probabilities = np.sum(outcomes * weights, axis=1) / np.sum(weights, axis=1)
+
+        fired = None
+        if self.spec['rules_adjust_probability'] or return_risk_factors:
+            increments, fired = self.risk_rules.evaluate(X_raw)
+            if self.spec['rules_adjust_probability']:
+                probabilities = probabilities + increments
+
+        high_risk = probabilities >= self.spec['threshold']
+        predictions = np.where(high_risk, 1, 0) if self.spec['high_risk_label'] == 1 else np.where(high_risk, 0, 1)
+
+        if return_risk_factors:
+            return predictions, probabilities, indices, distances, self.risk_rules.fired_labels(fired, X_raw)
+        return predictions, probabilities, indices, distances
+
+    def similar_cases(self, positions):
+        """Records of the reference cases at ``positions`` in input units, with their ids under 'case_id'"""
+        cases = {'case_id': self.reference_ids[positions]}
+        for column, values in zip(self.feature_names, self.case_columns):
+            cases[column] = values[positions]
+        return cases
+
+    def predict(self, X, return_risk_factors=False):
+        """Score a single case like BaseModel.predict: (prediction, probability, neighbors, outcomes, distances[, labels])"""
+        results = self.predict_batch(X, return_risk_factors=return_risk_factors)
+        predictions, probabilities, indices, distances = results[:4]
+        outcomes = np.asarray(self.labels)[indices[0]]
+        if return_risk_factors:
+            return predictions[:1], probabilities[:1], indices[0], outcomes, distances[0], results[4][0]
+        return predictions[:1], probabilities[:1], indices[0], outcomes, distances[0]
+
+def main(argv=None):
+    # Exporting reads the trained models, so only this step imports scikit-learn
+    from ..batch_scoring import DISEASES
+
+    parser = argparse.ArgumentParser(description="Export trained models to bundles for the NumPy runtime")
+    parser.add_argument('--only', nargs='+', choices=sorted(DISEASES), help="Models to export (default: all)")
+    args = parser.parse_args(argv)
+
+    exported = 0
+    for name in args.only or DISEASES:
+        model_cls, _ = DISEASES[name]
+        if not os.path.exists(model_cls().stored_model_path()):
+            logger.warning(f"Skipping {name}: no trained model, run train_models.py first")
+            continue
+        path = export_bundle(model_cls.load_model())
+        logger.info(f"Exported {name} -> {path}")
+        exported += 1
+    return 0 if exported else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""Content-hashed cache for the preprocessing loaders.
+
+A loader decorated with ``cached_dataset`` returns ``(X_scaled, y, scaler)``.
+The result is stored in the memory-mappable artifact layout of
+``src.models.artifact`` under a key hashed from the source file bytes and the
+source code of the loader's module, plus any modules it names in
+``depends_on``. Editing the dataset, the loader or a helper it calls therefore
+misses the cache, and an unchanged set is served from disk in milliseconds
+without re-parsing the CSV or refitting the scaler. Other fitted preprocessing
+state a loader needs at scoring time (the diabetes medians) travels in
+``X_scaled.attrs``, which is cached with the arrays.
+
+Pass ``use_cache=False`` to a loader, or set ``PREPROCESSING_CACHE=0`` in the
+environment, to bypass the cache.
+"""
+import functools
+import glob
+import hashlib
+import inspect
+import logging
+import os
+import numpy as np
+import pandas as pd
+from ..config import PREPROCESSING_CACHE_DIR
+from ..models.artifact import read_artifact, restore_scaler, scaler_state, write_artifact
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bump when the cache file contents change shape
+CACHE_FORMAT = 2
+
+def file_digest(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def cache_key(source_path, loader, depends_on=()):
+    """Hash of the source file contents, the code of the loader's module and its dependencies, and the cache format"""
+    digest = hashlib.sha256()
+    digest.update(f"format={CACHE_FORMAT}\n".encode())
+    digest.update(file_digest(source_path).encode())
+    for module in (inspect.getmodule(loader), *depends_on):
+        digest.update(inspect.getsource(module).encode())
+    return digest.hexdigest()
+
+def cache_enabled():
+    return os.environ.get('PREPROCESSING_CACHE', '1') != '0'
+
+def save_cached(path, X_scaled, y, scaler):
+    header = {
+        'columns': [str(column) for column in X_scaled.columns],
+        'y_kind': 'series' if isinstance(y, pd.Series) else 'array',
+        'y_name': y.name if isinstance(y, pd.Series) else None,
+        'attrs': dict(X_scaled.attrs),
+        'scaler': None
+    }
+    arrays = {
+        'X': X_scaled.to_numpy(dtype=np.float64),
+        'X_index': X_scaled.index.to_numpy(dtype=np.int64),
+        'y': np.asarray(y),
+        'y_index': (y.index if isinstance(y, pd.Series) else pd.RangeIndex(len(y))).to_numpy(dtype=np.int64)
+    }
+    if scaler is not None:
+        header['scaler'], scaler_arrays = scaler_state(scaler)
+        arrays.update(scaler_arrays)
+    write_artifact(path, header, arrays)
+
+def load_cached(path):
+    # Read into memory rather than mapping, callers are free to modify what they get back
+    header, arrays = read_artifact(path, mmap=False)
+    X_scaled = pd.DataFrame(arrays['X'], index=pd.Index(arrays['X_index']), columns=header['columns'])
+    X_scaled.attrs.update(header['attrs'])
+    y = arrays['y']
+    if header['y_kind'] == 'series':
+        y = pd.Series(y, index=pd.Index(arrays['y_index']), name=header['y_name'])
+    scaler = restore_scaler(header['scaler'], arrays) if header['scaler'] is not None else None
+    return X_scaled, y, scaler
+
+def cached_dataset(name, source_path, depends_on=()):
+    """Cache a ``loader() -> (X_scaled, y, scaler)`` keyed on ``source_path`` and the code it runs, see cache_key"""
+    def decorator(loader):
+        @functools.wraps(loader)
+        def wrapper(use_cache=True):
+            if not (use_cache and cache_enabled()):
+                return loader()
+
+            key = cache_key(source_path, loader, depends_on)
+            path = os.path.join(PREPROCESSING_CACHE_DIR, f"{name}-{key[:16]}.cache")
+            if os.path.exists(path):
+                try:
+                    return load_cached(path)
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(f"Ignoring unreadable cache file {path}: {str(e)}")
+
+            X_scaled, y, scaler = loader()
+            try:
+                os.makedirs(PREPROCESSING_CACHE_DIR, exist_ok=True)
+                save_cached(path, X_scaled, y, scaler)
+                # Entries for older versions of this dataset can never be hit again
+                for stale in glob.glob(os.path.join(PREPROCESSING_CACHE_DIR, f"{name}-*.cache")):
+                    if stale != path:
+                        os.remove(stale)
+                logger.info(f"Cached preprocessed {name} data in {path}")
+            except OSError as e:
+                logger.warning(f"Could not write preprocessing cache {path}: {str(e)}")
+            return X_scaled, y, scaler
+        return wrapper
+    return decorator
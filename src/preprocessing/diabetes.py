@@ -2,46 +2,72 @@ import pandas as pd
 from sklearn.preprocessing import StandardScaler
 import logging
 from pathlib import Path
+from .cache import cached_dataset
+from .. import features
+from ..features import DIABETES_ZERO_NOT_ACCEPTED as ZERO_NOT_ACCEPTED, diabetes_derived_features
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DATA_PATH = Path(__file__).resolve().parent.parent.parent / "datasets" / "diabetes.csv"
+
+FEATURE_NAMES = [
+    'Pregnancies',      # Number of times pregnant
+    'Glucose',          # Plasma glucose concentration (mg/dL)
+    'BloodPressure',    # Diastolic blood pressure (mm Hg)
+    'SkinThickness',    # Triceps skin fold thickness (mm)
+    'Insulin',          # 2-Hour serum insulin (mu U/ml)
+    'BMI',              # Body mass index
+    'DiabetesPedigreeFunction',  # Diabetes pedigree function
+    'Age',              # Age in years
+    'GlucoseBMI',       # Derived, see add_derived_features
+    'GlucoseAge'
+]
+
+def zero_medians(df):
+    """{column: median of its non-zero values} for the ZERO_NOT_ACCEPTED columns"""
+    return {column: float(df.loc[df[column] != 0, column].median()) for column in ZERO_NOT_ACCEPTED}
+
+def fill_zeros(df, medians):
+    """Replace the missing (0) values of each column in ``medians`` with its median, in place"""
+    for column, median in medians.items():
+        df.loc[df[column] == 0, column] = median
+    return df
+
+def add_derived_features(df):
+    """Add the derived features of src.features.diabetes_derived_features to ``df``, in place"""
+    for feature, values in diabetes_derived_features(df['Glucose'], df['BMI'], df['Age']).items():
+        df[feature] = values
+    return df
+
+def load_zero_medians():
+    """The medians load_and_preprocess_diabetes_data fills missing values with"""
+    X_scaled, _, _ = load_and_preprocess_diabetes_data()
+    return X_scaled.attrs['zero_medians']
+
+@cached_dataset('diabetes', DATA_PATH, depends_on=(features,))
 def load_and_preprocess_diabetes_data():
     try:
         # Load the dataset from local datasets folder
-        data_path = Path(__file__).resolve().parent.parent.parent / "datasets" / "diabetes.csv"
-        df = pd.read_csv(data_path)
-        
-        feature_names = [
-            'Pregnancies',      # Number of times pregnant
-            'Glucose',          # Plasma glucose concentration (mg/dL)
-            'BloodPressure',    # Diastolic blood pressure (mm Hg)
-            'SkinThickness',    # Triceps skin fold thickness (mm)
-            'Insulin',          # 2-Hour serum insulin (mu U/ml)
-            'BMI',              # Body mass index
-            'DiabetesPedigreeFunction',  # Diabetes pedigree function
-            'Age'               # Age in years
-        ]
+        df = pd.read_csv(DATA_PATH)
         
         # Handle missing values (0 values in certain columns)
-        zero_not_accepted = ['Glucose', 'BloodPressure', 'SkinThickness', 'Insulin', 'BMI']
-        for column in zero_not_accepted:
-            mask = df[column] != 0
-            df.loc[~mask, column] = df.loc[mask, column].median()
+        medians = zero_medians(df)
+        fill_zeros(df, medians)
         
         # Add some derived features
-        df['GlucoseBMI'] = df['Glucose'] * df['BMI'] / 1000
-        df['GlucoseAge'] = df['Glucose'] * df['Age'] / 100
-        feature_names.extend(['GlucoseBMI', 'GlucoseAge'])
+        add_derived_features(df)
         
         # Separate features and target
-        X = df[feature_names]
+        X = df[FEATURE_NAMES]
         y = df['Outcome']
         
         # Scale features
         scaler = StandardScaler()
         X_scaled = scaler.fit_transform(X)
-        X_scaled = pd.DataFrame(X_scaled, columns=feature_names)
+        X_scaled = pd.DataFrame(X_scaled, columns=FEATURE_NAMES)
+        # The models fill missing inputs with the same medians at scoring time
+        X_scaled.attrs['zero_medians'] = medians
         
         return X_scaled, y, scaler
         
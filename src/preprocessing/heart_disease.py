@@ -2,32 +2,39 @@ import pandas as pd
 from sklearn.preprocessing import StandardScaler
 import logging
 from pathlib import Path
+from .cache import cached_dataset
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DATA_PATH = Path(__file__).resolve().parent.parent.parent / "datasets" / "heart.csv"
+
+FEATURE_NAMES = [
+    'age', 'sex', 'cp', 'trestbps', 'chol', 'fbs', 'restecg',
+    'thalach', 'exang', 'oldpeak', 'slope', 'ca', 'thal'
+]
+
+def clean(df):
+    """Drop the rows with missing ('?') values"""
+    return df.replace('?', pd.NA).dropna()
+
+@cached_dataset('heart_disease', DATA_PATH)
 def load_and_preprocess_heart_data():
     try:
         # Load the dataset from local datasets folder
-        data_path = Path(__file__).resolve().parent.parent.parent / "datasets" / "heart.csv"
-        df = pd.read_csv(data_path)
-        
-        feature_names = [
-            'age', 'sex', 'cp', 'trestbps', 'chol', 'fbs', 'restecg',
-            'thalach', 'exang', 'oldpeak', 'slope', 'ca', 'thal'
-        ]
+        df = pd.read_csv(DATA_PATH)
         
         # Handle missing values if any
-        df = df.replace('?', pd.NA).dropna()
+        df = clean(df)
         
         # Separate features and target
-        X = df[feature_names]
+        X = df[FEATURE_NAMES]
         y = df['target']
         
         # Scale features
         scaler = StandardScaler()
         X_scaled = scaler.fit_transform(X)
-        X_scaled = pd.DataFrame(X_scaled, columns=feature_names)
+        X_scaled = pd.DataFrame(X_scaled, columns=FEATURE_NAMES)
         
         return X_scaled, y, scaler
         
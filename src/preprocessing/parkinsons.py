@@ -2,26 +2,38 @@ import pandas as pd
 from sklearn.preprocessing import StandardScaler
 import logging
 from pathlib import Path
+from .cache import cached_dataset
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DATA_PATH = Path(__file__).resolve().parent.parent.parent / "datasets" / "parkinsons.csv"
+
+FEATURE_NAMES = [
+    'MDVP:Fo(Hz)', 'MDVP:Fhi(Hz)', 'MDVP:Flo(Hz)', 'MDVP:Jitter(%)', 'MDVP:Jitter(Abs)', 'MDVP:RAP', 'MDVP:PPQ',
+    'Jitter:DDP', 'MDVP:Shimmer', 'MDVP:Shimmer(dB)', 'Shimmer:APQ3', 'Shimmer:APQ5', 'MDVP:APQ', 'Shimmer:DDA',
+    'NHR', 'HNR', 'RPDE', 'DFA', 'spread1', 'spread2', 'D2', 'PPE'
+]
+
+def clean(df):
+    """Drop the recording name and flip 'status' to our convention (1 for disease, 0 for healthy)"""
+    # Drop the 'name' column if it exists
+    if 'name' in df.columns:
+        df = df.drop('name', axis=1)
+    
+    # Rename 'status' to match our convention (1 for disease, 0 for healthy)
+    if 'status' in df.columns:
+        df['status'] = df['status'].map({0: 1, 1: 0})
+    return df
+
+@cached_dataset('parkinsons', DATA_PATH)
 def load_and_preprocess_parkinsons_data():
     try:
         # Load the dataset from local datasets folder
-        data_path = Path(__file__).resolve().parent.parent.parent / "datasets" / "parkinsons.csv"
-        df = pd.read_csv(data_path)
-        
-        # Drop the 'name' column if it exists
-        if 'name' in df.columns:
-            df = df.drop('name', axis=1)
-        
-        # Rename 'status' to match our convention (1 for disease, 0 for healthy)
-        if 'status' in df.columns:
-            df['status'] = df['status'].map({0: 1, 1: 0})
+        df = clean(pd.read_csv(DATA_PATH))
         
         # Separate features and target
-        X = df.drop('status', axis=1)
+        X = df[FEATURE_NAMES]
         y = df['status']
         
         # Scale features
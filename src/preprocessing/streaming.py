@@ -0,0 +1,264 @@
+"""Out-of-core preprocessing for dataset extracts larger than memory.
+
+Usage: python -m src.preprocessing.streaming DATASET INPUT.csv OUTPUT.csv [--chunk-size ROWS]
+
+Applies the same cleaning, imputation, derived features and scaling as the
+in-memory loaders in this package, but never holds more than one chunk of the
+input. The file is read in chunks several times:
+
+    1. imputation statistics: approximate column medians from a QuantileSketch
+       (only for datasets that impute, i.e. diabetes)
+    2. scaler moments: StandardScaler.partial_fit on the cleaned, imputed chunks
+    3. output: each chunk is transformed with the final statistics and appended
+
+Scaling needs the moments of the imputed values, so the passes cannot be
+folded into one. Peak memory is bounded by the chunk size plus the sketches,
+whatever the input size. The output is CSV, or a float64 ``.npy`` array when
+OUTPUT ends in ``.npy``; the fitted statistics are written next to it as
+``OUTPUT.stats.json``.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, List, Optional
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+from . import diabetes, heart_disease, parkinsons
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 100000
+
+class QuantileSketch:
+    """Mergeable approximate quantiles in bounded memory (Munro-Paterson style compactor).
+
+    Values are buffered at level 0. When a level holds more than ``capacity``
+    values it is sorted and every other value (from a random offset) moves up
+    one level, where each value stands for twice as many inputs. Only an even
+    number of values is compacted, so the total weight always equals the
+    number of inputs; an odd one out stays where it is. Memory is
+    ``capacity`` values per level, i.e. O(capacity * log(n / capacity)); the
+    rank error shrinks with ``capacity``. While nothing has been compacted the
+    quantiles are exact.
+    """
+
+    def __init__(self, capacity=4096, seed=0):
+        self.capacity = capacity
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self.rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compact()
+        return self
+
+    def merge(self, other):
+        for level, values in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate([self.levels[level], values])
+        self.count += other.count
+        self._compact()
+        return self
+
+    def _compact(self):
+        level = 0
+        while level < len(self.levels):
+            if len(self.levels[level]) > self.capacity:
+                ordered = np.sort(self.levels[level])
+                # Each promoted value replaces a pair: compacting an odd count would add weight
+                paired = len(ordered) - len(ordered) % 2
+                promoted = ordered[:paired][self.rng.integers(2)::2]
+                self.levels[level] = ordered[paired:]
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def quantile(self, q):
+        if self.count == 0:
+            return np.nan
+        if len(self.levels) == 1:
+            return float(np.quantile(self.levels[0], q))
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(stored), 2.0 ** level) for level, stored in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        position = np.searchsorted(cumulative, q * cumulative[-1])
+        return float(values[order][min(position, len(values) - 1)])
+
+    def median(self):
+        return self.quantile(0.5)
+
+@dataclass
+class StreamingSpec:
+    """Preprocessing steps of one dataset, applied chunk by chunk"""
+    feature_names: List[str]
+    target: str
+    source: Path
+    # Columns whose zeros are missing values, imputed with the median of the non-zero values
+    zero_not_accepted: List[str] = field(default_factory=list)
+    clean: Optional[Callable] = None
+    derive: Optional[Callable] = None
+
+# Feature lists, cleaning and derived features come from the in-memory loaders, so both paths stay in step
+DATASETS = {
+    'diabetes': StreamingSpec(
+        feature_names=diabetes.FEATURE_NAMES,
+        target='Outcome',
+        source=diabetes.DATA_PATH,
+        zero_not_accepted=diabetes.ZERO_NOT_ACCEPTED,
+        derive=diabetes.add_derived_features
+    ),
+    'heart_disease': StreamingSpec(
+        feature_names=heart_disease.FEATURE_NAMES,
+        target='target',
+        source=heart_disease.DATA_PATH,
+        clean=heart_disease.clean
+    ),
+    'parkinsons': StreamingSpec(
+        feature_names=parkinsons.FEATURE_NAMES,
+        target='status',
+        source=parkinsons.DATA_PATH,
+        clean=parkinsons.clean
+    )
+}
+
+class StreamingPreprocessor:
+    def __init__(self, spec, chunk_size=DEFAULT_CHUNK_SIZE, sketch_capacity=4096):
+        self.spec = spec
+        self.chunk_size = chunk_size
+        self.sketch_capacity = sketch_capacity
+        self.medians = {}
+        self.scaler = None
+        self.n_rows = 0
+
+    def chunks(self, path):
+        for chunk in pd.read_csv(path, chunksize=self.chunk_size):
+            if self.spec.clean is not None:
+                chunk = self.spec.clean(chunk)
+            yield chunk
+
+    def impute(self, chunk):
+        for column in self.spec.zero_not_accepted:
+            chunk[column] = chunk[column].mask(chunk[column] == 0, self.medians[column])
+        return chunk
+
+    def features(self, chunk):
+        """Cleaned chunk -> (unscaled feature frame, target) with imputation and derived features"""
+        chunk = self.impute(chunk.copy())
+        if self.spec.derive is not None:
+            chunk = self.spec.derive(chunk)
+        X = chunk[self.spec.feature_names].astype(np.float64)
+        return X, chunk[self.spec.target].astype(np.int64)
+
+    def fit(self, path):
+        """Streaming passes over ``path`` for the imputation medians and the scaler moments"""
+        if self.spec.zero_not_accepted:
+            sketches = {column: QuantileSketch(self.sketch_capacity) for column in self.spec.zero_not_accepted}
+            for chunk in self.chunks(path):
+                for column, sketch in sketches.items():
+                    values = chunk[column].to_numpy(dtype=np.float64)
+                    sketch.update(values[values != 0])
+            self.medians = {column: sketch.median() for column, sketch in sketches.items()}
+
+        self.scaler = StandardScaler()
+        self.n_rows = 0
+        for chunk in self.chunks(path):
+            X, _ = self.features(chunk)
+            if len(X):
+                self.scaler.partial_fit(X)
+                self.n_rows += len(X)
+        if self.n_rows == 0:
+            raise ValueError(f"No usable rows in {path}")
+        return self
+
+    def transform(self, path):
+        """Yield (X_scaled, y) chunks of ``path`` using the fitted statistics"""
+        for chunk in self.chunks(path):
+            X, y = self.features(chunk)
+            if len(X):
+                yield pd.DataFrame(self.scaler.transform(X), columns=self.spec.feature_names, index=X.index), y
+
+    def write(self, path, output_path):
+        """Write the scaled features and target of ``path`` to ``output_path`` chunk by chunk.
+
+        A ``.npy`` output is a float64 (rows, features + 1) array filled through a
+        memory map, since fit() already counted the rows; anything else is CSV.
+        """
+        tmp_path = output_path + ".tmp"
+        columns = self.spec.feature_names + [self.spec.target]
+        try:
+            if output_path.endswith('.npy'):
+                out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float64, shape=(self.n_rows, len(columns)))
+                row = 0
+                for X_scaled, y in self.transform(path):
+                    out[row:row + len(X_scaled), :-1] = X_scaled.to_numpy()
+                    out[row:row + len(X_scaled), -1] = y.to_numpy()
+                    row += len(X_scaled)
+                out.flush()
+                del out
+            else:
+                with open(tmp_path, 'w', newline='') as out:
+                    out.write(','.join(columns) + '\n')
+                    formats = ['%.17g'] * len(self.spec.feature_names) + ['%d']
+                    for X_scaled, y in self.transform(path):
+                        # np.savetxt formats floats several times faster than DataFrame.to_csv
+                        np.savetxt(out, np.column_stack([X_scaled.to_numpy(), y.to_numpy()]), fmt=formats, delimiter=',')
+            os.replace(tmp_path, output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def stats(self):
+        return {
+            'rows': self.n_rows,
+            'feature_names': self.spec.feature_names,
+            'medians': self.medians,
+            'scaler': {
+                'mean': self.scaler.mean_.tolist(),
+                'scale': self.scaler.scale_.tolist(),
+                'var': self.scaler.var_.tolist(),
+                'n_samples_seen': int(self.scaler.n_samples_seen_)
+            }
+        }
+
+def preprocess_file(dataset, input_path, output_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Fit and apply the streaming preprocessing; returns the fitted preprocessor"""
+    preprocessor = StreamingPreprocessor(DATASETS[dataset], chunk_size).fit(input_path)
+    preprocessor.write(input_path, output_path)
+    with open(output_path + ".stats.json", 'w') as f:
+        json.dump(preprocessor.stats(), f, indent=2)
+    return preprocessor
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Preprocess a dataset extract in bounded memory")
+    parser.add_argument('dataset', choices=sorted(DATASETS))
+    parser.add_argument('input', help="CSV in the schema of datasets/*.csv for the dataset")
+    parser.add_argument('output', help="Scaled features plus target, as CSV or .npy")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        preprocessor = preprocess_file(args.dataset, args.input, args.output, args.chunk_size)
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"Error in streaming preprocessing: {str(e)}")
+        return 1
+    elapsed = time.perf_counter() - start
+    print(f"Preprocessed {preprocessor.n_rows} rows in {elapsed:.2f}s -> {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
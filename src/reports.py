@@ -0,0 +1,346 @@
+"""Assessment reports exported from the history store, streamed row by row.
+
+Usage: python -m src.reports OUTPUT.{csv,jsonl,xlsx} [--type detailed] [--from 2024-01-01] [--to 2024-03-31]
+       [--types Diabetes "Heart Disease"] [--patient P00042] [--charts] [--recommendations]
+
+Report types:
+
+    summary     one row per day and assessment type: count, mean risk score,
+                Critical and Warning counts
+    detailed    one row per assessment
+    technical   detailed plus the high-risk flag and the model inputs
+
+Rows come off a SQLite cursor a batch at a time (AssessmentHistory.iter_*) and
+go straight to the output file, so memory does not grow with the number of
+assessments exported. CSV and JSON lines are plain text; XLSX is written
+directly as SpreadsheetML inside a zip (one streamed worksheet with inline
+strings, no shared-string table), so no spreadsheet library is needed. With
+charts on, the XLSX gets a "Daily Risk" sheet (mean risk per day and type,
+bounded by days x types) and a line chart over it; CSV and JSON lines have
+nowhere to put a chart and ignore the option.
+"""
+import argparse
+import csv
+import datetime
+import io
+import json
+import logging
+import math
+import os
+import sys
+import zipfile
+from xml.sax.saxutils import escape
+from .history import get_history
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REPORT_TYPES = ["summary", "detailed", "technical"]
+
+# Follow-up suggested for an assessment status (summary rows use their worst status)
+RECOMMENDATIONS = {
+    "Critical": "Refer for specialist review and confirmatory testing",
+    "Warning": "Address the flagged risk factors and re-assess within 3 months",
+    "Normal": "Continue routine screening"
+}
+
+COLUMNS = {
+    "summary": ["Date", "Assessment Type", "Assessments", "Mean Risk Score", "Critical", "Warning"],
+    "detailed": ["Date", "Patient", "Assessment Type", "Risk Score", "Status", "Risk Factors"],
+    "technical": ["Date", "Patient", "Assessment Type", "High Risk", "Risk Score", "Status", "Risk Factors", "Inputs"]
+}
+
+MIME_TYPES = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+}
+
+def report_rows(history, report_type, start, end, types=None, patient_id=None, include_recommendations=False):
+    """(column names, iterator of row tuples) of one report"""
+    if report_type not in COLUMNS:
+        raise ValueError(f"Unknown report type: {report_type}")
+    columns = COLUMNS[report_type] + (["Recommendation"] if include_recommendations else [])
+
+    def rows():
+        if report_type == "summary":
+            for day, assessment_type, count, risk_score, critical, warning in history.iter_daily_summary(
+                start, end, types, patient_id
+            ):
+                row = (datetime.date.fromisoformat(day), assessment_type, count, risk_score, critical, warning)
+                if include_recommendations:
+                    status = "Critical" if critical else "Warning" if warning else "Normal"
+                    row += (RECOMMENDATIONS[status],)
+                yield row
+            return
+        for assessed_at, patient, assessment_type, high_risk, risk_score, status, risk_factors, inputs in \
+                history.iter_assessments(start, end, types, patient_id):
+            row = (datetime.datetime.fromisoformat(assessed_at), patient, assessment_type)
+            if report_type == "technical":
+                row += (bool(high_risk),)
+            row += (risk_score, status, json.loads(risk_factors) if risk_factors else [])
+            if report_type == "technical":
+                row += (json.loads(inputs) if inputs else None,)
+            if include_recommendations:
+                row += (RECOMMENDATIONS[status],)
+            yield row
+
+    return columns, rows()
+
+def daily_risk_table(history, start, end, types=None, patient_id=None):
+    """(assessment types, [(date, {type: mean risk score})]) for the report chart"""
+    days, seen = [], []
+    for day, assessment_type, _, risk_score, _, _ in history.iter_daily_summary(start, end, types, patient_id):
+        day = datetime.date.fromisoformat(day)
+        if not days or days[-1][0] != day:
+            days.append((day, {}))
+        days[-1][1][assessment_type] = risk_score
+        if assessment_type not in seen:
+            seen.append(assessment_type)
+    return sorted(seen), days
+
+def text_value(value):
+    """A list or dict cell as text, for the formats without nested values"""
+    if isinstance(value, list):
+        return "; ".join(str(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value)
+    return value
+
+def write_csv(out, columns, rows, chart=None):
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([value.isoformat(sep=" ") if isinstance(value, datetime.datetime) else text_value(value)
+                         for value in row])
+    text.flush()
+    text.detach()
+
+def write_jsonl(out, columns, rows, chart=None):
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="\n")
+    for row in rows:
+        record = {
+            column: value.isoformat() if isinstance(value, (datetime.date, datetime.datetime)) else value
+            for column, value in zip(columns, row)
+        }
+        text.write(json.dumps(record) + "\n")
+    text.flush()
+    text.detach()
+
+# SpreadsheetML parts of the XLSX writer
+XLSX_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+XLSX_RELATIONSHIPS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+XLSX_PACKAGE_RELATIONSHIPS = "http://schemas.openxmlformats.org/package/2006/relationships"
+XLSX_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+# Cell styles, in the order of cellXfs in XLSX_STYLES
+STYLE_DATETIME, STYLE_DATE, STYLE_HEADER = 1, 2, 3
+EXCEL_EPOCH = datetime.datetime(1899, 12, 30)
+
+XLSX_STYLES = XLSX_HEADER + f"""<styleSheet xmlns="{XLSX_MAIN}">
+<numFmts count="2"><numFmt numFmtId="164" formatCode="yyyy-mm-dd hh:mm:ss"/><numFmt numFmtId="165" formatCode="yyyy-mm-dd"/></numFmts>
+<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="4">
+<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>
+<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>
+</cellXfs>
+<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>
+</styleSheet>"""
+
+def column_letter(index):
+    """Spreadsheet column name of a 0-based column index: A, B, ..., Z, AA, ..."""
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+def xlsx_cell(reference, value, style=0):
+    value = text_value(value)
+    if value is None or (isinstance(value, float) and not math.isfinite(value)):
+        return ""
+    if isinstance(value, bool):
+        return f'<c r="{reference}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, datetime.datetime):
+        serial = (value - EXCEL_EPOCH).total_seconds() / 86400
+        return f'<c r="{reference}" s="{STYLE_DATETIME}"><v>{serial!r}</v></c>'
+    if isinstance(value, datetime.date):
+        serial = (value - EXCEL_EPOCH.date()).days
+        return f'<c r="{reference}" s="{STYLE_DATE}"><v>{serial}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{reference}"><v>{value!r}</v></c>'
+    style = f' s="{style}"' if style else ""
+    return f'<c r="{reference}"{style} t="inlineStr"><is><t xml:space="preserve">{escape(str(value))}</t></is></c>'
+
+def write_sheet(archive, name, columns, rows, drawing=False, batch_size=1000):
+    """Stream one worksheet into the archive; returns the number of data rows"""
+    letters = [column_letter(index) for index in range(len(columns))]
+    with archive.open(name, "w") as sheet:
+        sheet.write((
+            XLSX_HEADER + f'<worksheet xmlns="{XLSX_MAIN}" xmlns:r="{XLSX_RELATIONSHIPS}">'
+            '<sheetViews><sheetView workbookViewId="0">'
+            '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/></sheetView></sheetViews>'
+            f'<cols><col min="1" max="{len(columns)}" width="22" customWidth="1"/></cols><sheetData>'
+            '<row r="1">' + "".join(
+                xlsx_cell(f"{letter}1", column, STYLE_HEADER) for letter, column in zip(letters, columns)
+            ) + '</row>'
+        ).encode("utf-8"))
+        count, chunk = 0, []
+        for count, row in enumerate(rows, start=1):
+            chunk.append(f'<row r="{count + 1}">' + "".join(
+                xlsx_cell(f"{letter}{count + 1}", value) for letter, value in zip(letters, row)
+            ) + '</row>')
+            if len(chunk) >= batch_size:
+                sheet.write("".join(chunk).encode("utf-8"))
+                chunk = []
+        sheet.write(("".join(chunk) + '</sheetData>' + ('<drawing r:id="rId1"/>' if drawing else "")
+                     + '</worksheet>').encode("utf-8"))
+    return count
+
+def chart_parts(sheet_name, series, rows):
+    """Drawing and line chart XML over the daily risk sheet: dates in column A, one series per column after"""
+    reference = f"'{sheet_name}'"
+    lines = "".join(
+        f'<c:ser><c:idx val="{position}"/><c:order val="{position}"/>'
+        f'<c:tx><c:strRef><c:f>{reference}!${column_letter(position + 1)}$1</c:f></c:strRef></c:tx>'
+        f'<c:marker><c:symbol val="circle"/></c:marker>'
+        f'<c:cat><c:numRef><c:f>{reference}!$A$2:$A${rows + 1}</c:f></c:numRef></c:cat>'
+        f'<c:val><c:numRef><c:f>{reference}!${column_letter(position + 1)}$2:'
+        f'${column_letter(position + 1)}${rows + 1}</c:f></c:numRef></c:val><c:smooth val="0"/></c:ser>'
+        for position in range(len(series))
+    )
+    chart = XLSX_HEADER + (
+        '<c:chartSpace xmlns:c="http://schemas.openxmlformats.org/drawingml/2006/chart" '
+        'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+        f'xmlns:r="{XLSX_RELATIONSHIPS}"><c:chart>'
+        '<c:title><c:tx><c:rich><a:bodyPr/><a:p><a:r><a:t>Mean Risk Score per Day</a:t></a:r></a:p></c:rich></c:tx>'
+        '<c:overlay val="0"/></c:title><c:autoTitleDeleted val="0"/><c:plotArea><c:layout/>'
+        f'<c:lineChart><c:grouping val="standard"/><c:varyColors val="0"/>{lines}<c:marker val="1"/>'
+        '<c:axId val="500000001"/><c:axId val="500000002"/></c:lineChart>'
+        '<c:dateAx><c:axId val="500000001"/><c:scaling><c:orientation val="minMax"/></c:scaling><c:delete val="0"/>'
+        '<c:axPos val="b"/><c:numFmt formatCode="yyyy-mm-dd" sourceLinked="0"/><c:tickLblPos val="nextTo"/>'
+        '<c:crossAx val="500000002"/><c:crosses val="autoZero"/><c:auto val="1"/><c:lblOffset val="100"/>'
+        '<c:baseTimeUnit val="days"/></c:dateAx>'
+        '<c:valAx><c:axId val="500000002"/><c:scaling><c:orientation val="minMax"/><c:max val="1"/><c:min val="0"/>'
+        '</c:scaling><c:delete val="0"/><c:axPos val="l"/><c:majorGridlines/>'
+        '<c:numFmt formatCode="0%" sourceLinked="0"/><c:tickLblPos val="nextTo"/><c:crossAx val="500000001"/>'
+        '<c:crosses val="autoZero"/><c:crossBetween val="between"/></c:valAx></c:plotArea>'
+        '<c:legend><c:legendPos val="r"/><c:overlay val="0"/></c:legend><c:plotVisOnly val="1"/>'
+        '<c:dispBlanksAs val="gap"/></c:chart></c:chartSpace>'
+    )
+    first_column = len(series) + 2
+    drawing = XLSX_HEADER + (
+        '<xdr:wsDr xmlns:xdr="http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing" '
+        'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main"><xdr:twoCellAnchor>'
+        f'<xdr:from><xdr:col>{first_column}</xdr:col><xdr:colOff>0</xdr:colOff><xdr:row>1</xdr:row><xdr:rowOff>0</xdr:rowOff></xdr:from>'
+        f'<xdr:to><xdr:col>{first_column + 10}</xdr:col><xdr:colOff>0</xdr:colOff><xdr:row>21</xdr:row><xdr:rowOff>0</xdr:rowOff></xdr:to>'
+        '<xdr:graphicFrame macro=""><xdr:nvGraphicFramePr><xdr:cNvPr id="2" name="Daily Risk Chart"/>'
+        '<xdr:cNvGraphicFramePr/></xdr:nvGraphicFramePr><xdr:xfrm><a:off x="0" y="0"/><a:ext cx="0" cy="0"/></xdr:xfrm>'
+        '<a:graphic><a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/chart">'
+        '<c:chart xmlns:c="http://schemas.openxmlformats.org/drawingml/2006/chart" '
+        f'xmlns:r="{XLSX_RELATIONSHIPS}" r:id="rId1"/></a:graphicData></a:graphic></xdr:graphicFrame>'
+        '<xdr:clientData/></xdr:twoCellAnchor></xdr:wsDr>'
+    )
+    return drawing, chart
+
+def relationships(targets):
+    """A .rels part: [(type suffix, target)], numbered rId1, rId2, ..."""
+    return XLSX_HEADER + f'<Relationships xmlns="{XLSX_PACKAGE_RELATIONSHIPS}">' + "".join(
+        f'<Relationship Id="rId{position}" '
+        f'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/{kind}" Target="{target}"/>'
+        for position, (kind, target) in enumerate(targets, start=1)
+    ) + '</Relationships>'
+
+def write_xlsx(out, columns, rows, chart=None):
+    """XLSX workbook: the report sheet, plus the daily risk sheet and chart when ``chart`` is given"""
+    sheets = ["Report"]
+    overrides = {
+        "/xl/workbook.xml": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml",
+        "/xl/styles.xml": "application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml",
+        "/xl/worksheets/sheet1.xml": "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"
+    }
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        write_sheet(archive, "xl/worksheets/sheet1.xml", columns, rows)
+
+        if chart is not None and chart[1]:
+            series, days = chart
+            sheets.append("Daily Risk")
+            overrides.update({
+                "/xl/worksheets/sheet2.xml": "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml",
+                "/xl/drawings/drawing1.xml": "application/vnd.openxmlformats-officedocument.drawing+xml",
+                "/xl/charts/chart1.xml": "application/vnd.openxmlformats-officedocument.drawingml.chart+xml"
+            })
+            daily_rows = ((day,) + tuple(risk.get(name) for name in series) for day, risk in days)
+            write_sheet(archive, "xl/worksheets/sheet2.xml", ["Date"] + series, daily_rows, drawing=True)
+            drawing, chart_xml = chart_parts("Daily Risk", series, len(days))
+            archive.writestr("xl/worksheets/_rels/sheet2.xml.rels", relationships([("drawing", "../drawings/drawing1.xml")]))
+            archive.writestr("xl/drawings/drawing1.xml", drawing)
+            archive.writestr("xl/drawings/_rels/drawing1.xml.rels", relationships([("chart", "../charts/chart1.xml")]))
+            archive.writestr("xl/charts/chart1.xml", chart_xml)
+
+        archive.writestr("xl/styles.xml", XLSX_STYLES)
+        archive.writestr("xl/workbook.xml", XLSX_HEADER + f'<workbook xmlns="{XLSX_MAIN}" xmlns:r="{XLSX_RELATIONSHIPS}"><sheets>' + "".join(
+            f'<sheet name="{escape(name)}" sheetId="{position}" r:id="rId{position}"/>'
+            for position, name in enumerate(sheets, start=1)
+        ) + '</sheets></workbook>')
+        archive.writestr("xl/_rels/workbook.xml.rels", relationships(
+            [("worksheet", f"worksheets/sheet{position}.xml") for position in range(1, len(sheets) + 1)]
+            + [("styles", "styles.xml")]
+        ))
+        archive.writestr("_rels/.rels", relationships([("officeDocument", "xl/workbook.xml")]))
+        archive.writestr("[Content_Types].xml", XLSX_HEADER + (
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+        ) + "".join(
+            f'<Override PartName="{part}" ContentType="{content_type}"/>' for part, content_type in overrides.items()
+        ) + '</Types>')
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl, "xlsx": write_xlsx}
+
+def write_report(out, report_format, report_type, start, end, types=None, patient_id=None,
+                 include_charts=False, include_recommendations=False, history=None):
+    """Stream one report into the binary file ``out``"""
+    if report_format not in WRITERS:
+        raise ValueError(f"Unknown report format: {report_format}")
+    history = history or get_history()
+    columns, rows = report_rows(history, report_type, start, end, types, patient_id, include_recommendations)
+    chart = None
+    if include_charts and report_format == "xlsx":
+        chart = daily_risk_table(history, start, end, types, patient_id)
+    WRITERS[report_format](out, columns, rows, chart)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export assessments from the history store as a report")
+    parser.add_argument('output', help="Report file; the format follows the extension (.csv, .jsonl or .xlsx)")
+    parser.add_argument('--type', choices=REPORT_TYPES, default='detailed')
+    parser.add_argument('--from', dest='start', type=datetime.date.fromisoformat, default=datetime.date(2024, 1, 1))
+    parser.add_argument('--to', dest='end', type=datetime.date.fromisoformat, default=datetime.date.today())
+    parser.add_argument('--types', nargs='+', help="Assessment types to include (default: all)")
+    parser.add_argument('--patient', help="Only this patient's assessments")
+    parser.add_argument('--charts', action='store_true', help="Add the daily risk sheet and chart (XLSX only)")
+    parser.add_argument('--recommendations', action='store_true', help="Add a recommendation column")
+    args = parser.parse_args(argv)
+
+    report_format = os.path.splitext(args.output)[1].lstrip('.').lower()
+    if report_format not in WRITERS:
+        logger.error(f"Unsupported report format '{report_format}', use one of: {', '.join(WRITERS)}")
+        return 1
+    try:
+        with open(args.output, 'wb') as out:
+            write_report(out, report_format, args.type, args.start, args.end, args.types, args.patient,
+                         args.charts, args.recommendations)
+    except (OSError, ValueError) as e:
+        logger.error(f"Report failed: {str(e)}")
+        return 1
+    logger.info(f"Wrote {args.type} report to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""Screen one patient against every disease model at once.
+
+Usage: python -m src.screening PATIENT.json [--only diabetes heart_disease]
+
+A patient record is one flat object. Keys can be the feature names of the
+models (or the dataset column names ``src.batch_scoring`` accepts), and the
+fields that mean the same thing to several models can be given once under a
+shared name, see SHARED_FIELDS: ``{"age": 54, "bmi": 31.2, "glucose": 148, ...}``.
+Model feature names win over shared names when both are present.
+
+Each model gets its own feature vector built from the record, and the four
+predictions run concurrently on a thread pool, so with free cores a screening
+approaches the slowest model rather than the sum (the neighbor queries and
+NumPy kernels release the GIL; the per-row Python around them does not, see
+benchmarks/screening.py). Models come from the process-wide registry. A model whose features
+the record does not cover is reported as ``incomplete`` with the missing
+features instead of failing the screening.
+"""
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from .batch_scoring import DISEASES, reference_ids
+from .features import RECORD_PREPARERS, to_number
+from .models.registry import registry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Shared field name -> the feature it feeds in each model that uses it. Only fields
+# measured the same way are shared: the diabetes BloodPressure is diastolic and the
+# heart trestbps a resting systolic pressure, so they stay separate.
+SHARED_FIELDS = {
+    'age': {'diabetes': 'Age', 'heart_disease': 'age'},
+    'sex': {'heart_disease': 'sex'},
+    'pregnancies': {'diabetes': 'Pregnancies'},
+    'glucose': {'diabetes': 'Glucose'},
+    'diastolic_bp': {'diabetes': 'BloodPressure'},
+    'skin_thickness': {'diabetes': 'SkinThickness'},
+    'insulin': {'diabetes': 'Insulin'},
+    'bmi': {'diabetes': 'BMI'},
+    'diabetes_pedigree': {'diabetes': 'DiabetesPedigreeFunction'},
+    'chest_pain_type': {'heart_disease': 'cp'},
+    'resting_bp': {'heart_disease': 'trestbps'},
+    'cholesterol': {'heart_disease': 'chol'},
+    'fasting_blood_sugar': {'heart_disease': 'fbs'},
+    'resting_ecg': {'heart_disease': 'restecg'},
+    'max_heart_rate': {'heart_disease': 'thalach'},
+    'exercise_angina': {'heart_disease': 'exang'},
+    'st_depression': {'heart_disease': 'oldpeak'},
+    'st_slope': {'heart_disease': 'slope'},
+    'major_vessels': {'heart_disease': 'ca'},
+    'thalassemia': {'heart_disease': 'thal'}
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """The screening thread pool, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # One worker per model: a screening never queues behind itself
+            _executor = ThreadPoolExecutor(max_workers=len(DISEASES), thread_name_prefix='screening')
+        return _executor
+
+def shared_key(name):
+    """Normalized spelling of a record key: lower case, words joined by underscores"""
+    return '_'.join(str(name).strip().lower().replace('-', ' ').split())
+
+def model_record(disease, record):
+    """The record with the shared fields renamed to the feature names of ``disease``"""
+    features = {}
+    for name, value in record.items():
+        target = SHARED_FIELDS.get(shared_key(name), {}).get(disease)
+        if target is not None:
+            features.setdefault(target, value)
+    # Exact feature (or dataset column) names override shared fields
+    features.update(record)
+    return features
+
+def feature_row(disease, model, record):
+    """(raw feature vector or None, missing feature names) for one model"""
+    prepare = RECORD_PREPARERS.get(disease)
+    features = model_record(disease, record)
+    # The dataset preprocessing (renamed columns, derived features) only runs when the record needs it
+    if prepare is not None and any(feature not in features for feature in model.feature_names):
+        features = prepare(features)
+    missing = [feature for feature in model.feature_names if feature not in features]
+    if missing:
+        return None, missing
+    return np.array([[to_number(features[feature]) for feature in model.feature_names]]), []
+
+def screen_one(disease, record):
+    """Result of one model for the record, with the time it took"""
+    start = time.perf_counter()
+    model_cls, _ = DISEASES[disease]
+    try:
+        model = registry.get(model_cls)
+        row, missing = feature_row(disease, model, record)
+        if missing:
+            result = {'status': 'incomplete', 'missing': missing}
+        elif not model.valid_rows(row)[0]:
+            result = {'status': 'invalid', 'error': "Feature values are missing, non-numeric or outside the expected ranges"}
+        else:
+            predictions, probabilities, indices, distances, risk_factors = model.predict_batch(
+                row, return_risk_factors=True
+            )
+            result = {
+                'status': 'ok',
+                'prediction': int(predictions[0]),
+                'probability': float(probabilities[0]),
+                'neighbors': [int(i) for i in reference_ids(model)[indices[0]]],
+                'distances': [float(d) for d in distances[0]],
+                'risk_factors': risk_factors[0]
+            }
+    except Exception as e:
+        logger.error(f"{disease}: screening failed: {str(e)}")
+        result = {'status': 'error', 'error': str(e)}
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+def screen(record, diseases=None):
+    """Run every model (or ``diseases``) on one patient record concurrently.
+
+    Returns {'results': {disease: result}, 'seconds': wall time}, where each result has a
+    status ('ok', 'incomplete', 'invalid' or 'error') and the seconds that model took.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("A patient record must be an object of field name to value")
+    diseases = diseases or list(DISEASES)
+    unknown = [disease for disease in diseases if disease not in DISEASES]
+    if unknown:
+        raise ValueError(f"Unknown diseases: {', '.join(unknown)}")
+
+    start = time.perf_counter()
+    executor = get_executor()
+    futures = {disease: executor.submit(screen_one, disease, record) for disease in diseases}
+    results = {disease: future.result() for disease, future in futures.items()}
+    return {'results': results, 'seconds': time.perf_counter() - start}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Screen one patient record against every disease model")
+    parser.add_argument('record', help="JSON file holding one patient record ('-' for stdin)")
+    parser.add_argument('--only', nargs='+', choices=sorted(DISEASES), help="Models to run (default: all)")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.record == '-':
+            record = json.load(sys.stdin)
+        else:
+            with open(args.record) as f:
+                record = json.load(f)
+        screening = screen(record, args.only)
+    except (OSError, ValueError) as e:
+        logger.error(f"Screening failed: {str(e)}")
+        return 1
+
+    print(json.dumps(screening, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
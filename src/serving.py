@@ -0,0 +1,366 @@
+"""Local HTTP inference server with dynamic micro-batching.
+
+Usage: python -m src.serving [--port 8000] [--max-batch-size 64] [--max-wait-ms 5]
+                             [--stage-metrics] [--stage-log stages.jsonl] [--runtime numpy]
+
+Every model is loaded once at startup. Concurrent single-patient requests for
+the same model are queued and collected into micro-batches of at most
+``--max-batch-size`` rows, waiting at most ``--max-wait-ms`` after the first
+request of a batch. Each batch is scored with one predict_batch call (one
+vectorized neighbor query) and the results are fanned back to the callers.
+
+With ``--runtime numpy`` the models are scored from the bundles written by
+``python -m src.models.runtime`` instead of the pickles: same responses, but the
+server then imports neither scikit-learn nor pandas, so it starts in a fraction
+of the time and memory.
+
+Endpoints:
+    POST /predict/<disease>   body {"features": {name: value, ...}} or the features object itself
+    GET  /health              loaded models
+    GET  /stats               request, batch and latency counters per model
+    GET  /metrics             per-model, per-stage latency histograms in the Prometheus
+                              text format (with --stage-metrics)
+
+The server binds to 127.0.0.1 by default and speaks plain HTTP/1.1 with
+keep-alive; put it behind a reverse proxy before exposing it further.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from .config import DISEASE_MODEL_PATHS
+from .features import RECORD_PREPARERS, to_number
+from .models.instrumentation import HistogramSink, JsonLinesSink, instrumentation
+from .models.runtime import bundle_path_for, load_bundle
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 1024 * 1024
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 422: 'Unprocessable Entity', 500: 'Internal Server Error'}
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class MicroBatcher:
+    """Queue single-row requests for one model and score them in micro-batches"""
+
+    def __init__(self, disease, model, executor, reference_ids, max_batch_size=64, max_wait=0.005):
+        self.disease = disease
+        self.model = model
+        self.prepare = RECORD_PREPARERS.get(disease)
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue()
+        self.reference_ids = reference_ids
+        self.stats = {'requests': 0, 'batches': 0, 'rows': 0, 'max_batch': 0, 'batch_seconds': 0.0}
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    def to_row(self, features):
+        """Raw feature vector for one patient; raises RequestError for unusable input"""
+        if not isinstance(features, dict):
+            raise RequestError(400, "features must be a JSON object of feature name to value")
+        if self.prepare is not None:
+            features = self.prepare(features)
+        missing = [feature for feature in self.model.feature_names if feature not in features]
+        if missing:
+            raise RequestError(422, f"Missing features: {', '.join(missing)}")
+        row = np.array([[to_number(features[feature]) for feature in self.model.feature_names]])
+        if not self.model.valid_rows(row)[0]:
+            raise RequestError(422, "Feature values are missing, non-numeric or outside the expected ranges")
+        return row[0]
+
+    async def submit(self, features):
+        row = self.to_row(features)
+        future = asyncio.get_running_loop().create_future()
+        self.stats['requests'] += 1
+        await self.queue.put((row, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already queued before waiting on the clock
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Callers that gave up while queued need no answer
+            batch = [(row, future) for row, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            X = np.vstack([row for row, _ in batch])
+            start = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self.executor, self._score, X)
+            except Exception as e:
+                logger.error(f"{self.disease}: batch of {len(batch)} failed: {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(RequestError(500, "Prediction failed"))
+                continue
+
+            self.stats['batches'] += 1
+            self.stats['rows'] += len(batch)
+            self.stats['max_batch'] = max(self.stats['max_batch'], len(batch))
+            self.stats['batch_seconds'] += time.perf_counter() - start
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _score(self, X):
+        predictions, probabilities, indices, distances, risk_factors = self.model.predict_batch(
+            X, return_risk_factors=True
+        )
+        return [
+            {
+                'disease': self.disease,
+                'prediction': int(predictions[row]),
+                'probability': float(probabilities[row]),
+                'neighbors': [int(i) for i in self.reference_ids[indices[row]]],
+                'distances': [float(d) for d in distances[row]],
+                'risk_factors': risk_factors[row]
+            }
+            for row in range(len(X))
+        ]
+
+class InferenceServer:
+    def __init__(self, diseases=None, max_batch_size=64, max_wait=0.005, stage_metrics=None, runtime='model'):
+        self.diseases = diseases or list(DISEASE_MODEL_PATHS)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        # 'model' scores with the trained models, 'numpy' with their runtime bundles
+        self.runtime = runtime
+        # HistogramSink behind /metrics, when stage instrumentation is enabled
+        self.stage_metrics = stage_metrics
+        self.executor = ThreadPoolExecutor(max_workers=len(self.diseases), thread_name_prefix='inference')
+        self.batchers = {}
+        self.server = None
+
+    def load_model(self, disease):
+        """(model, reference ids) for ``disease``, or None when it has not been trained or exported"""
+        if self.runtime == 'numpy':
+            path = bundle_path_for(DISEASE_MODEL_PATHS[disease])
+            if not os.path.exists(path):
+                logger.warning(f"Skipping {disease}: no runtime bundle, run python -m src.models.runtime first")
+                return None
+            model = load_bundle(path)
+            return model, model.reference_ids
+
+        # Only the trained models need scikit-learn and pandas
+        from .batch_scoring import DISEASES, reference_ids
+        model_cls, _ = DISEASES[disease]
+        if not os.path.exists(model_cls().stored_model_path()):
+            logger.warning(f"Skipping {disease}: no trained model, run train_models.py first")
+            return None
+        model = model_cls.load_model()
+        return model, reference_ids(model)
+
+    def load_models(self):
+        for disease in self.diseases:
+            start = time.perf_counter()
+            loaded = self.load_model(disease)
+            if loaded is None:
+                continue
+            model, ids = loaded
+            logger.info(f"Loaded {disease} ({self.runtime} runtime) in {(time.perf_counter() - start) * 1000:.1f} ms")
+            self.batchers[disease] = MicroBatcher(
+                disease, model, self.executor, ids, self.max_batch_size, self.max_wait
+            )
+        if not self.batchers:
+            raise RuntimeError("No models found, run train_models.py (and python -m src.models.runtime) first")
+
+    async def start(self, host='127.0.0.1', port=8000):
+        self.load_models()
+        for batcher in self.batchers.values():
+            batcher.start()
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        return self.server
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for batcher in self.batchers.values():
+            await batcher.stop()
+        self.executor.shutdown(wait=False)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await self.read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                try:
+                    status, payload = await self.route(method, path, body)
+                except RequestError as e:
+                    status, payload = e.status, {'error': str(e)}
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                self.write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except RequestError as e:
+            self.write_response(writer, e.status, {'error': str(e)}, False)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, path, _ = request_line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            raise RequestError(400, "Malformed request line")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length', 0) or 0)
+        except ValueError:
+            raise RequestError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise RequestError(413, f"Request body exceeds {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b''
+        return method, path.split('?', 1)[0], headers, body
+
+    async def route(self, method, path, body):
+        if path == '/health':
+            return 200, {'status': 'ok', 'models': sorted(self.batchers)}
+        if path == '/stats':
+            return 200, self.stats()
+        if path == '/metrics':
+            if self.stage_metrics is None:
+                raise RequestError(404, "Stage metrics are disabled, start the server with --stage-metrics")
+            return 200, self.stage_metrics.prometheus_text()
+        if path.startswith('/predict/'):
+            if method != 'POST':
+                raise RequestError(405, "Use POST for predictions")
+            disease = path[len('/predict/'):]
+            if disease not in self.batchers:
+                raise RequestError(404, f"Unknown or unloaded model '{disease}'")
+            try:
+                payload = json.loads(body or b'{}')
+            except ValueError:
+                raise RequestError(400, "Body is not valid JSON")
+            features = payload.get('features', payload) if isinstance(payload, dict) else payload
+            return 200, await self.batchers[disease].submit(features)
+        raise RequestError(404, f"No route for {path}")
+
+    def stats(self):
+        stats = {}
+        for disease, batcher in self.batchers.items():
+            entry = dict(batcher.stats)
+            entry['mean_batch'] = entry['rows'] / entry['batches'] if entry['batches'] else 0.0
+            entry['queued'] = batcher.queue.qsize()
+            stats[disease] = entry
+        return stats
+
+    @staticmethod
+    def write_response(writer, status, payload, keep_alive=True):
+        # Text payloads are Prometheus exposition, everything else is JSON
+        if isinstance(payload, str):
+            body, content_type = payload.encode('utf-8'), 'text/plain; version=0.0.4'
+        else:
+            body, content_type = json.dumps(payload).encode('utf-8'), 'application/json'
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+
+async def serve(host, port, diseases=None, max_batch_size=64, max_wait=0.005, stage_metrics=None, runtime='model'):
+    server = InferenceServer(diseases, max_batch_size, max_wait, stage_metrics, runtime)
+    await server.start(host, port)
+    logger.info(
+        f"Serving {', '.join(sorted(server.batchers))} on http://{host}:{port} "
+        f"(max batch {max_batch_size}, max wait {max_wait * 1000:.1f} ms, {runtime} runtime)"
+    )
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the disease models over local HTTP with micro-batching")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--only', nargs='+', choices=sorted(DISEASE_MODEL_PATHS), help="Models to serve (default: all)")
+    parser.add_argument('--max-batch-size', type=int, default=64, help="Most requests scored together")
+    parser.add_argument('--max-wait-ms', type=float, default=5.0, help="Longest wait to fill a batch")
+    parser.add_argument('--stage-metrics', action='store_true', help="Time predict stages and serve them at /metrics")
+    parser.add_argument('--stage-log', help="Also append every stage timing to this JSON lines file")
+    parser.add_argument('--runtime', choices=['model', 'numpy'], default='model',
+                        help="Score with the trained models or with their NumPy runtime bundles")
+    args = parser.parse_args(argv)
+
+    if args.max_batch_size < 1:
+        parser.error("--max-batch-size must be positive")
+    stage_metrics = HistogramSink() if args.stage_metrics else None
+    if stage_metrics is not None:
+        instrumentation.enable(stage_metrics)
+    if args.stage_log:
+        instrumentation.enable(JsonLinesSink(args.stage_log))
+    try:
+        asyncio.run(serve(
+            args.host, args.port, args.only, args.max_batch_size, args.max_wait_ms / 1000, stage_metrics,
+            args.runtime
+        ))
+    except RuntimeError as e:
+        logger.error(str(e))
+        return 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        instrumentation.disable()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+"""Cross-validated search over the kNN model settings.
+
+Usage: python -m src.tuning DISEASE [--k 3 5 7 9 11] [--metrics euclidean manhattan]
+                                    [--thresholds 0.4 0.5 0.6] [--weight-samples 2]
+                                    [--random N] [--folds 5] [--workers N] [--top 20] [--json out.json]
+
+Searches n_neighbors, the distance metric, the feature_weights and the
+high_risk_threshold of one model (Parkinson's has a fixed 0.5 cut-off, so
+thresholds are not searched for it). Candidates are scored exactly the way
+the model predicts, through its own predict_batch, on stratified folds of the
+training dataset. The folds are drawn once and every candidate is scored on
+the same folds, so candidates are compared pair-wise rather than through
+resampling noise.
+
+The weight variants are the model's own weights, uniform weights and
+``--weight-samples`` random perturbations of the model's weights. Candidates
+sharing a metric and weight variant share one neighbor graph per fold,
+computed once for the largest k: smaller k are prefixes of it, and thresholds
+only re-cut the same probabilities. Those groups run on a process pool. Each
+configuration also gets its single-row predict latency, measured with the
+model's own index engine on a real index.
+
+``--random N`` scores N random configurations of the grid instead of all of it.
+The output is a table ranked by mean accuracy (ties by latency); the model's
+current configuration is marked with ``*``.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import StratifiedKFold
+from .config import RANDOM_STATE
+from .data_preprocessing import load_and_preprocess_data
+from .model import BreastCancerModel
+from .models.diabetes import DiabetesModel
+from .models.heart_disease import HeartDiseaseModel
+from .models.neighbors import make_index
+from .models.parkinsons import ParkinsonsModel
+from .preprocessing.diabetes import load_and_preprocess_diabetes_data
+from .preprocessing.heart_disease import load_and_preprocess_heart_data
+from .preprocessing.parkinsons import load_and_preprocess_parkinsons_data
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Model class and the dataset loader train_models.py trains it on
+SEARCHES = {
+    'breast_cancer': (BreastCancerModel, load_and_preprocess_data),
+    'diabetes': (DiabetesModel, load_and_preprocess_diabetes_data),
+    'heart_disease': (HeartDiseaseModel, load_and_preprocess_heart_data),
+    'parkinsons': (ParkinsonsModel, load_and_preprocess_parkinsons_data)
+}
+
+DEFAULT_K = [3, 5, 7, 9, 11, 15]
+DEFAULT_METRICS = ['euclidean', 'manhattan']
+DEFAULT_THRESHOLDS = [0.4, 0.5, 0.6]
+
+class PrecomputedIndex:
+    """Index stand-in answering a query from a neighbor graph computed for a larger k"""
+
+    def __init__(self, distances, indices):
+        self.distances = distances
+        self.indices = indices
+
+    def query(self, X, k):
+        if len(X) != len(self.indices) or k > self.indices.shape[1]:
+            raise ValueError("The precomputed neighbor graph does not cover this query")
+        return self.distances[:, :k], self.indices[:, :k]
+
+def stratified_folds(y, n_splits, seed=RANDOM_STATE):
+    """(train positions, test positions) per fold, drawn once for the whole search"""
+    splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=seed)
+    return list(splitter.split(np.zeros(len(y)), y))
+
+def weight_variants(model_cls, samples, seed=RANDOM_STATE):
+    """{name: feature_weights}: the model's weights, uniform weights and random perturbations"""
+    model = model_cls()
+    variants = {'model': dict(model.feature_weights)}
+    if any(weight != 1.0 for weight in model.feature_weights.values()):
+        variants['uniform'] = {}
+    rng = np.random.default_rng(seed)
+    for sample in range(samples):
+        # Every feature's weight scaled by a factor between 1/2 and 2, rounded to 0.1
+        variants[f'sample-{sample + 1}'] = {
+            feature: round(model.feature_weights.get(feature, 1.0) * 2 ** rng.uniform(-1, 1), 1)
+            for feature in model.feature_names
+        }
+    return variants
+
+def candidate_grid(ks, metrics, weights, thresholds, random_samples=None, seed=RANDOM_STATE):
+    """Configurations to score: the full grid, or ``random_samples`` distinct random picks from it"""
+    grid = [
+        {'k': k, 'metric': metric, 'weights': name, 'threshold': threshold}
+        for metric in metrics for name in weights for k in ks for threshold in thresholds
+    ]
+    if random_samples is None or random_samples >= len(grid):
+        return grid
+    rng = np.random.default_rng(seed)
+    return [grid[position] for position in sorted(rng.choice(len(grid), random_samples, replace=False))]
+
+def configured_model(model_cls, scaler, metric, feature_weights, k, threshold=None):
+    model = model_cls()
+    model.scaler = scaler
+    model.feature_weights = feature_weights
+    model.model.set_params(n_neighbors=k, metric=metric)
+    if threshold is not None:
+        model.high_risk_threshold = threshold
+    return model
+
+def use_reference(model, X_scaled, y, positions):
+    """Make the (scaled) rows at positions the model's weighted reference set"""
+    model.prepare_transform()
+    weights = np.array([model.feature_weights.get(feature, 1.0) for feature in model.feature_names])
+    model.X_train = pd.DataFrame(X_scaled[positions] * weights, columns=model.feature_names)
+    model.y_train = pd.Series(y[positions])
+
+# Dataset and folds of the search, set once per worker process by init_worker
+_search = {}
+
+def init_worker(disease, X_scaled, X_raw, y, scaler, folds):
+    _search.update(disease=disease, X_scaled=X_scaled, X_raw=X_raw, y=y, scaler=scaler, folds=folds)
+
+def evaluate_group(metric, feature_weights, candidates, latency_rows):
+    """Score the candidates that share metric and weights: one neighbor graph per fold for the largest k"""
+    model_cls, _ = SEARCHES[_search['disease']]
+    X_scaled, X_raw, y, scaler = _search['X_scaled'], _search['X_raw'], _search['y'], _search['scaler']
+    k_max = max(candidate['k'] for candidate in candidates)
+
+    accuracies = {id(candidate): [] for candidate in candidates}
+    for train, test in _search['folds']:
+        model = configured_model(model_cls, scaler, metric, feature_weights, k_max)
+        use_reference(model, X_scaled, y, train)
+        graph = make_index('brute', metric).fit(model.reference_matrix())
+        distances, indices = graph.query(model.transform_inputs(X_raw[test]), k_max)
+        for candidate in candidates:
+            model.model.set_params(n_neighbors=candidate['k'])
+            if candidate['threshold'] is not None:
+                model.high_risk_threshold = candidate['threshold']
+            model.index = PrecomputedIndex(distances, indices)
+            predictions = model.predict_batch(X_raw[test])[0]
+            accuracies[id(candidate)].append(float((predictions == y[test]).mean()))
+
+    # Single-row latency on a real index of the model's engine, once per k
+    latencies = {}
+    train, test = _search['folds'][0]
+    rows = X_raw[test[:latency_rows]]
+    for k in sorted({candidate['k'] for candidate in candidates}):
+        model = configured_model(model_cls, scaler, metric, feature_weights, k)
+        use_reference(model, X_scaled, y, train)
+        model.build_index()
+        model.predict_batch(rows[:1])
+        start = time.perf_counter()
+        for row in rows:
+            model.predict_batch(row[None, :])
+        latencies[k] = (time.perf_counter() - start) / len(rows)
+
+    return [
+        dict(
+            candidate,
+            accuracy=float(np.mean(accuracies[id(candidate)])),
+            accuracy_std=float(np.std(accuracies[id(candidate)])),
+            latency_ms=latencies[candidate['k']] * 1000
+        )
+        for candidate in candidates
+    ]
+
+def current_configuration(model_cls):
+    model = model_cls()
+    params = model.model.get_params()
+    return {
+        'k': params['n_neighbors'],
+        'metric': 'manhattan' if params['metric'] == 'minkowski' and params['p'] == 1 else
+                  'euclidean' if params['metric'] == 'minkowski' else params['metric'],
+        'weights': 'model',
+        'threshold': getattr(model, 'high_risk_threshold', None)
+    }
+
+def search(disease, ks=None, metrics=None, thresholds=None, weight_samples=0, random_samples=None,
+           n_folds=5, max_workers=None, latency_rows=50):
+    """Score the candidate configurations of one model; return them ranked, best first"""
+    model_cls, loader = SEARCHES[disease]
+    model = model_cls()
+    X, y, scaler = loader()
+    X_scaled = X[model.feature_names].to_numpy(dtype=np.float64)
+    X_raw = scaler.inverse_transform(X_scaled) if scaler is not None else X_scaled
+    y = np.asarray(y)
+
+    current = current_configuration(model_cls)
+    ks = sorted(set(ks or DEFAULT_K) | {current['k']})
+    metrics = list(dict.fromkeys(metrics or DEFAULT_METRICS))
+    if current['threshold'] is None:
+        thresholds = [None]
+    else:
+        thresholds = sorted(set(thresholds or DEFAULT_THRESHOLDS) | {current['threshold']})
+    weights = weight_variants(model_cls, weight_samples)
+    candidates = candidate_grid(ks, metrics, weights, thresholds, random_samples)
+    folds = stratified_folds(y, n_folds)
+
+    groups = {}
+    for candidate in candidates:
+        groups.setdefault((candidate['metric'], candidate['weights']), []).append(candidate)
+    max_workers = max_workers or min(len(groups), os.cpu_count() or 1)
+    logger.info(
+        f"{disease}: {len(candidates)} configurations in {len(groups)} neighbor-graph groups, "
+        f"{n_folds} folds, {max_workers} workers"
+    )
+
+    results = []
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=init_worker,
+        initargs=(disease, X_scaled, X_raw, y, scaler, folds)
+    ) as pool:
+        futures = {
+            pool.submit(evaluate_group, metric, weights[name], group, latency_rows): (metric, name)
+            for (metric, name), group in groups.items()
+        }
+        for future in as_completed(futures):
+            results.extend(future.result())
+
+    for result in results:
+        result['current'] = all(result[key] == current[key] for key in ('k', 'metric', 'weights', 'threshold'))
+    results.sort(key=lambda result: (-result['accuracy'], result['latency_ms']))
+    for rank, result in enumerate(results, 1):
+        result['rank'] = rank
+    return results, weights
+
+def print_table(results, top=None):
+    print(f"{'rank':>5}  {'k':>3}  {'metric':<10}{'weights':<10}{'threshold':>10}{'accuracy':>10}{'std':>8}{'latency ms':>12}")
+    for result in results[:top]:
+        threshold = '-' if result['threshold'] is None else f"{result['threshold']:g}"
+        print(
+            f"{result['rank']:>5}{'*' if result['current'] else ' ':<2}{result['k']:>3}  {result['metric']:<10}"
+            f"{result['weights']:<10}{threshold:>10}{result['accuracy']:>10.4f}{result['accuracy_std']:>8.4f}"
+            f"{result['latency_ms']:>12.3f}"
+        )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cross-validated search over the kNN model settings")
+    parser.add_argument('disease', choices=sorted(SEARCHES))
+    parser.add_argument('--k', nargs='+', type=int, help=f"n_neighbors values (default: {DEFAULT_K})")
+    parser.add_argument('--metrics', nargs='+', choices=['euclidean', 'manhattan'], help="Distance metrics (default: both)")
+    parser.add_argument('--thresholds', nargs='+', type=float, help=f"high_risk_threshold values (default: {DEFAULT_THRESHOLDS})")
+    parser.add_argument('--weight-samples', type=int, default=2, help="Random perturbations of the model's feature weights")
+    parser.add_argument('--random', type=int, help="Score this many random configurations instead of the full grid")
+    parser.add_argument('--folds', type=int, default=5, help="Stratified cross-validation folds")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: one per group, capped at CPU count)")
+    parser.add_argument('--latency-rows', type=int, default=50, help="Single-row predictions timed per configuration")
+    parser.add_argument('--top', type=int, default=20, help="Rows of the ranked table to print")
+    parser.add_argument('--json', dest='json_path', help="Also write every scored configuration to this JSON file")
+    args = parser.parse_args(argv)
+
+    if args.folds < 2:
+        parser.error("--folds must be at least 2")
+    if any(k < 1 for k in args.k or []):
+        parser.error("--k values must be positive")
+
+    start = time.perf_counter()
+    try:
+        results, weights = search(
+            args.disease, args.k, args.metrics, args.thresholds, args.weight_samples, args.random,
+            args.folds, args.workers, args.latency_rows
+        )
+    except (OSError, ValueError) as e:
+        logger.error(f"Search failed: {str(e)}")
+        return 1
+
+    print_table(results, args.top)
+    print(f"{len(results)} configurations scored in {time.perf_counter() - start:.1f}s")
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({'disease': args.disease, 'weights': weights, 'results': results}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
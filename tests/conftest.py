@@ -0,0 +1,61 @@
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# src.config reads MODEL_DIR on import: point it at a scratch copy of the trained models first,
+# so tests that save artifacts or add cases never write next to models/
+MODEL_DIR = tempfile.mkdtemp(prefix='test-models-')
+for path in (ROOT / 'models').glob('*.pkl'):
+    shutil.copy(path, MODEL_DIR)
+os.environ['MODEL_DIR'] = MODEL_DIR
+
+from src.model import BreastCancerModel
+from src.models.diabetes import DiabetesModel
+from src.models.heart_disease import HeartDiseaseModel
+from src.models.parkinsons import ParkinsonsModel
+
+KNN_MODELS = [BreastCancerModel, DiabetesModel, HeartDiseaseModel, ParkinsonsModel]
+
+def pytest_configure(config):
+    # The committed pickles were written by an older scikit-learn
+    config.addinivalue_line('filterwarnings', 'ignore::sklearn.exceptions.InconsistentVersionWarning')
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(MODEL_DIR, ignore_errors=True)
+
+@pytest.fixture(params=KNN_MODELS, ids=lambda model_cls: model_cls.__name__)
+def model_cls(request):
+    if not os.path.exists(request.param().model_path):
+        pytest.skip(f"{request.param.__name__} is not trained, run train_models.py first")
+    return request.param
+
+@pytest.fixture(autouse=True)
+def scratch_model_dir():
+    """Remove what a test wrote next to the models (artifacts, added-case logs, case stores)"""
+    yield
+    for name in os.listdir(MODEL_DIR):
+        if not name.endswith('.pkl'):
+            os.remove(os.path.join(MODEL_DIR, name))
+
+def raw_rows(model, count=200, noise=0.02, seed=0):
+    """Raw inputs near the model's reference cases: the unscaled records, perturbed, in range"""
+    records = model.case_store().lookup(np.arange(min(count, len(model.X_train))))
+    X = records[model.feature_names].to_numpy(dtype=np.float64)
+    X = X * (1 + np.random.default_rng(seed).normal(0, noise, X.shape))
+    return X[model.valid_rows(X)]
+
+def assert_same_predictions(model, other, X_raw):
+    """Both models score X_raw identically: predictions, probabilities, neighbors, distances and risk factors"""
+    expected = model.predict_batch(X_raw, return_risk_factors=True)
+    actual = other.predict_batch(X_raw, return_risk_factors=True)
+    for expected_part, actual_part in zip(expected[:4], actual[:4]):
+        np.testing.assert_array_equal(actual_part, expected_part)
+    assert actual[4] == expected[4]
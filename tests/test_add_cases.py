@@ -0,0 +1,36 @@
+import os
+
+import numpy as np
+import pytest
+
+from conftest import assert_same_predictions, raw_rows
+from src.models.breast_cancer import BreastCancerModel as LogisticBreastCancerModel
+
+def test_added_cases_are_replayed_on_load(model_cls):
+    model = model_cls.load_model()
+    model.save_model()
+    model = model_cls.load_model()
+    reference_size = len(model.X_train)
+
+    new_cases = raw_rows(model, count=12, seed=1)
+    labels = np.arange(len(new_cases)) % 2
+    assert model.add_cases(new_cases, labels) == len(new_cases)
+
+    replayed = model_cls.load_model()
+    assert len(replayed.X_train) == reference_size + len(new_cases)
+    np.testing.assert_array_equal(np.asarray(replayed.y_train)[reference_size:], labels)
+    np.testing.assert_array_equal(replayed.X_train.index, model.X_train.index)
+    assert_same_predictions(model, replayed, raw_rows(model, seed=2))
+
+    # Saving folds the added cases into the artifact and clears the log
+    replayed.save_model()
+    assert not os.path.exists(replayed.delta_path)
+    folded = model_cls.load_model()
+    assert len(folded.X_train) == reference_size + len(new_cases)
+    assert_same_predictions(model, folded, raw_rows(model, seed=2))
+
+def test_models_without_reference_set_refuse_cases():
+    model = LogisticBreastCancerModel()
+    assert not model.instance_based
+    with pytest.raises(TypeError, match="no reference set"):
+        model.add_cases(np.zeros((1, 30)), [0])
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import assert_same_predictions, raw_rows
+from src.models.layout import read_artifact, write_artifact
+
+def test_artifact_round_trip(model_cls):
+    model = model_cls.load_model()
+    model.save_model()
+    assert model_cls().stored_model_path() == model.artifact_path
+
+    loaded = model_cls.load_model()
+    pd.testing.assert_frame_equal(loaded.X_train, model.X_train, check_index_type=False, check_column_type=False)
+    np.testing.assert_array_equal(np.asarray(loaded.y_train), np.asarray(model.y_train))
+    np.testing.assert_array_equal(loaded.input_coef, model.input_coef)
+    np.testing.assert_array_equal(loaded.input_offset, model.input_offset)
+    assert_same_predictions(model, loaded, raw_rows(model))
+
+@pytest.mark.parametrize('engine', ['kd_tree', 'ball_tree'])
+def test_saved_tree_is_restored(model_cls, engine):
+    model = model_cls.load_model()
+    model.index_engine = engine
+    model.build_index()
+    model.save_model()
+
+    loaded = model_cls.load_model()
+    assert loaded.index_engine == engine
+    assert_same_predictions(model, loaded, raw_rows(model))
+
+def test_arrays_read_back_for_any_header_length(tmp_path):
+    path = str(tmp_path / 'layout.mmap')
+    arrays = {'a': np.arange(13, dtype=np.float64), 'b': np.arange(820, dtype=np.int64)}
+    # Header lengths around the alignment boundaries, where the array offsets change
+    for padding in range(200):
+        write_artifact(path, {'padding': 'x' * padding}, arrays)
+        header, read = read_artifact(path, mmap=False)
+        assert header['padding'] == 'x' * padding
+        for name, array in arrays.items():
+            np.testing.assert_array_equal(read[name], array)
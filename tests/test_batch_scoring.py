@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.batch_scoring import prepare_diabetes, reference_ids, score_chunk
+from src.models.diabetes import DiabetesModel
+from src.models.runtime import export_bundle, load_bundle
+from src.preprocessing.diabetes import DATA_PATH
+from src.serving import MicroBatcher
+
+@pytest.fixture(scope='module')
+def diabetes():
+    return DiabetesModel.load_model(), pd.read_csv(DATA_PATH, nrows=200)
+
+def test_missing_measurements_are_filled_as_in_training(diabetes):
+    model, records = diabetes
+    assert (records[['Glucose', 'BMI', 'Insulin']] == 0).any().all()
+
+    # Rows of the reference set must find themselves: same fill, same derived features
+    X_raw = model.raw_matrix(prepare_diabetes(records))
+    in_reference = records.index.isin(model.X_train.index)
+    distances, _ = model.kneighbors(model.transform_inputs(X_raw[in_reference]))
+    np.testing.assert_allclose(distances[:, 0], 0, atol=1e-9)
+
+def test_server_and_runtime_match_batch_scoring(diabetes, tmp_path):
+    model, records = diabetes
+    scored = score_chunk(model, records, prepare_diabetes)
+    assert (scored['status'] == 'ok').all()
+
+    batcher = MicroBatcher('diabetes', model, None, reference_ids(model))
+    X = np.vstack([batcher.to_row(record) for record in records.to_dict('records')])
+    served = batcher._score(X)
+    np.testing.assert_array_equal([result['prediction'] for result in served], scored['prediction'])
+    np.testing.assert_array_equal([result['probability'] for result in served], scored['probability'])
+    np.testing.assert_array_equal(
+        [result['neighbors'] for result in served], scored.filter(like='neighbor_').to_numpy()
+    )
+
+    runtime = load_bundle(export_bundle(model, str(tmp_path / 'diabetes.bundle')))
+    predictions, probabilities = runtime.predict_batch(X)[:2]
+    np.testing.assert_array_equal(predictions, scored['prediction'])
+    np.testing.assert_array_equal(probabilities, scored['probability'])
@@ -0,0 +1,28 @@
+import numpy as np
+
+from conftest import raw_rows
+
+def test_predict_leaves_the_case_store_closed(model_cls):
+    X_raw = raw_rows(model_cls.load_model(), count=5)
+    model = model_cls.load_model()
+
+    _, _, neighbors, outcomes, _ = model.predict(X_raw[:1])
+    assert model.cases is None
+    np.testing.assert_array_equal(outcomes, np.asarray(model.y_train)[neighbors])
+
+    similar_cases = model.similar_cases(neighbors)
+    assert model.cases is not None
+    np.testing.assert_array_equal(similar_cases.index, np.asarray(model.X_train.index)[neighbors])
+
+def test_similar_cases_are_in_input_units(model_cls):
+    model = model_cls.load_model()
+    model.save_model()
+    model = model_cls.load_model()
+    X_raw = raw_rows(model, count=50, noise=0)
+
+    # Each reference case is its own nearest neighbor (or one of its duplicates)
+    model.cases = None
+    _, _, indices, distances = model.predict_batch(X_raw)
+    np.testing.assert_allclose(distances[:, 0], 0, atol=1e-9)
+    records = model.similar_cases(indices[:, 0])
+    np.testing.assert_allclose(records[model.feature_names].to_numpy(dtype=np.float64), X_raw, rtol=1e-10)
@@ -0,0 +1,29 @@
+import numpy as np
+
+from conftest import assert_same_predictions, raw_rows
+
+def test_compact_matches_float64(model_cls):
+    compact = model_cls.load_model().compact()
+    assert compact.X_train.dtypes.eq(np.float32).all()
+
+    # The float64 side uses the same engine, so only the float32 rounding differs
+    model = model_cls.load_model()
+    model.index_engine = compact.index_engine
+    model.build_index()
+
+    X_raw = raw_rows(model)
+    expected = model.predict_batch(X_raw)
+    actual = compact.predict_batch(X_raw)
+    np.testing.assert_array_equal(actual[0], expected[0])
+    np.testing.assert_array_equal(actual[2], expected[2])
+    np.testing.assert_allclose(actual[1], expected[1], atol=1e-5)
+    np.testing.assert_allclose(actual[3], expected[3], rtol=1e-5, atol=1e-5)
+
+def test_compact_survives_the_artifact_round_trip(model_cls):
+    compact = model_cls.load_model().compact()
+    compact.save_model()
+
+    loaded = model_cls.load_model()
+    assert loaded.reference_dtype == 'float32'
+    assert loaded.X_train.dtypes.eq(np.float32).all()
+    assert_same_predictions(compact, loaded, raw_rows(compact))
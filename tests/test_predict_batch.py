@@ -0,0 +1,28 @@
+import numpy as np
+
+from conftest import raw_rows
+
+def test_predict_matches_predict_batch(model_cls):
+    model = model_cls.load_model()
+    model.prediction_cache = None
+    X_raw = raw_rows(model, count=25)
+    predictions, probabilities, indices, distances, labels = model.predict_batch(X_raw, return_risk_factors=True)
+
+    for row in range(len(X_raw)):
+        prediction, probability, neighbors, outcomes, row_distances, row_labels = model.predict(
+            X_raw[row:row + 1], return_risk_factors=True
+        )
+        assert prediction.tolist() == [predictions[row]]
+        assert probability.tolist() == [probabilities[row]]
+        np.testing.assert_array_equal(neighbors, indices[row])
+        np.testing.assert_array_equal(outcomes, np.asarray(model.y_train)[indices[row]])
+        np.testing.assert_array_equal(row_distances, distances[row])
+        assert row_labels == labels[row]
+
+def test_batch_rows_are_scored_independently(model_cls):
+    model = model_cls.load_model()
+    X_raw = raw_rows(model, count=40)
+    whole = model.predict_batch(X_raw)
+    halves = [model.predict_batch(X_raw[:15]), model.predict_batch(X_raw[15:])]
+    for part, expected in enumerate(whole):
+        np.testing.assert_array_equal(np.concatenate([half[part] for half in halves]), expected)
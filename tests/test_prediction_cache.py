@@ -0,0 +1,41 @@
+import numpy as np
+
+from conftest import raw_rows
+
+def assert_same_result(actual, expected):
+    assert len(actual) == len(expected)
+    for actual_part, expected_part in zip(actual, expected):
+        if isinstance(expected_part, np.ndarray):
+            np.testing.assert_array_equal(actual_part, expected_part)
+        else:
+            assert actual_part == expected_part
+
+def test_cached_predictions_match_uncached(model_cls):
+    model = model_cls.load_model()
+    X_raw = raw_rows(model, count=10)
+    # Build the index now: building it bumps the model version, which clears the cache
+    model.build_index()
+
+    for _ in range(2):
+        for row in X_raw:
+            result = model.predict(row[None, :], return_risk_factors=True)
+            assert_same_result(result, model.predict_uncached(row[None, :], return_risk_factors=True))
+    stats = model.prediction_cache.stats()
+    assert (stats['hits'], stats['misses']) == (len(X_raw), len(X_raw))
+
+    # Callers get copies: changing one does not change the cached entry
+    result = model.predict(X_raw[:1])
+    result[2][:] = -1
+    assert (model.predict(X_raw[:1])[2] >= 0).all()
+
+def test_cache_is_cleared_when_the_reference_set_changes(model_cls):
+    model = model_cls.load_model()
+    X_raw = raw_rows(model, count=1)
+    model.predict(X_raw)
+
+    # The query itself becomes a reference case, at distance 0
+    model.add_cases(X_raw, [1], persist=False)
+    _, _, neighbors, outcomes, distances = model.predict(X_raw)
+    assert neighbors[0] == len(model.X_train) - 1
+    assert distances[0] == 0 and outcomes[0] == 1
+    assert model.prediction_cache.stats()['entries'] == 1
@@ -0,0 +1,44 @@
+import importlib.util
+import sys
+
+import numpy as np
+import pandas as pd
+
+from src.preprocessing import cache
+from src.preprocessing.diabetes import DATA_PATH, load_and_preprocess_diabetes_data, load_zero_medians
+
+LOADER_MODULE = '''
+def offset():
+    return {offset}
+
+def loader():
+    return offset()
+'''
+
+def import_loader(directory, name, offset, monkeypatch):
+    path = directory / f'{name}.py'
+    path.write_text(LOADER_MODULE.format(offset=offset))
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    monkeypatch.setitem(sys.modules, name, module)
+    spec.loader.exec_module(module)
+    return module.loader
+
+def test_key_covers_the_helpers_of_the_loader(tmp_path, monkeypatch):
+    key = cache.cache_key(DATA_PATH, import_loader(tmp_path, 'loader_a', 0, monkeypatch))
+    assert cache.cache_key(DATA_PATH, import_loader(tmp_path, 'loader_b', 0, monkeypatch)) == key
+    # Only the helper changes, the loader's own source is the same
+    assert cache.cache_key(DATA_PATH, import_loader(tmp_path, 'loader_c', 1, monkeypatch)) != key
+
+def test_cached_diabetes_data_keeps_the_medians(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, 'PREPROCESSING_CACHE_DIR', str(tmp_path))
+    expected = load_and_preprocess_diabetes_data(use_cache=False)
+
+    for _ in range(2):
+        X_scaled, y, scaler = load_and_preprocess_diabetes_data()
+        pd.testing.assert_frame_equal(X_scaled, expected[0])
+        pd.testing.assert_series_equal(y, expected[1])
+        np.testing.assert_array_equal(scaler.mean_, expected[2].mean_)
+        assert X_scaled.attrs['zero_medians'] == expected[0].attrs['zero_medians']
+    assert len(list(tmp_path.glob('diabetes-*.cache'))) == 1
+    assert load_zero_medians() == expected[0].attrs['zero_medians']
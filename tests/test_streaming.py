@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from src.preprocessing.diabetes import load_and_preprocess_diabetes_data
+from src.preprocessing.heart_disease import load_and_preprocess_heart_data
+from src.preprocessing.parkinsons import load_and_preprocess_parkinsons_data
+from src.preprocessing.streaming import DATASETS, QuantileSketch, preprocess_file
+
+LOADERS = {
+    'diabetes': load_and_preprocess_diabetes_data,
+    'heart_disease': load_and_preprocess_heart_data,
+    'parkinsons': load_and_preprocess_parkinsons_data
+}
+
+@pytest.mark.parametrize('dataset', sorted(DATASETS))
+def test_streaming_matches_in_memory_loader(dataset, tmp_path):
+    output = str(tmp_path / f'{dataset}.npy')
+    # Small chunks, so every pass crosses chunk boundaries
+    preprocess_file(dataset, str(DATASETS[dataset].source), output, chunk_size=100)
+    streamed = np.load(output)
+
+    X_scaled, y, _ = LOADERS[dataset](use_cache=False)
+    assert DATASETS[dataset].feature_names == list(X_scaled.columns)
+    # The sketches hold every value of these small files, so the medians are exact
+    np.testing.assert_allclose(streamed[:, :-1], X_scaled.to_numpy(), rtol=1e-9, atol=1e-9)
+    np.testing.assert_array_equal(streamed[:, -1], np.asarray(y))
+
+def test_sketch_weight_equals_count():
+    rng = np.random.default_rng(0)
+    sketch, other = QuantileSketch(capacity=33), QuantileSketch(capacity=33, seed=1)
+    for size in (7, 101, 64, 333):
+        sketch.update(rng.normal(size=size))
+        other.update(rng.normal(size=size))
+    sketch.merge(other)
+
+    weight = sum(len(values) * 2 ** level for level, values in enumerate(sketch.levels))
+    assert weight == sketch.count == 2 * (7 + 101 + 64 + 333)
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from conftest import raw_rows
+
+def scaler_and_weights(model, X_raw):
+    """The transform before it was fused: the scaler, then the feature weights column by column"""
+    X = pd.DataFrame(X_raw, columns=model.feature_names)
+    if model.scaler:
+        X = pd.DataFrame(model.scaler.transform(X), columns=model.feature_names)
+    for feature, weight in model.feature_weights.items():
+        if feature in X.columns:
+            X[feature] = X[feature] * weight
+    return X.to_numpy()
+
+def dataset_rows(model):
+    """Every reference case of the dataset in input units, and a noisy copy of each"""
+    count = len(model.X_train)
+    return np.vstack([raw_rows(model, count, noise=0), raw_rows(model, count)])
+
+def test_fused_transform_matches_scaler_and_weights(model_cls):
+    model = model_cls.load_model()
+    X_raw = dataset_rows(model)
+
+    # The fused map rounds differently in the last bits, nothing more
+    np.testing.assert_allclose(model.transform_inputs(X_raw), scaler_and_weights(model, X_raw), rtol=1e-12, atol=1e-12)
+
+def test_predict_batch_matches_unfused_path(model_cls):
+    model = model_cls.load_model()
+    unfused = model_cls.load_model()
+    unfused.transform_inputs = lambda X_raw: scaler_and_weights(unfused, X_raw)
+    X_raw = dataset_rows(model)
+
+    predictions, probabilities, indices, distances = model.predict_batch(X_raw)
+    expected = unfused.predict_batch(X_raw)
+    np.testing.assert_array_equal(predictions, expected[0])
+    np.testing.assert_allclose(probabilities, expected[1], rtol=1e-9, atol=1e-9)
+    # Only duplicate cases (the heart disease set has some) may come back in another order
+    differs = indices != expected[2]
+    reference = model.reference_matrix()
+    np.testing.assert_array_equal(reference[indices[differs]], reference[expected[2][differs]])
+    np.testing.assert_allclose(distances, expected[3], rtol=1e-9, atol=1e-9)
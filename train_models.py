@@ -1,4 +1,9 @@
 import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from src.model import BreastCancerModel
 from src.models.diabetes import DiabetesModel
 from src.models.heart_disease import HeartDiseaseModel
@@ -30,6 +35,7 @@ def train_breast_cancer():
         
         print(f"Breast Cancer Model - Train accuracy: {train_acc:.4f}, Test accuracy: {test_acc:.4f}\n")
         model.save_model()
+        return train_acc, test_acc
     except Exception as e:
         logging.error(f"Error in training Breast Cancer model: {str(e)}")
         raise
@@ -43,10 +49,12 @@ def train_diabetes():
         # Initialize and train model
         model = DiabetesModel()
         model.scaler = scaler
+        model.zero_medians = X.attrs['zero_medians']
         train_acc, test_acc = model.train(X, y)
         
         print(f"Diabetes Model - Train accuracy: {train_acc:.4f}, Test accuracy: {test_acc:.4f}\n")
         model.save_model()
+        return train_acc, test_acc
     except Exception as e:
         logging.error(f"Error in training Diabetes model: {str(e)}")
         raise
@@ -64,6 +72,7 @@ def train_heart_disease():
         
         print(f"Heart Disease Model - Train accuracy: {train_acc:.4f}, Test accuracy: {test_acc:.4f}\n")
         model.save_model()
+        return train_acc, test_acc
     except Exception as e:
         logging.error(f"Error in training Heart Disease model: {str(e)}")
         raise
@@ -81,21 +90,94 @@ def train_parkinsons():
         
         print(f"Parkinson's Disease Model - Train accuracy: {train_acc:.4f}, Test accuracy: {test_acc:.4f}\n")
         model.save_model()
+        return train_acc, test_acc
     except Exception as e:
         logging.error(f"Error in training Parkinson's model: {str(e)}")
         raise
 
-def main():
+# Training jobs by name, in the order main() has always run them
+TRAINING_JOBS = {
+    'breast_cancer': train_breast_cancer,
+    'diabetes': train_diabetes,
+    'heart_disease': train_heart_disease,
+    'parkinsons': train_parkinsons
+}
+
+def run_training_job(name):
+    """Run one training job and return its result record; failures are recorded, not raised"""
+    record = {
+        'model': name,
+        'status': 'ok',
+        'train_accuracy': None,
+        'test_accuracy': None,
+        'error': None,
+        'pid': os.getpid()
+    }
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        record['train_accuracy'], record['test_accuracy'] = TRAINING_JOBS[name]()
+    except Exception as e:
+        record['status'] = 'failed'
+        record['error'] = f"{type(e).__name__}: {e}"
+    record['wall_seconds'] = time.perf_counter() - wall_start
+    record['cpu_seconds'] = time.process_time() - cpu_start
+    return record
+
+def train_all(names=None, max_workers=None):
+    """Train the selected models in a process pool and return one result record per model"""
     ensure_model_dir()
-    train_breast_cancer()
-    train_diabetes()
-    train_heart_disease()
-    train_parkinsons()
+    names = list(names or TRAINING_JOBS)
+    max_workers = max_workers or min(len(names), os.cpu_count() or 1)
+    
+    records = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(run_training_job, name): name for name in names}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                records[name] = future.result()
+            except Exception as e:
+                # The worker process itself died (e.g. BrokenProcessPool); keep the other results
+                records[name] = {
+                    'model': name, 'status': 'failed', 'train_accuracy': None, 'test_accuracy': None,
+                    'error': f"{type(e).__name__}: {e}", 'pid': None, 'wall_seconds': None, 'cpu_seconds': None
+                }
+            logger.info(f"{name}: {records[name]['status']}")
+    return [records[name] for name in names]
 
-if __name__ == "__main__":
-    main()
+def print_summary(records, total_wall):
+    print(f"{'model':<16}{'status':<8}{'train':>8}{'test':>8}{'wall s':>9}{'cpu s':>9}")
+    for record in records:
+        accuracies = [
+            f"{record[key]:.4f}" if record[key] is not None else "-"
+            for key in ('train_accuracy', 'test_accuracy')
+        ]
+        timings = [
+            f"{record[key]:.2f}" if record[key] is not None else "-"
+            for key in ('wall_seconds', 'cpu_seconds')
+        ]
+        print(f"{record['model']:<16}{record['status']:<8}{accuracies[0]:>8}{accuracies[1]:>8}{timings[0]:>9}{timings[1]:>9}")
+        if record['error']:
+            print(f"    {record['error']}")
+    print(f"Total wall time: {total_wall:.2f}s")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the disease prediction models in parallel")
+    parser.add_argument('--only', nargs='+', choices=list(TRAINING_JOBS), help="Models to train (default: all)")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: one per model, capped at CPU count)")
+    parser.add_argument('--json', dest='json_path', help="Also write the result records to this JSON file")
+    args = parser.parse_args(argv)
+    
+    start = time.perf_counter()
+    records = train_all(args.only, args.workers)
+    print_summary(records, time.perf_counter() - start)
+    
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(records, f, indent=2)
     
-    # Add other model training here as you implement them
-    # print("\nTraining Diabetes Model...")
-    # train_diabetes()
-    # etc. 
\ No newline at end of file
+    return 0 if all(record['status'] == 'ok' for record in records) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())